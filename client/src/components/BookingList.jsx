@@ -6,22 +6,24 @@ const API_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:5000';
 
 export default function BookingList({ token, customer }) {
   const [bookings, setBookings] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [view, setView] = useState("upcoming");
   const [editingBookingId, setEditingBookingId] = useState(null);
   const [editAppointmentTime, setEditAppointmentTime] = useState("");
 
-  const fetchBookings = async () => {
+  const fetchBookings = async (cursor = null) => {
     if (!token || !customer) return;
 
     try {
-      const res = await fetch(
-        `${API_URL}/bookings?customer_id=${customer.id}`,
-        {
-          headers: { Authorization: `Bearer ${token}` },
-        }
-      );
+      const params = new URLSearchParams({ view });
+      if (cursor) params.set("cursor", cursor);
+      const res = await fetch(`${API_URL}/bookings?${params}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
       if (res.ok) {
         const data = await res.json();
-        setBookings(data);
+        setBookings((prev) => (cursor ? [...prev, ...data.bookings] : data.bookings));
+        setNextCursor(data.next_cursor);
       }
     } catch (err) {
       console.error(err);
@@ -43,7 +45,7 @@ export default function BookingList({ token, customer }) {
 
   useEffect(() => {
     fetchBookings();
-  }, [token, customer]);
+  }, [token, customer, view]);
 
   const startEdit = (booking) => {
     setEditingBookingId(booking.id);
@@ -156,17 +158,33 @@ export default function BookingList({ token, customer }) {
   return (
     <div className="booking-list-container">
       <h2>My Bookings</h2>
+      <div className="booking-actions">
+        <button
+          className={`booking-action-btn${view === "upcoming" ? "" : " secondary"}`}
+          onClick={() => setView("upcoming")}
+        >
+          Upcoming
+        </button>
+        <button
+          className={`booking-action-btn${view === "past" ? "" : " secondary"}`}
+          onClick={() => setView("past")}
+        >
+          Past
+        </button>
+      </div>
       {bookings.length === 0 ? (
-        <p className="no-bookings">No bookings yet.</p>
+        <p className="no-bookings">
+          {view === "upcoming" ? "No upcoming bookings." : "No past bookings."}
+        </p>
       ) : (
         <ul className="booking-list">
           {bookings.map((b) => (
             <li key={b.id} className="booking-card">
               <p>
-                <strong>Service:</strong> {b.service?.title || "No service"}
+                <strong>Service:</strong> {b.service_name || "No service"}
               </p>
               <p>
-                <strong>Stylist:</strong> {b.stylist.name}
+                <strong>Stylist:</strong> {b.stylist_name}
               </p>
               <p className="booking-date">
                 <strong>Date:</strong>{" "}
@@ -219,6 +237,11 @@ export default function BookingList({ token, customer }) {
           ))}
         </ul>
       )}
+      {nextCursor && (
+        <button className="booking-action-btn" onClick={() => fetchBookings(nextCursor)}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }
@@ -21,6 +21,9 @@ export default function Services({ user: propUser, token: propToken }) {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [showAuthToast, setShowAuthToast] = useState(false);
+  const [query, setQuery] = useState("");
+  // Ranked service ids from GET /search, or null when no query is entered
+  const [matchIds, setMatchIds] = useState(null);
 
   // Fetch services
   useEffect(() => {
@@ -40,6 +43,30 @@ export default function Services({ user: propUser, token: propToken }) {
     fetchServices();
   }, []);
 
+  // Typeahead search, debounced so each keystroke doesn't hit the API
+  useEffect(() => {
+    if (!query.trim()) {
+      setMatchIds(null);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q: query, type: "service", limit: "50" });
+        const res = await fetch(`${API_URL}/search?${params}`, { signal: controller.signal });
+        if (!res.ok) throw new Error("Search failed");
+        const data = await res.json();
+        setMatchIds(data.results.map((result) => result.id));
+      } catch (err) {
+        if (err.name !== "AbortError") console.error("Error searching services:", err);
+      }
+    }, 200);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [query]);
+
   useEffect(() => {
     if (!user) {
       setShowAuthToast(true);
@@ -87,6 +114,10 @@ export default function Services({ user: propUser, token: propToken }) {
     },
   });
 
+  const visibleServices = matchIds === null
+    ? services
+    : matchIds.map((id) => services.find((service) => service.id === id)).filter(Boolean);
+
   if (loading) return <p>Loading services...</p>;
   if (error) return <p className="error">{error}</p>;
 
@@ -117,13 +148,21 @@ export default function Services({ user: propUser, token: propToken }) {
       )}
 
       <h2>Our Services</h2>
-     
+
+      <input
+        type="search"
+        className="service-search"
+        placeholder="Search services..."
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+      />
+
       {/* Services list */}
-      {services.length === 0 ? (
-        <p className="no-services">No services available</p>
+      {visibleServices.length === 0 ? (
+        <p className="no-services">{matchIds === null ? "No services available" : "No matching services"}</p>
       ) : (
         <div className="service-list">
-          {services.map((service) => (
+          {visibleServices.map((service) => (
             <div key={service.id} className="service-card">
               {service.image_url && (
                 <img src={service.image_url} alt={service.title} className="service-image" />
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { useParams } from 'react-router-dom';
 import './StylistReviews.css';
 
@@ -6,31 +6,36 @@ const API_URL = import.meta.env.VITE_API_URL || 'https://beauty-parlor-app-5.onr
 
 export default function StylistReviews({ stylistId }) {
   const [reviews, setReviews] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  useEffect(() => {
-    const fetchReviews = async () => {
-      try {
-        const res = await fetch(`${API_URL}/stylists/${stylistId}/reviews`);
-        if (res.ok) {
-          const data = await res.json();
-          setReviews(data);
-        } else {
-          setError('Failed to fetch reviews.');
-        }
-      } catch (err) {
-        console.error('Error fetching reviews:', err);
-        setError('An error occurred while fetching reviews.');
-      } finally {
-        setLoading(false);
+  const fetchReviews = useCallback(async (cursor = null) => {
+    try {
+      const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const res = await fetch(`${API_URL}/stylists/${stylistId}/reviews${params}`);
+      if (res.ok) {
+        const data = await res.json();
+        setReviews((prev) => (cursor ? [...prev, ...data.reviews] : data.reviews));
+        setNextCursor(data.next_cursor);
+        setSummary({ count: data.rating_count, average: data.rating_average });
+      } else {
+        setError('Failed to fetch reviews.');
       }
-    };
+    } catch (err) {
+      console.error('Error fetching reviews:', err);
+      setError('An error occurred while fetching reviews.');
+    } finally {
+      setLoading(false);
+    }
+  }, [stylistId]);
 
+  useEffect(() => {
     if (stylistId) {
       fetchReviews();
     }
-  }, [stylistId]);
+  }, [stylistId, fetchReviews]);
 
   if (loading) {
     return <p>Loading reviews...</p>;
@@ -47,6 +52,11 @@ export default function StylistReviews({ stylistId }) {
   return (
     <div className="stylist-reviews-container">
       <h3>Customer Reviews</h3>
+      {summary?.average != null && (
+        <p className="reviews-summary">
+          {summary.average.toFixed(1)} / 5 from {summary.count} review{summary.count === 1 ? '' : 's'}
+        </p>
+      )}
       <ul className="reviews-list">
         {reviews.map((review) => (
           <li key={review.id} className="review-item">
@@ -65,6 +75,11 @@ export default function StylistReviews({ stylistId }) {
           </li>
         ))}
       </ul>
+      {nextCursor && (
+        <button className="reviews-load-more" onClick={() => fetchReviews(nextCursor)}>
+          Load more reviews
+        </button>
+      )}
     </div>
   );
 }
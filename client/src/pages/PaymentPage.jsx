@@ -6,6 +6,30 @@ import './PaymentPage.css';
 const API_URL = import.meta.env.VITE_API_URL || 'https://beauty-parlor-app-5.onrender.com';
 const PAYMENT_POLL_INTERVAL_MS = 3000;
 const PAYMENT_POLL_MAX_ATTEMPTS = 12;
+const PAYMENT_STREAM_TIMEOUT_S = 60;
+
+// Resolves with the settled status pushed by the server, or null if the
+// stream is unavailable so the caller can fall back to polling.
+const waitForPaymentStatus = (bookingId, token) =>
+  new Promise((resolve) => {
+    if (typeof EventSource === 'undefined') {
+      resolve(null);
+      return;
+    }
+    const params = new URLSearchParams({ jwt: token, timeout: PAYMENT_STREAM_TIMEOUT_S });
+    const source = new EventSource(
+      `${API_URL}/bookings/${bookingId}/payment-status/stream?${params}`
+    );
+    const finish = (status) => {
+      source.close();
+      resolve(status);
+    };
+    source.addEventListener('payment_status', (event) => {
+      finish(JSON.parse(event.data).payment_status);
+    });
+    source.addEventListener('timeout', () => finish('pending'));
+    source.onerror = () => finish(null);
+  });
 
 const CheckoutForm = ({ bookingId, amount, serviceTitle }) => {
   const navigate = useNavigate();
@@ -65,8 +89,10 @@ const CheckoutForm = ({ bookingId, amount, serviceTitle }) => {
         },
       });
 
-      let paymentStatus = 'pending';
-      for (let attempt = 0; attempt < PAYMENT_POLL_MAX_ATTEMPTS; attempt += 1) {
+      let paymentStatus = await waitForPaymentStatus(bookingId, token);
+      const pollAttempts = paymentStatus === null ? PAYMENT_POLL_MAX_ATTEMPTS : 0;
+      paymentStatus = paymentStatus || 'pending';
+      for (let attempt = 0; attempt < pollAttempts; attempt += 1) {
         await new Promise((resolve) => setTimeout(resolve, PAYMENT_POLL_INTERVAL_MS));
         const statusResponse = await fetch(
           `${API_URL}/bookings/${bookingId}/payment-status`,
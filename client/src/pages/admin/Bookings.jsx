@@ -7,30 +7,33 @@ export default function Bookings() {
   const [bookings, setBookings] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  useEffect(() => {
-    const fetchBookings = async () => {
-      try {
-        const token = localStorage.getItem('access_token');
-        const response = await fetch(`${API_URL}/admin/bookings`, {
-          headers: {
-            'Authorization': `Bearer ${token}`,
-          },
-        });
-
-        if (!response.ok) {
-          throw new Error('Failed to fetch bookings.');
-        }
+  const fetchBookings = async (cursor = null) => {
+    try {
+      const token = localStorage.getItem('access_token');
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_URL}/admin/bookings${query}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
 
-        const data = await response.json();
-        setBookings(data);
-      } catch (err) {
-        setError(err.message);
-      } finally {
-        setLoading(false);
+      if (!response.ok) {
+        throw new Error('Failed to fetch bookings.');
       }
-    };
 
+      const data = await response.json();
+      setBookings(prev => (cursor ? [...prev, ...data.bookings] : data.bookings));
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
     fetchBookings();
   }, []);
 
@@ -64,6 +67,11 @@ export default function Bookings() {
           ))}
         </tbody>
       </table>
+      {nextCursor && (
+        <button className="admin-button" onClick={() => fetchBookings(nextCursor)}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }
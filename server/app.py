@@ -1,594 +1,102 @@
-from flask import Flask, request, jsonify
-from flask_migrate import Migrate
-from flask_restful import Api, Resource
+"""Application factory.
+
+`create_app()` only wires configuration, extensions, resources and CLI commands;
+it opens no database connection, so importing this module and starting a worker
+stay cheap. Without BCRYPT_LOG_ROUNDS it times a few low-cost bcrypt hashes to pick
+the work factor (passwords.init_app). `GET /health/ready` reports whether the
+database is reachable. `flask --app app ...` finds the factory automatically;
+wsgi.py calls it for gunicorn.
+"""
+
+import click
+from flask import Flask
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from models import db, Customer, Stylist, Service, stylist_service, Booking, Review
-from mpesa import get_mpesa_access_token
-from datetime import datetime
-import os
-import base64
-import requests
-import logging
-from sqlalchemy import text
+from flask_jwt_extended import JWTManager
+from flask_migrate import Migrate
+from flask_restful import Api
+
+import logs
+import metrics
+import passwords
+import query_stats
+import replicas
+import rollups
+import search
+from auth import set_admin
 from config import Config
-
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
-logger = logging.getLogger(__name__)
-
-
-CORS(
-    app,
-    resources={r"/*": {"origins": [
-        "http://localhost:5173",
-        "https://beauty-parlor-app-ztgj.vercel.app"
-    ]}},
-    supports_credentials=True,
-    allow_headers=["Content-Type", "Authorization"],
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-)
-
-db.init_app(app)
-migrate = Migrate(app, db)
-api = Api(app)
-bcrypt = Bcrypt(app)
-jwt = JWTManager(app)
-
-
-def verify_database_connection():
-    """Fail fast in production and emit actionable diagnostics on connection errors."""
-    try:
-        Config.validate()
-        with db.engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
-        logger.info("Database connection verified (%s)", db.engine.url.get_backend_name())
-    except Exception:
-        logger.exception("Database startup check failed. Check DATABASE_URL and database availability.")
-        if app.config["IS_PRODUCTION"]:
-            raise
-
-
-with app.app_context():
-    verify_database_connection()
-
-# ---------------- AUTH ---------------- #
-def admin_required(fn):
-    """Decorator to check if the user is admin"""
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = Customer.query.get(current_user_id)
-        if not user or not user.is_admin:
-            return {"error": "Admin access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
-
-class Register(Resource):
-    def post(self):
-        data = request.get_json()
-        if Customer.query.filter_by(phone=data["phone"]).first():
-            return {"error": "Phone already registered"}, 400
-
-        hashed_pw = bcrypt.generate_password_hash(data["password"]).decode()
-        # Always register as customer (is_admin = False)
-        customer = Customer(name=data["name"], phone=data["phone"], password_hash=hashed_pw, is_admin=False)
-        db.session.add(customer)
-        db.session.commit()
-
-        access_token = create_access_token(identity=str(customer.id))
-        return {"customer": customer.to_dict(), "access_token": access_token}, 201
-
-
-class Login(Resource):
-    def post(self):
-        data = request.get_json()
-        customer = Customer.query.filter_by(phone=data["phone"]).first()
-        if not customer or not bcrypt.check_password_hash(customer.password_hash, data["password"]):
-            return {"error": "Invalid credentials"}, 401
-
-        access_token = create_access_token(identity=str(customer.id))
-        return {"customer": customer.to_dict(), "access_token": access_token}, 200
-
-
-class Me(Resource):
-    @jwt_required()
-    def get(self):
-        current_customer_id = get_jwt_identity()
-        customer = Customer.query.get(current_customer_id)
-        if not customer:
-            return {"error": "Customer not found"}, 404
-        
-        # Explicitly include is_admin
-        return {
-            "customer": {
-                "id": customer.id,
-                "name": customer.name,
-                "phone": customer.phone,
-                "is_admin": customer.is_admin
-            }
-        }, 200
-
-
-
-# ---------------- SERVICES ---------------- #
-class ServiceList(Resource):
-    
-    def get(self):
-        services = Service.query.all()
-        services_data = []
-        for s in services:
-            s_dict = s.to_dict()
-            s_dict["stylists"] = [stylist.to_dict() for stylist in s.stylists]
-            services_data.append(s_dict)
-        return services_data, 200
-
-    @jwt_required()
-    def post(self):
-        data = request.get_json()
-        title = data.get("title")
-        description = data.get("description") or ""
-        price = data.get("price")
-        image_url = data.get("image_url") # Get image_url
-
-        if not title or price is None:
-            return {"error": "Title and price are required"}, 400
-
-        service = Service(title=title, description=description, price=float(price), image_url=image_url) # Pass image_url
-        db.session.add(service)
-        db.session.commit()
-        return service.to_dict(), 201
-
-
-class ServiceDetail(Resource):
-    @jwt_required()
-    def get(self, service_id):
-        service = Service.query.get_or_404(service_id)
-        s_dict = service.to_dict()
-        s_dict["stylists"] = [stylist.to_dict() for stylist in service.stylists]
-        return s_dict, 200
-
-    @jwt_required()
-    def put(self, service_id):
-        service = Service.query.get(service_id)
-        if not service:
-            return {"error": "Service not found"}, 404
-
-        data = request.get_json()
-        service.title = data.get("title", service.title)
-        service.description = data.get("description", service.description)
-        service.price = float(data.get("price", service.price))
-        service.image_url = data.get("image_url", service.image_url) # Update image_url
-
-        db.session.commit()
-        return service.to_dict(), 200
-
-    @jwt_required()
-    def delete(self, service_id):
-        service = Service.query.get(service_id)
-        if not service:
-            return {"error": "Service not found"}, 404
-
-        db.session.delete(service)
-        db.session.commit()
-        return {}, 204
-
-# ---------------- BOOKINGS ---------------- #
-class BookingList(Resource):
-    @jwt_required()
-    def get(self):
-        current_customer_id = get_jwt_identity()
-        bookings = Booking.query.filter_by(customer_id=int(current_customer_id)).all()
-        return [b.to_dict() for b in bookings], 200
-
-    @jwt_required()
-    def post(self):
-        current_customer_id = int(get_jwt_identity())
-        data = request.get_json()
-        customer = Customer.query.get(current_customer_id)
-        stylist = Stylist.query.get(data["stylist_id"])
-        service = Service.query.get(data["service_id"])
-
-        if not customer or not stylist or not service:
-            return {"error": "Invalid booking data"}, 400
-
-        # Check stylist offers this service
-        if service not in stylist.services:
-            return {"error": f"Stylist '{stylist.name}' does not offer '{service.title}'"}, 400
-
-        appointment_time_str = data.get("appointment_time")
-        appointment_time = None
-        if appointment_time_str:
-            try:
-                # parse ISO format from frontend
-                appointment_time = datetime.fromisoformat(appointment_time_str)
-            except ValueError:
-                return {"error": "Invalid datetime format"}, 400
-        else:
-            return {"error": "Appointment time is required"}, 400
-
-        # Prevent double-booking the same stylist at the same appointment time
-        stylist_conflict = Booking.query.filter_by(
-            stylist_id=stylist.id,
-            appointment_time=appointment_time
-        ).first()
-        if stylist_conflict:
-            return {"error": f"{stylist.name} is already booked at that time. Please choose another time."}, 409
-        
-        new_booking = Booking(
-            customer_id=customer.id,
-            stylist_id=stylist.id,
-            service_id=service.id,
-            appointment_time=appointment_time
-        )
-        db.session.add(new_booking)
-        db.session.commit()
-        return {"booking": new_booking.to_dict()}, 201
-
-
-class BookingResource(Resource):
-    @jwt_required()
-    def put(self, booking_id):
-        current_customer_id = int(get_jwt_identity())
-        booking = Booking.query.get(booking_id)
-        if not booking:
-            return {"error": "Booking not found"}, 404
-
-        if booking.customer_id != current_customer_id:
-            return {"error": "Unauthorized"}, 403
-
-        data = request.get_json() or {}
-        appointment_time_str = data.get("appointment_time")
-        if not appointment_time_str:
-            return {"error": "Appointment time is required"}, 400
-
-        try:
-            new_appointment_time = datetime.fromisoformat(appointment_time_str)
-        except ValueError:
-            return {"error": "Invalid datetime format"}, 400
-
-        # Prevent double-booking the same stylist at the same appointment time
-        stylist_conflict = Booking.query.filter(
-            Booking.stylist_id == booking.stylist_id,
-            Booking.appointment_time == new_appointment_time,
-            Booking.id != booking.id
-        ).first()
-        if stylist_conflict:
-            return {"error": f"{booking.stylist.name} is already booked at that time. Please choose another time."}, 409
-
-        booking.appointment_time = new_appointment_time
-        db.session.commit()
-        return {"booking": booking.to_dict()}, 200
-
-    @jwt_required()
-    def delete(self, booking_id):
-        current_customer_id = int(get_jwt_identity())
-        booking = Booking.query.get(booking_id)
-        if not booking:
-            return {"error": "Booking not found"}, 404
-
-        if booking.customer_id != current_customer_id:
-            return {"error": "Unauthorized"}, 403
-
-        db.session.delete(booking)
-        db.session.commit()
-        return {"message": "Booking deleted"}, 200
-    
-# ---------------- STYLISTS ---------------- #
-class StylistListResource(Resource):
-    @jwt_required()
-    def get(self):
-        stylists = Stylist.query.all()
-        return [s.to_dict(rules=("-services.stylists", "-bookings.stylist")) for s in stylists], 200
-
-    @admin_required
-    def post(self):
-        data = request.get_json()
-        name = data.get("name")
-        bio = data.get("bio")
-        service_ids = data.get("service_ids", [])
-
-        if not name:
-            return {"error": "Name is required"}, 400
-
-        services = Service.query.filter(Service.id.in_(service_ids)).all() if service_ids else []
-
-        stylist = Stylist(name=name, bio=bio, services=services)
-        db.session.add(stylist)
-        db.session.commit()
-
-        return stylist.to_dict(rules=("-services.stylists", "-bookings.stylist")), 201
-
-class StylistResource(Resource):
-    # @jwt_required()
-    def get(self, stylist_id):
-        stylist = Stylist.query.get_or_404(stylist_id)
-        return stylist.to_dict(rules=("-services.stylists", "-bookings.stylist")), 200
-
-    @admin_required
-    def put(self, stylist_id):
-        stylist = Stylist.query.get_or_404(stylist_id)
-        data = request.get_json()
-
-        stylist.name = data.get("name", stylist.name)
-        stylist.bio = data.get("bio", stylist.bio)
-
-        service_ids = data.get("service_ids")
-        if service_ids is not None:
-            stylist.services = Service.query.filter(Service.id.in_(service_ids)).all()
-
-        db.session.commit()
-        return stylist.to_dict(rules=("-services.stylists", "-bookings.stylist")), 200
-
-    @admin_required
-    def delete(self, stylist_id):
-        stylist = Stylist.query.get_or_404(stylist_id)
-        db.session.delete(stylist)
-        db.session.commit()
-        return {"message": "Stylist deleted"}, 200
-
-# ------------------ ADMIN RESOURCES ------------------ #
-
-class AdminAnalyticsSummary(Resource):
-    @admin_required
-    def get(self):
-        total_users = db.session.query(db.func.count(Customer.id)).scalar()
-        total_bookings = db.session.query(db.func.count(Booking.id)).scalar()
-        total_stylists = db.session.query(db.func.count(Stylist.id)).scalar()
-
-        # Calculate total revenue by joining Booking and Service tables
-        total_revenue = db.session.query(db.func.sum(Service.price)) \
-                                  .join(Booking, Service.id == Booking.service_id) \
-                                  .scalar() or 0
-
-        # Bookings per service
-        bookings_per_service_query = db.session.query(Service.title, db.func.count(Booking.id).label('booking_count')) \
-                                               .join(Booking, Service.id == Booking.service_id) \
-                                               .group_by(Service.title) \
-                                               .order_by(db.desc('booking_count')) \
-                                               .all()
-        
-        bookings_per_service = [{"service_name": title, "count": count} for title, count in bookings_per_service_query]
-
-        # Bookings per stylist
-        bookings_per_stylist_query = db.session.query(Stylist.name, db.func.count(Booking.id).label('booking_count')) \
-                                               .join(Booking, Stylist.id == Booking.stylist_id) \
-                                               .group_by(Stylist.name) \
-                                               .order_by(db.desc('booking_count')) \
-                                               .all()
-
-        bookings_per_stylist = [{"stylist_name": name, "count": count} for name, count in bookings_per_stylist_query]
-
-
-        return {
-            "summary": {
-                "total_users": total_users,
-                "total_bookings": total_bookings,
-                "total_stylists": total_stylists,
-                "total_revenue": f"{total_revenue:.2f}"
-            },
-            "bookings_per_service": bookings_per_service,
-            "bookings_per_stylist": bookings_per_stylist
-        }, 200
-
-class AdminUserList(Resource):
-    @admin_required
-    def get(self):
-        users = Customer.query.all()
-        return [user.to_dict() for user in users], 200
-
-class AdminBookingList(Resource):
-    @admin_required
-    def get(self):
-        bookings = Booking.query.all()
-        # Enhance booking data with details for admin view
-        bookings_data = []
-        for b in bookings:
-            b_dict = b.to_dict()
-            b_dict['customer_name'] = b.customer.name
-            b_dict['stylist_name'] = b.stylist.name
-            b_dict['service_name'] = b.service.title
-            b_dict['service_price'] = b.service.price
-            bookings_data.append(b_dict)
-        return bookings_data, 200
-
-
-# ------------------ MPESA RESOURCES ------------------ #
-class InitiateMpesaPayment(Resource):
-    @jwt_required()
-    def post(self):
-        current_customer_id = int(get_jwt_identity())
-        data = request.get_json()
-        amount = data.get("amount")
-        phone_number = data.get("phone_number")
-        booking_id = data.get("booking_id")
-
-        if not all([amount, phone_number, booking_id]):
-            return {"error": "Amount, phone number, and booking_id are required"}, 400
-
-        if phone_number.startswith("0"):
-            phone_number = "254" + phone_number[1:]
-        elif phone_number.startswith("+"):
-            phone_number = phone_number[1:]
-
-        if not phone_number.isdigit() or len(phone_number) != 12:
-            return {"error": "Invalid phone format. Use 2547XXXXXXXX."}, 400
-
-        booking = Booking.query.get(booking_id)
-        if not booking:
-            return {"error": "Booking not found"}, 404
-        if booking.customer_id != current_customer_id:
-            return {"error": "Unauthorized"}, 403
-
-        access_token, token_error = get_mpesa_access_token()
-        if not access_token:
-            return {"error": "Could not get M-Pesa access token", "details": token_error}, 500
-
-        base_url = os.getenv("MPESA_BASE_URL", "https://sandbox.safaricom.co.ke").rstrip("/")
-        api_url = f"{base_url}/mpesa/stkpush/v1/processrequest"
-        headers = {"Authorization": f"Bearer {access_token}"}
-
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        shortcode = os.getenv("MPESA_SHORTCODE")
-        passkey = os.getenv("MPESA_PASSKEY")
-        callback_url = os.getenv("MPESA_CALLBACK_URL") or (
-            f"{os.getenv('BASE_URL')}/mpesa-callback" if os.getenv("BASE_URL") else None
-        )
-
-        if not shortcode or not passkey or not callback_url:
-            return {"error": "M-Pesa config missing: MPESA_SHORTCODE, MPESA_PASSKEY, or MPESA_CALLBACK_URL"}, 500
-
-        password = base64.b64encode(f"{shortcode}{passkey}{timestamp}".encode()).decode()
-
-        payload = {
-            "BusinessShortCode": shortcode,
-            "Password": password,
-            "Timestamp": timestamp,
-            "TransactionType": "CustomerPayBillOnline",
-            "Amount": amount,
-            "PartyA": phone_number,
-            "PartyB": shortcode,
-            "PhoneNumber": phone_number,
-            "CallBackURL": callback_url,
-            "AccountReference": f"Booking {booking_id}",
-            "TransactionDesc": f"Payment for booking {booking_id}",
-        }
-
-        try:
-            response = requests.post(api_url, json=payload, headers=headers)
-            response.raise_for_status()
-            response_data = response.json()
-
-            booking.payment_status = "pending"
-            if response_data.get("CheckoutRequestID"):
-                booking.payment_intent_id = response_data.get("CheckoutRequestID")
-            db.session.commit()
-
-            return response_data, 200
-        except requests.exceptions.RequestException as e:
-            if e.response is not None:
-                try:
-                    error_payload = e.response.json()
-                except ValueError:
-                    error_payload = {"raw": e.response.text}
-                return {
-                    "error": "M-Pesa request failed",
-                    "status_code": e.response.status_code,
-                    "details": error_payload,
-                }, e.response.status_code
-            return {"error": str(e)}, 500
-
-class MpesaCallback(Resource):
-    def post(self):
-        data = request.get_json() or {}
-        stk_callback = data.get("Body", {}).get("stkCallback", {})
-        checkout_request_id = stk_callback.get("CheckoutRequestID")
-        result_code = stk_callback.get("ResultCode")
-
-        if checkout_request_id:
-            booking = Booking.query.filter_by(payment_intent_id=checkout_request_id).first()
-            if booking:
-                if result_code == 0:
-                    booking.payment_status = "successful"
-                else:
-                    booking.payment_status = "incomplete"
-                db.session.commit()
-
-        print("M-Pesa Callback:", data)
-        return {"ResultCode": 0, "ResultDesc": "Accepted"}, 200
-
-
-class BookingPaymentStatus(Resource):
-    @jwt_required()
-    def get(self, booking_id):
-        current_customer_id = int(get_jwt_identity())
-        booking = Booking.query.get(booking_id)
-        if not booking:
-            return {"error": "Booking not found"}, 404
-
-        customer = Customer.query.get(current_customer_id)
-        is_admin = bool(customer and customer.is_admin)
-        if booking.customer_id != current_customer_id and not is_admin:
-            return {"error": "Unauthorized"}, 403
-
-        return {
-            "booking_id": booking.id,
-            "payment_status": booking.payment_status
-        }, 200
-
-
-
-# ------------------ REVIEW RESOURCES ------------------ #
-class ReviewList(Resource):
-    @jwt_required()
-    def post(self):
-        current_customer_id = get_jwt_identity()
-        data = request.get_json()
-        rating = data.get("rating")
-        comment = data.get("comment")
-        stylist_id = data.get("stylist_id")
-
-        if not rating or not stylist_id:
-            return {"error": "Rating and stylist_id are required"}, 400
-
-        if not (1 <= rating <= 5):
-            return {"error": "Rating must be between 1 and 5"}, 400
-
-        # Check if the customer has booked a service with this stylist
-        booking_exists = Booking.query.filter_by(
-            customer_id=current_customer_id,
-            stylist_id=stylist_id
-        ).first()
-
-        if not booking_exists:
-            return {"error": "You can only review stylists you have booked a service with."}, 403
-
-        review = Review(
-            customer_id=current_customer_id,
-            stylist_id=stylist_id,
-            rating=rating,
-            comment=comment
-        )
-        db.session.add(review)
-        db.session.commit()
-        return review.to_dict(), 201
-
-class StylistReviews(Resource):
-    def get(self, stylist_id):
-        stylist = Stylist.query.get_or_404(stylist_id)
-        reviews = Review.query.filter_by(stylist_id=stylist.id).all()
-        return [review.to_dict() for review in reviews], 200
-
-
-# ------------------ RESOURCES ------------------ #
-api.add_resource(Register, "/register")
-api.add_resource(Login, "/login")
-api.add_resource(Me, "/me")
-api.add_resource(ServiceList, "/services")
-api.add_resource(ServiceDetail, "/services/<int:service_id>")
-api.add_resource(BookingList, "/bookings")
-api.add_resource(BookingResource, "/bookings/<int:booking_id>")
-api.add_resource(BookingPaymentStatus, "/bookings/<int:booking_id>/payment-status")
-api.add_resource(StylistListResource, "/stylists")
-api.add_resource(StylistResource, "/stylists/<int:stylist_id>")
-
-# Admin routes
-api.add_resource(AdminAnalyticsSummary, "/admin/analytics/summary")
-api.add_resource(AdminUserList, "/admin/users")
-api.add_resource(AdminBookingList, "/admin/bookings")
-
-# M-Pesa routes
-api.add_resource(InitiateMpesaPayment, "/initiate-mpesa-payment")
-api.add_resource(MpesaCallback, "/mpesa-callback")
-
-# Review routes
-api.add_resource(ReviewList, "/reviews")
-api.add_resource(StylistReviews, "/stylists/<int:stylist_id>/reviews")
+from models import db, Customer
+from resources import register_resources
+
+migrate = Migrate()
+jwt = JWTManager()
+
+
+def create_app(config=Config):
+    config.validate()
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    logs.configure(app.config["LOG_LEVEL"], app.config["LOG_FORMAT"])
+    passwords.init_app(app)
+
+    CORS(
+        app,
+        resources={r"/*": {"origins": [
+            "http://localhost:5173",
+            "https://beauty-parlor-app-ztgj.vercel.app"
+        ]}},
+        supports_credentials=True,
+        allow_headers=["Content-Type", "Authorization"],
+        methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+    )
+
+    metrics.init_app(app)
+    db.init_app(app)
+    replicas.init_app(app)
+    migrate.init_app(app, db)
+    jwt.init_app(app)
+    query_stats.init_app(app)
+    register_resources(Api(app))
+
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(rebuild_search_command)
+    app.cli.add_command(set_admin_command)
+    return app
+
+
+# ------------------ CLI ------------------ #
+@click.command("rebuild-rollups")
+@with_appcontext
+def rebuild_rollups_command():
+    """Recompute the analytics rollup table and stylist rating aggregates from the source tables."""
+    rollups.rebuild()
+    db.session.commit()
+    print("Analytics rollups rebuilt.")
+
+
+@click.command("rebuild-search")
+@with_appcontext
+def rebuild_search_command():
+    """Re-index every service and stylist for GET /search."""
+    search.rebuild()
+    db.session.commit()
+    print("Search index rebuilt.")
+
+
+@click.command("set-admin")
+@click.argument("phone")
+@click.option("--revoke", is_flag=True, help="Remove admin rights instead of granting them.")
+@with_appcontext
+def set_admin_command(phone, revoke):
+    """Grant or revoke admin rights. Revoking takes effect for existing tokens within ADMIN_ROLES_CACHE_TTL."""
+    customer = Customer.query.filter_by(phone=phone).first()
+    if not customer:
+        raise click.ClickException(f"No customer with phone {phone}")
+    set_admin(customer, not revoke)
+    db.session.commit()
+    print(f"{customer.name} is {'no longer' if revoke else 'now'} an admin.")
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
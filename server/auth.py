@@ -0,0 +1,79 @@
+"""Authorization from signed JWT claims, with a per-request identity on `flask.g`.
+
+Access tokens carry `is_admin` and the admin roster version they were issued
+under. Any change to who is an admin bumps the shared `admin_roles` version, and
+an admin claim is only trusted while its version matches; a token from before
+the change falls back to reading the customer row. Customers without an admin
+claim never need the database to be authorized.
+"""
+
+from flask import current_app, g
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity
+
+from cache import SharedVersion
+from models import Customer, db
+
+ADMIN_ROLES_VERSION = "admin_roles"
+
+_admin_roles = None
+
+
+def admin_roles():
+    global _admin_roles
+    if _admin_roles is None:
+        _admin_roles = SharedVersion(ADMIN_ROLES_VERSION, ttl=current_app.config["ADMIN_ROLES_CACHE_TTL"])
+    return _admin_roles
+
+
+def issue_access_token(customer):
+    claims = {"is_admin": bool(customer.is_admin), "roles_version": admin_roles().current()}
+    return create_access_token(identity=str(customer.id), additional_claims=claims)
+
+
+def set_admin(customer, is_admin):
+    """Grant or revoke admin rights; outstanding admin tokens are re-checked against the database."""
+    if bool(customer.is_admin) == is_admin:
+        return
+    customer.is_admin = is_admin
+    admin_roles().bump()
+
+
+class Identity:
+    def __init__(self, customer_id, claims):
+        self.customer_id = customer_id
+        self._claims = claims
+        self._customer = None
+        self._customer_loaded = False
+        self._is_admin = None
+
+    @property
+    def customer(self):
+        """The Customer row, queried at most once per request."""
+        if not self._customer_loaded:
+            self._customer = db.session.get(Customer, self.customer_id)
+            self._customer_loaded = True
+        return self._customer
+
+    @property
+    def is_admin(self):
+        if self._is_admin is None:
+            claimed = self._claims.get("is_admin")
+            if claimed is False:
+                self._is_admin = False
+            elif claimed and self._claims.get("roles_version") == admin_roles().current():
+                self._is_admin = True
+            else:
+                # Tokens from before a role change (or before role claims existed).
+                self._is_admin = bool(self.customer and self.customer.is_admin)
+        return self._is_admin
+
+    def can_access(self, customer_id):
+        return customer_id == self.customer_id or self.is_admin
+
+
+def current_identity():
+    """The caller's Identity; only valid inside a `jwt_required` view."""
+    identity = g.get("identity")
+    if identity is None:
+        identity = g.identity = Identity(int(get_jwt_identity()), get_jwt())
+    return identity
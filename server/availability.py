@@ -0,0 +1,166 @@
+"""Free-slot computation for stylists.
+
+Busy time comes from a single range query over `booking` per request; the rest
+is interval arithmetic on sorted, non-overlapping `[start, end)` pairs.
+"""
+
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from models import Booking, StylistWorkingHours, db
+
+# No booking lasts longer than this; it bounds the index range scan from below.
+MAX_BOOKING_SPAN = timedelta(days=1)
+
+
+class IntervalSet:
+    """Sorted, merged half-open intervals with bisect lookups."""
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if start >= end:
+                continue
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def overlaps(self, start, end):
+        index = bisect_right(self.starts, start) - 1
+        if index >= 0 and self.ends[index] > start:
+            return True
+        return index + 1 < len(self.starts) and self.starts[index + 1] < end
+
+    def subtract(self, other):
+        """Return the parts of this set not covered by `other` (both sorted, so one merge pass)."""
+        result = []
+        busy = list(other)
+        j = 0
+        for start, end in self:
+            while j < len(busy) and busy[j][1] <= start:
+                j += 1
+            cursor = start
+            k = j
+            while k < len(busy) and busy[k][0] < end:
+                if busy[k][0] > cursor:
+                    result.append((cursor, busy[k][0]))
+                cursor = max(cursor, busy[k][1])
+                k += 1
+            if cursor < end:
+                result.append((cursor, end))
+        return IntervalSet(result)
+
+    def first_fit(self, duration, step, not_before=None):
+        """Earliest slot start, aligned to `step` within its interval, that fits `duration`."""
+        for start, end in self:
+            if not_before and end <= not_before:
+                continue
+            candidate = start
+            if not_before and candidate < not_before:
+                candidate = start + step * -(-(not_before - start) // step)
+            if candidate + duration <= end:
+                return candidate
+        return None
+
+    def slots(self, duration, step, not_before=None):
+        found = []
+        for start, end in self:
+            candidate = start
+            while candidate + duration <= end:
+                if not not_before or candidate >= not_before:
+                    found.append(candidate)
+                candidate += step
+        return found
+
+
+def parse_hours(value):
+    """Parse "HH:MM-HH:MM" into a pair of `time` objects."""
+    opens_at, closes_at = (time.fromisoformat(part.strip()) for part in value.split("-", 1))
+    return opens_at, closes_at
+
+
+def working_windows(hours_by_stylist, stylist_ids, day, default_hours):
+    """Map each stylist to their working time on `day` as an IntervalSet."""
+    weekday = day.weekday()
+    windows = {}
+    for stylist_id in stylist_ids:
+        rows = hours_by_stylist.get(stylist_id)
+        if rows is None:
+            spans = [default_hours]
+        else:
+            spans = [(row.opens_at, row.closes_at) for row in rows if row.weekday == weekday]
+        windows[stylist_id] = IntervalSet(
+            (datetime.combine(day, opens_at), datetime.combine(day, closes_at)) for opens_at, closes_at in spans
+        )
+    return windows
+
+
+def load_working_hours(stylist_ids):
+    hours = defaultdict(list)
+    for row in StylistWorkingHours.query.filter(StylistWorkingHours.stylist_id.in_(stylist_ids)):
+        hours[row.stylist_id].append(row)
+    return hours
+
+
+def load_busy(stylist_ids, window_start, window_end):
+    """One range query for every booking of `stylist_ids` touching the window."""
+    rows = db.session.query(Booking.stylist_id, Booking.appointment_time, Booking.end_time).filter(
+        Booking.stylist_id.in_(stylist_ids),
+        Booking.appointment_time < window_end,
+        Booking.appointment_time > window_start - MAX_BOOKING_SPAN,
+        Booking.end_time > window_start,
+    ).all()
+    busy = defaultdict(list)
+    for stylist_id, start, end in rows:
+        busy[stylist_id].append((start, end))
+    return {stylist_id: IntervalSet(spans) for stylist_id, spans in busy.items()}
+
+
+def free_time(stylist_ids, day, default_hours):
+    """Free IntervalSet per stylist for a single calendar day."""
+    day_start = datetime.combine(day, time.min)
+    windows = working_windows(load_working_hours(stylist_ids), stylist_ids, day, default_hours)
+    busy = load_busy(stylist_ids, day_start, day_start + timedelta(days=1))
+    empty = IntervalSet()
+    return {stylist_id: windows[stylist_id].subtract(busy.get(stylist_id, empty)) for stylist_id in stylist_ids}
+
+
+def first_available(stylist_ids, duration, step, not_before, days, default_hours):
+    """Earliest (start, stylist_id) across `stylist_ids`, searching one day at a time.
+
+    Within a day, stylists are expanded best-first from a heap keyed by a lower
+    bound on their earliest start, so most stylists are never examined in detail.
+    """
+    if not stylist_ids:
+        return None
+    hours = load_working_hours(stylist_ids)
+    for offset in range(days):
+        day = (not_before + timedelta(days=offset)).date()
+        day_start = datetime.combine(day, time.min)
+        windows = working_windows(hours, stylist_ids, day, default_hours)
+        candidates = [(spans.starts[0], False, stylist_id) for stylist_id, spans in windows.items() if spans]
+        if not candidates:
+            continue
+        busy = load_busy(stylist_ids, day_start, day_start + timedelta(days=1))
+        empty = IntervalSet()
+        heapq.heapify(candidates)
+        while candidates:
+            bound, exact, stylist_id = heapq.heappop(candidates)
+            if exact:
+                return bound, stylist_id
+            free = windows[stylist_id].subtract(busy.get(stylist_id, empty))
+            start = free.first_fit(duration, step, not_before)
+            if start is not None:
+                heapq.heappush(candidates, (start, True, stylist_id))
+    return None
@@ -0,0 +1,13 @@
+"""Load and latency benchmarks for the API.
+
+Run from server/:
+
+    python -m bench run --size small                 # Flask test client, SQLite
+    python -m bench run --driver http --concurrency 8
+    python -m bench run --database postgresql://localhost/beauty_parlour_bench
+    python -m bench compare bench/results/a.json bench/results/b.json
+
+Each run builds a fresh database (see `dataset.py`), drives a weighted mix of
+requests (see `workload.py`) and writes p50/p95/p99 latency, throughput and SQL
+queries per request to a JSON file that `compare` can diff for regressions.
+"""
@@ -0,0 +1,169 @@
+"""Command line entry point: `python -m bench run|compare` (see bench/__init__.py)."""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from app import create_app
+from bench import workload
+from bench.dataset import SIZES, populate
+from config import Config, _normalise_database_url
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+# Used when it accepts connections and no --database is given. Its contents are replaced.
+LOCAL_POSTGRES_URL = "postgresql://localhost/beauty_parlour_bench"
+DEFAULT_THRESHOLD = 0.10
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+
+
+def _local_postgres():
+    url = _normalise_database_url(LOCAL_POSTGRES_URL)
+    engine = create_engine(url, connect_args={"connect_timeout": 1})
+    try:
+        with engine.connect():
+            return url
+    except Exception:
+        return None
+    finally:
+        engine.dispose()
+
+
+def _database_url(requested):
+    if requested:
+        return _normalise_database_url(requested)
+    if os.getenv("BENCH_DATABASE_URL"):
+        return _normalise_database_url(os.getenv("BENCH_DATABASE_URL"))
+    return _local_postgres() or "sqlite:///" + (Path(tempfile.gettempdir()) / "beauty_parlour_bench.db").as_posix()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    database_url = _database_url(args.database)
+    config = type("BenchConfig", (Config,), {
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "IS_PRODUCTION": False,
+        "BCRYPT_LOG_ROUNDS": 4,
+        "SQL_INSTRUMENTATION": True,
+    })
+    app = create_app(config)
+    # One `sql` line per request would drown the report; queries are in the results.
+    logging.getLogger("sql").setLevel(logging.ERROR)
+    with app.app_context():
+        print(f"Building {args.size} dataset on {app.extensions['sqlalchemy'].engine.url.get_backend_name()}...",
+              flush=True)
+        dataset = populate(args.size, args.seed)
+    users = workload.Users(app, dataset)
+    load = workload.Workload(users, args.seed)
+
+    concurrency = f", concurrency {args.concurrency}" if args.driver == "http" else ""
+    print(f"Running {args.requests} requests ({args.driver}{concurrency})...", flush=True)
+    if args.driver == "http":
+        summary = workload.run_http(app, load, args.requests, args.warmup, args.concurrency)
+    else:
+        summary = workload.run_test_client(app, load, args.requests, args.warmup)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "database": database_url.split(":", 1)[0],
+            "size": args.size,
+            "counts": dataset.counts,
+            "seed": args.seed,
+            "driver": args.driver,
+            "concurrency": args.concurrency if args.driver == "http" else 1,
+            "python": platform.python_version(),
+        },
+        **summary,
+    }
+    output = args.output or RESULTS_DIR / (
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{args.driver}-{args.size}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + "\n")
+
+    print(f"\n{'operation':<16}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for name, stats in result["operations"].items():
+        print(f"{name:<16}{stats['requests']:>9}{stats['errors']:>8}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['queries_per_request'] or 0:>9.1f}")
+    print(f"\n{result['requests_per_second']} requests/s over {result['elapsed_s']}s; results in {output}")
+    return 0
+
+
+def compare(args):
+    """Print relative changes per operation; exit 1 if any metric regressed past the threshold."""
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    if baseline["meta"]["size"] != candidate["meta"]["size"] or baseline["meta"]["driver"] != candidate["meta"]["driver"]:
+        print("warning: runs used different dataset sizes or drivers", file=sys.stderr)
+
+    regressions = []
+    print(f"{'operation':<16}{'metric':<22}{'baseline':>10}{'candidate':>11}{'change':>10}")
+    for name, before in baseline["operations"].items():
+        after = candidate["operations"].get(name)
+        if after is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            flag = ""
+            if change > args.threshold:
+                flag = "  REGRESSION"
+                regressions.append((name, metric))
+            print(f"{name:<16}{metric:<22}{old:>10.2f}{new:>11.2f}{change:>+10.1%}{flag}")
+
+    old_rps, new_rps = baseline["requests_per_second"], candidate["requests_per_second"]
+    print(f"\nthroughput: {old_rps} -> {new_rps} requests/s")
+    if old_rps and new_rps and (old_rps - new_rps) / old_rps > args.threshold:
+        regressions.append(("all", "requests_per_second"))
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="API load and latency benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="build a dataset, drive the request mix and save the results")
+    run_parser.add_argument("--size", choices=SIZES, default="small")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--driver", choices=("client", "http"), default="client",
+                            help="Flask test client (default) or real HTTP against a threaded local server")
+    run_parser.add_argument("--requests", type=int, default=2000)
+    run_parser.add_argument("--warmup", type=int, default=200)
+    run_parser.add_argument("--concurrency", type=int, default=8, help="client threads for --driver http")
+    run_parser.add_argument("--database", help="database to WIPE and use (default: BENCH_DATABASE_URL, "
+                                               f"then {LOCAL_POSTGRES_URL} if reachable, else a temporary SQLite file)")
+    run_parser.add_argument("--output", type=Path, help=f"result file (default: {RESULTS_DIR.name}/<timestamp>.json)")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="diff two result files")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("candidate", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help=f"relative increase that counts as a regression (default {DEFAULT_THRESHOLD})")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Deterministic synthetic dataset for benchmark runs.
+
+Rows are generated from a seeded RNG with explicit ids, so the same size and seed
+always produce the same database, and inserted in chunks without building the
+whole dataset in memory. The target database is wiped first.
+"""
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import bcrypt
+from flask_migrate import upgrade
+from sqlalchemy import text
+
+import rollups
+import search
+from models import Booking, Customer, Review, Service, Stylist, db, stylist_service
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+CHUNK_SIZE = 5000
+PASSWORD = "bench-password"
+ADMIN_PHONE = "0700000000"
+SERVICES_PER_STYLIST = 3
+# Existing bookings start here, three slots a day; benchmark-created bookings go
+# far beyond them so they never collide with seeded ones.
+HISTORY_START = datetime(2024, 1, 1, 9, 0)
+SLOT_HOURS = (9, 12, 15)
+FUTURE_START = datetime(2100, 1, 1, 9, 0)
+PAYMENT_STATUSES = (("successful", 75), ("pending", 15), ("incomplete", 10))
+RATINGS = ((5, 40), (4, 33), (3, 15), (2, 7), (1, 5))
+
+SIZES = {
+    "tiny": {"customers": 50, "stylists": 5, "services": 6, "bookings": 500, "reviews": 100},
+    "small": {"customers": 500, "stylists": 20, "services": 12, "bookings": 10_000, "reviews": 2_000},
+    "medium": {"customers": 10_000, "stylists": 100, "services": 30, "bookings": 200_000, "reviews": 40_000},
+    "large": {"customers": 100_000, "stylists": 500, "services": 60, "bookings": 2_000_000, "reviews": 400_000},
+}
+
+
+@dataclass
+class Dataset:
+    size: str
+    seed: int
+    counts: dict
+    admin_id: int = 1
+    # stylist id -> service ids it offers
+    offers: dict = field(default_factory=dict)
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _slot(index):
+    day, slot = divmod(index, len(SLOT_HOURS))
+    return HISTORY_START.replace(hour=SLOT_HOURS[slot]) + timedelta(days=day)
+
+
+def offered_services(stylist_id, services):
+    return [(stylist_id * SERVICES_PER_STYLIST + offset) % services + 1 for offset in range(SERVICES_PER_STYLIST)]
+
+
+def _insert_chunks(table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+
+
+def reset_schema():
+    """Drop everything in the bench database and migrate it to the current head."""
+    if db.engine.url.get_backend_name() == "postgresql":
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+    else:
+        db.engine.dispose()
+        Path(db.engine.url.database).unlink(missing_ok=True)
+    upgrade(directory=str(MIGRATIONS_DIR))
+
+
+def populate(size="small", seed=1):
+    counts = SIZES[size]
+    rng = random.Random(seed)
+    # Low cost: logins in a benchmark should measure the app, not bcrypt.
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4)).decode()
+    reset_schema()
+
+    def customers():
+        yield {"id": 1, "name": "Bench Admin", "phone": ADMIN_PHONE, "password_hash": password_hash, "is_admin": True}
+        for customer_id in range(2, counts["customers"] + 1):
+            yield {"id": customer_id, "name": f"Customer {customer_id}", "phone": f"07{customer_id:08d}",
+                   "password_hash": password_hash, "is_admin": False}
+
+    _insert_chunks(Customer.__table__, customers())
+    _insert_chunks(Service.__table__, (
+        {"id": service_id, "title": f"Service {service_id}", "description": "Synthetic benchmark service",
+         "price": float(rng.randrange(500, 5000, 50)), "duration_minutes": rng.choice((30, 60, 90, 120))}
+        for service_id in range(1, counts["services"] + 1)
+    ))
+    _insert_chunks(Stylist.__table__, (
+        {"id": stylist_id, "name": f"Stylist {stylist_id}", "bio": "Synthetic benchmark stylist"}
+        for stylist_id in range(1, counts["stylists"] + 1)
+    ))
+    offers = {stylist_id: offered_services(stylist_id, counts["services"])
+              for stylist_id in range(1, counts["stylists"] + 1)}
+    _insert_chunks(stylist_service, (
+        {"stylist_id": stylist_id, "service_id": service_id}
+        for stylist_id, service_ids in offers.items() for service_id in service_ids
+    ))
+    durations = dict(db.session.query(Service.id, Service.duration_minutes).all())
+
+    def bookings():
+        booking_id = 0
+        per_stylist, extra = divmod(counts["bookings"], counts["stylists"])
+        for stylist_id in range(1, counts["stylists"] + 1):
+            slot = 0
+            for _ in range(per_stylist + (1 if stylist_id <= extra else 0)):
+                # Leave some slots free so the history is not perfectly dense.
+                slot += 1 + (rng.random() < 0.2)
+                start = _slot(slot)
+                service_id = rng.choice(offers[stylist_id])
+                booking_id += 1
+                yield {"id": booking_id, "appointment_time": start,
+                       "end_time": start + timedelta(minutes=durations[service_id]),
+                       "payment_status": _weighted(rng, PAYMENT_STATUSES),
+                       "customer_id": rng.randint(2, counts["customers"]),
+                       "service_id": service_id, "stylist_id": stylist_id}
+
+    _insert_chunks(Booking.__table__, bookings())
+    _insert_chunks(Review.__table__, (
+        {"id": review_id, "rating": _weighted(rng, RATINGS), "comment": f"Review {review_id}",
+         "created_at": HISTORY_START + timedelta(minutes=rng.randrange(0, 2 * 365 * 24 * 60)),
+         "customer_id": rng.randint(2, counts["customers"]), "stylist_id": rng.randint(1, counts["stylists"])}
+        for review_id in range(1, counts["reviews"] + 1)
+    ))
+
+    if db.engine.url.get_backend_name() == "postgresql":
+        for table in ("customer", "service", "stylist", "booking", "review"):
+            db.session.execute(text(
+                "SELECT setval(pg_get_serial_sequence(:table_name, 'id'), "
+                "COALESCE((SELECT MAX(id) FROM \"" + table + "\"), 1), true)"
+            ), {"table_name": table})
+    rollups.rebuild()
+    search.rebuild()
+    db.session.commit()
+    return Dataset(size=size, seed=seed, counts=dict(counts), offers=offers)
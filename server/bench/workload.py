@@ -0,0 +1,206 @@
+"""Request mix, drivers and latency statistics for benchmark runs.
+
+A workload is a seeded sequence of operations drawn from `MIX` by weight. The
+same sequence is replayed either through the Flask test client (server-side cost
+only, one request at a time) or over real HTTP against a threaded server in this
+process, with several client threads. Both drivers read the number of SQL
+statements per request from the `Server-Timing` header added by query_stats.py.
+"""
+
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from werkzeug.serving import make_server
+
+from auth import issue_access_token
+from bench.dataset import FUTURE_START
+from models import Booking, Customer, db
+
+QUERY_COUNT = re.compile(r'\bdb;[^,]*desc="(\d+) queries"')
+# Customers who act as the logged-in users of a run.
+ACTIVE_CUSTOMERS = 50
+
+# name: (weight, audience)
+MIX = {
+    "services": (25, "customer"),
+    "stylists": (15, "customer"),
+    "bookings_list": (15, "customer"),
+    "booking_create": (5, "customer"),
+    "payment_status": (20, "customer"),
+    "admin_summary": (5, "admin"),
+    "admin_bookings": (15, "admin"),
+}
+
+
+class Users:
+    """Tokens and owned bookings for the customers and the admin a run acts as."""
+
+    def __init__(self, app, dataset):
+        with app.app_context():
+            customers = Customer.query.filter(Customer.id > dataset.admin_id) \
+                                      .order_by(Customer.id).limit(ACTIVE_CUSTOMERS).all()
+            self.admin_token = issue_access_token(db.session.get(Customer, dataset.admin_id))
+            self.tokens = [issue_access_token(customer) for customer in customers]
+            owned = {customer.id: [] for customer in customers}
+            for booking_id, customer_id in db.session.query(Booking.id, Booking.customer_id) \
+                                                     .filter(Booking.customer_id.in_(owned)):
+                owned[customer_id].append(booking_id)
+            self.bookings = [owned[customer.id] for customer in customers]
+        self.offers = dataset.offers
+
+
+class Workload:
+    def __init__(self, users, seed):
+        self.users = users
+        self.rng = random.Random(seed)
+        self._next_slot = itertools.count()
+        self._slot_lock = threading.Lock()
+
+    def _new_booking_slot(self):
+        # Unique far-future slots, so creates never conflict with each other or the history.
+        with self._slot_lock:
+            index = next(self._next_slot)
+        return FUTURE_START + timedelta(hours=3 * index)
+
+    def operations(self, count):
+        """Yield `count` (name, method, path, json body, token) tuples."""
+        names = list(MIX)
+        weights = [MIX[name][0] for name in names]
+        for name in self.rng.choices(names, weights, k=count):
+            if MIX[name][1] == "admin":
+                user, token = None, self.users.admin_token
+            else:
+                user = self.rng.randrange(len(self.users.tokens))
+                token = self.users.tokens[user]
+            yield (name, *self._request(name, user), token)
+
+    def _request(self, name, user):
+        if name == "services":
+            return "GET", "/services", None
+        if name == "stylists":
+            return "GET", "/stylists", None
+        if name == "bookings_list":
+            return "GET", "/bookings", None
+        if name == "booking_create":
+            stylist_id = self.rng.choice(list(self.users.offers))
+            return "POST", "/bookings", {
+                "stylist_id": stylist_id,
+                "service_id": self.rng.choice(self.users.offers[stylist_id]),
+                "appointment_time": None,  # assigned when sent, see `payload`
+            }
+        if name == "payment_status":
+            owned = self.users.bookings[user] or [1]
+            return "GET", f"/bookings/{self.rng.choice(owned)}/payment-status", None
+        if name == "admin_summary":
+            return "GET", "/admin/analytics/summary", None
+        if name == "admin_bookings":
+            return "GET", "/admin/bookings?limit=50", None
+        raise ValueError(f"Unknown operation {name}")
+
+    def payload(self, body):
+        if body is not None and "appointment_time" in body:
+            body = dict(body, appointment_time=self._new_booking_slot().isoformat())
+        return body
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, status, queries):
+        with self._lock:
+            self.samples.setdefault(name, []).append((seconds, status, queries))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(fraction * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarise(recorder, elapsed):
+    operations = {}
+    total = 0
+    for name, samples in sorted(recorder.samples.items()):
+        latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+        queries = [count for _, _, count in samples if count is not None]
+        operations[name] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, status, _ in samples if status >= 400),
+            "p50_ms": round(percentile(latencies, 0.50), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+        total += len(samples)
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 1) if elapsed else None,
+        "operations": operations,
+    }
+
+
+def _query_count(headers):
+    match = QUERY_COUNT.search(headers.get("Server-Timing", ""))
+    return int(match.group(1)) if match else None
+
+
+def run_test_client(app, workload, count, warmup):
+    client = app.test_client()
+    recorder = Recorder()
+
+    def send(name, method, path, body, token):
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=workload.payload(body),
+                               headers={"Authorization": f"Bearer {token}"})
+        return time.perf_counter() - started, response.status_code, _query_count(response.headers)
+
+    for operation in workload.operations(warmup):
+        send(*operation)
+    started = time.perf_counter()
+    for operation in workload.operations(count):
+        recorder.add(operation[0], *send(*operation))
+    return summarise(recorder, time.perf_counter() - started)
+
+
+def run_http(app, workload, count, warmup, concurrency):
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    sessions = threading.local()
+    recorder = Recorder()
+
+    def send(operation):
+        name, method, path, body, token = operation
+        session = getattr(sessions, "session", None)
+        if session is None:
+            session = sessions.session = requests.Session()
+        started = time.perf_counter()
+        response = session.request(method, base_url + path, json=workload.payload(body),
+                                   headers={"Authorization": f"Bearer {token}"})
+        return name, time.perf_counter() - started, response.status_code, _query_count(response.headers)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, workload.operations(warmup)))
+            started = time.perf_counter()
+            for name, *sample in pool.map(send, workload.operations(count)):
+                recorder.add(name, *sample)
+            elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+    return summarise(recorder, elapsed)
@@ -0,0 +1,80 @@
+"""Process-local caches validated against a version counter stored in the database.
+
+Every gunicorn worker keeps its own copy of a cached payload together with the
+version it was built from. Writers bump the shared `cache_version` row in the
+same transaction as their change, so the other workers pick the change up the
+next time they revalidate, which happens at most once every `ttl` seconds.
+"""
+
+import hashlib
+import threading
+import time
+
+from sqlalchemy import select, update
+
+from models import CacheVersion, db
+
+
+class SharedVersion:
+    """A named counter in `cache_version`, re-read at most once every `ttl` seconds."""
+
+    def __init__(self, name, ttl=5.0):
+        self.name = name
+        self.ttl = ttl
+        self._value = None
+        self._checked_at = 0.0
+
+    def is_fresh(self):
+        return self._value is not None and time.monotonic() - self._checked_at < self.ttl
+
+    def current(self):
+        if not self.is_fresh():
+            version = db.session.execute(
+                select(CacheVersion.version).where(CacheVersion.name == self.name)
+            ).scalar()
+            self._value = version or 0
+            self._checked_at = time.monotonic()
+        return self._value
+
+    def bump(self):
+        """Increment the shared version inside the caller's transaction."""
+        result = db.session.execute(
+            update(CacheVersion)
+            .where(CacheVersion.name == self.name)
+            .values(version=CacheVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.add(CacheVersion(name=self.name, version=1))
+        # Force this worker to revalidate on its next read instead of waiting out the TTL.
+        self._checked_at = 0.0
+
+
+class VersionedCache:
+    def __init__(self, name, build, ttl=5.0):
+        self.name = name
+        self._build = build
+        self._lock = threading.Lock()
+        self._shared = SharedVersion(name, ttl)
+        self._version = None
+        self._payload = None
+        self._etag = None
+
+    def get(self):
+        """Return `(payload, etag)`, touching the database only when the TTL has lapsed."""
+        if self._payload is not None and self._shared.is_fresh():
+            return self._payload, self._etag
+
+        with self._lock:
+            if self._payload is not None and self._shared.is_fresh():
+                return self._payload, self._etag
+            version = self._shared.current()
+            if version != self._version or self._payload is None:
+                payload = self._build()
+                self._payload = payload
+                self._etag = hashlib.sha256(payload).hexdigest()[:32]
+                self._version = version
+            return self._payload, self._etag
+
+    def bump(self):
+        """Increment the shared version inside the caller's transaction."""
+        self._shared.bump()
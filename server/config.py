@@ -1,6 +1,7 @@
 """Runtime configuration for local development and deployed environments."""
 
 import os
+from datetime import timedelta
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -40,10 +41,68 @@ class Config:
     IS_PRODUCTION = ENV == "production" or bool(os.getenv("RENDER"))
     _local_sqlite_url = "sqlite:///" + (BASE_DIR / "instance" / "beauty_parlour.db").as_posix()
     SQLALCHEMY_DATABASE_URI = _normalise_database_url(os.getenv("DATABASE_URL", _local_sqlite_url))
+    # Optional read replicas, comma-separated; used by `replicas.replica_reads` methods only.
+    SQLALCHEMY_REPLICA_URIS = [_normalise_database_url(url.strip())
+                               for url in os.getenv("DATABASE_REPLICA_URL", "").split(",") if url.strip()]
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": True}
     SECRET_KEY = os.getenv("SECRET_KEY", "development-only-secret-key")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "development-only-jwt-secret-key")
+    # Access tokens carry the admin role; keep them short-lived (auth.py).
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv("JWT_ACCESS_TOKEN_MINUTES", "15")))
+    # Password hashing (passwords.py). Leave BCRYPT_LOG_ROUNDS unset to calibrate the
+    # cost at startup to the slowest hash that stays within BCRYPT_TARGET_MS.
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS")) if os.getenv("BCRYPT_LOG_ROUNDS") else None
+    BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+    # Seconds a worker may trust its copy of the admin roster version.
+    ADMIN_ROLES_CACHE_TTL = float(os.getenv("ADMIN_ROLES_CACHE_TTL", "5"))
+    # Seconds a worker may serve its cached catalog before rechecking the shared version.
+    CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "5"))
+    # Used for stylists without configured working hours, every day of the week.
+    DEFAULT_WORKING_HOURS = os.getenv("DEFAULT_WORKING_HOURS", "09:00-18:00")
+    AVAILABILITY_SLOT_MINUTES = int(os.getenv("AVAILABILITY_SLOT_MINUTES", "30"))
+    AVAILABILITY_SEARCH_DAYS = int(os.getenv("AVAILABILITY_SEARCH_DAYS", "14"))
+    # STK push job queue (payment_jobs.py, worker.py)
+    PAYMENT_WORKER_CONCURRENCY = int(os.getenv("PAYMENT_WORKER_CONCURRENCY", "4"))
+    PAYMENT_WORKER_POLL_INTERVAL = float(os.getenv("PAYMENT_WORKER_POLL_INTERVAL", "1"))
+    PAYMENT_JOB_MAX_ATTEMPTS = int(os.getenv("PAYMENT_JOB_MAX_ATTEMPTS", "5"))
+    PAYMENT_JOB_BACKOFF_BASE = float(os.getenv("PAYMENT_JOB_BACKOFF_BASE", "2"))
+    PAYMENT_JOB_BACKOFF_MAX = float(os.getenv("PAYMENT_JOB_BACKOFF_MAX", "60"))
+    PAYMENT_JOB_LEASE_SECONDS = int(os.getenv("PAYMENT_JOB_LEASE_SECONDS", "300"))
+    # M-Pesa callback inbox (payment_callbacks.py): callbacks applied per worker pass,
+    # seconds a callback may wait for its booking's CheckoutRequestID to appear, and
+    # seconds between its attempts while it waits.
+    MPESA_CALLBACK_BATCH_SIZE = int(os.getenv("MPESA_CALLBACK_BATCH_SIZE", "500"))
+    MPESA_CALLBACK_MATCH_WINDOW = int(os.getenv("MPESA_CALLBACK_MATCH_WINDOW", "600"))
+    MPESA_CALLBACK_RETRY_INTERVAL = int(os.getenv("MPESA_CALLBACK_RETRY_INTERVAL", "10"))
+    # Payment status stream (payment_events.py): watcher poll interval without
+    # LISTEN/NOTIFY, longest wait per request, SSE keepalive interval, and waiting
+    # requests allowed per process (keep it well below gunicorn's --threads).
+    PAYMENT_STATUS_POLL_INTERVAL = float(os.getenv("PAYMENT_STATUS_POLL_INTERVAL", "1"))
+    PAYMENT_STATUS_STREAM_TIMEOUT = int(os.getenv("PAYMENT_STATUS_STREAM_TIMEOUT", "120"))
+    PAYMENT_STATUS_KEEPALIVE = int(os.getenv("PAYMENT_STATUS_KEEPALIVE", "15"))
+    PAYMENT_STATUS_MAX_WAITERS = int(os.getenv("PAYMENT_STATUS_MAX_WAITERS", "16"))
+    # Rows fetched per round trip and written per chunk by the streamed admin exports (exports.py).
+    EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+    # Per-request SQL accounting (query_stats.py): Server-Timing header and `sql` log
+    # line; a statement shape repeated this often in one request is flagged as N+1.
+    SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "true").lower() == "true"
+    SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+    # Default per-request query budget (unset: none). SQL_STRICT fails requests over
+    # budget instead of logging a warning; meant for tests.
+    SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET")) if os.getenv("SQL_QUERY_BUDGET") else None
+    SQL_STRICT = os.getenv("SQL_STRICT", "false").lower() == "true"
+    # Prometheus metrics at /metrics (metrics.py). Workers sharing METRICS_DIR are
+    # aggregated; METRICS_TOKEN, when set, is required as a bearer token.
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # Root log level, and "json" for one JSON object per line (logs.py).
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
 
     @classmethod
     def validate(cls) -> None:
@@ -54,3 +113,5 @@ class Config:
             raise RuntimeError("Missing required production environment variable(s): " + ", ".join(missing))
         if not cls.SQLALCHEMY_DATABASE_URI.startswith(("postgresql://", "postgresql+")):
             raise RuntimeError("DATABASE_URL must be a PostgreSQL connection URL in production.")
+        if any(not url.startswith(("postgresql://", "postgresql+")) for url in cls.SQLALCHEMY_REPLICA_URIS):
+            raise RuntimeError("DATABASE_REPLICA_URL must list PostgreSQL connection URLs in production.")
@@ -0,0 +1,12 @@
+"""gunicorn settings picked up automatically from server/ (see Procfile)."""
+
+import os
+import shutil
+
+
+def on_starting(server):
+    # Snapshots from a previous run would otherwise be merged into /metrics.
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
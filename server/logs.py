@@ -0,0 +1,56 @@
+"""Process-wide logging that never blocks a request on stderr.
+
+Log calls only put the record on an in-memory queue; a QueueListener thread
+formats it and writes it to stderr. LOG_FORMAT=json emits one JSON object per
+line for log drains, otherwise plain text.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+_configured_pid = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure(level, fmt):
+    """Route the root logger through a queue, once per process (again after a fork)."""
+    global _configured_pid
+    with _lock:
+        if _configured_pid == os.getpid():
+            return
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(JsonFormatter() if fmt == "json"
+                            else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        records = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+        listener.start()
+        # Flush what is still queued when the process exits.
+        atexit.register(listener.stop)
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.setLevel(level.upper())
+        _configured_pid = os.getpid()
@@ -0,0 +1,279 @@
+"""In-process metrics in Prometheus text format at `GET /metrics`.
+
+Recorded here:
+
+- per flask_restful Resource and HTTP method: request latency histogram, request
+  counter by status code, and in-flight gauge
+- database connection pool: checked-out and overflow connections, and a
+  histogram of how long checkouts waited for a connection
+- outbound M-Pesa (Daraja) calls: latency histogram by operation and outcome
+
+Every process keeps its own registry. With METRICS_DIR set, each one also writes
+a snapshot to `<METRICS_DIR>/<pid>.json` every METRICS_FLUSH_INTERVAL seconds,
+and `/metrics` merges all snapshots: counters and histograms are summed across
+live and exited processes, gauges across live processes only. Point every
+gunicorn worker (and worker.py, if on the same host) at the same directory and
+clear it before the server starts (gunicorn.conf.py does).
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import Response, current_app, g, request
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name: (type, help)
+METRICS = {
+    "http_requests_total": ("counter", "Requests handled, by resource, method and status code."),
+    "http_request_duration_seconds": ("histogram", "Request latency by resource and method."),
+    "http_requests_in_flight": ("gauge", "Requests currently being handled."),
+    "db_pool_checked_out": ("gauge", "Database connections currently checked out of the pool."),
+    "db_pool_overflow": ("gauge", "Connections open beyond the pool size."),
+    "db_pool_checkout_wait_seconds": ("histogram", "Time spent waiting for a pooled database connection."),
+    "mpesa_request_duration_seconds": ("histogram", "Daraja API call latency by operation and outcome."),
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self.histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, _key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add(self, name, labels, amount):
+        key = (name, _key(labels))
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self.gauges[(name, _key(labels))] = value
+
+    def observe(self, name, labels, seconds):
+        key = (name, _key(labels))
+        with self._lock:
+            values = self.histograms.get(key)
+            if values is None:
+                values = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    values[index] += 1
+                    break
+            else:
+                values[len(LATENCY_BUCKETS)] += 1
+            values[-1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "gauges": [[name, list(labels), value] for (name, labels), value in self.gauges.items()],
+                "histograms": [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+
+registry = Registry()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_snapshot(directory):
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as snapshot_file:
+        json.dump(registry.snapshot(), snapshot_file)
+    os.replace(temporary, path)
+
+
+def start_flusher(app):
+    """Write this process's snapshot to METRICS_DIR periodically (web workers: from the first request on)."""
+    global _flusher
+    directory = app.config["METRICS_DIR"]
+    if not directory or _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is not None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        interval = app.config["METRICS_FLUSH_INTERVAL"]
+
+        def flush_forever():
+            while True:
+                try:
+                    _write_snapshot(directory)
+                except OSError:
+                    app.logger.exception("Could not write metrics snapshot to %s", directory)
+                time.sleep(interval)
+
+        _flusher = threading.Thread(target=flush_forever, name="metrics-flusher", daemon=True)
+        _flusher.start()
+
+
+def _merged_snapshots(directory):
+    """Own live registry plus every other process's last snapshot in `directory`."""
+    merged = [registry.snapshot()]
+    if not directory:
+        return merged
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        pid = int(os.path.basename(path).split(".")[0])
+        if pid == os.getpid():
+            continue
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        if not _pid_alive(pid):
+            snapshot["gauges"] = []
+        merged.append(snapshot)
+    return merged
+
+
+def _labels_text(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def render(snapshots):
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        for target, section in ((counters, "counters"), (gauges, "gauges")):
+            for name, labels, value in snapshot[section]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                target[key] = target.get(key, 0) + value
+        for name, labels, values in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            total = histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+
+    lines = []
+    for metric, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        if kind == "histogram":
+            for (name, labels), values in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), values[:-1]):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_labels_text(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{metric}_sum{_labels_text(labels)} {values[-1]}")
+                lines.append(f"{metric}_count{_labels_text(labels)} {cumulative}")
+        else:
+            for (name, labels), value in sorted((counters if kind == "counter" else gauges).items()):
+                if name == metric:
+                    lines.append(f"{metric}{_labels_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Database pool ---------------- #
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time and keeps the pool gauges current."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            registry.observe("db_pool_checkout_wait_seconds", {}, time.perf_counter() - started)
+            self._sample()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._sample()
+
+    def _sample(self):
+        registry.set("db_pool_checked_out", {}, self.checkedout())
+        registry.set("db_pool_overflow", {}, max(self.overflow(), 0))
+
+
+# ---------------- Requests ---------------- #
+def _resource_labels():
+    view = current_app.view_functions.get(request.endpoint)
+    resource = getattr(view, "view_class", None)
+    return {"resource": resource.__name__ if resource else (request.endpoint or "unmatched"),
+            "method": request.method}
+
+
+def _start_request():
+    start_flusher(current_app)
+    if request.endpoint == "metrics":
+        return
+    g.metrics_labels = _resource_labels()
+    g.metrics_started = time.perf_counter()
+    registry.add("http_requests_in_flight", g.metrics_labels, 1)
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    labels = g.pop("metrics_labels", None)
+    if labels is None:
+        return
+    registry.add("http_requests_in_flight", labels, -1)
+    registry.observe("http_request_duration_seconds", labels, time.perf_counter() - g.metrics_started)
+    status = g.get("metrics_status", 500) if exc is None else 500
+    registry.inc("http_requests_total", {**labels, "status": str(status)})
+
+
+def metrics_view():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    if current_app.config["METRICS_DIR"]:
+        _write_snapshot(current_app.config["METRICS_DIR"])
+    body = render(_merged_snapshots(current_app.config["METRICS_DIR"]))
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS with the timed pool, where the default pool is a QueuePool."""
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    uri = config["SQLALCHEMY_DATABASE_URI"]
+    # In-memory SQLite needs its default single-connection pool.
+    if uri not in ("sqlite://", "sqlite:///:memory:") and "mode=memory" not in uri:
+        options.setdefault("poolclass", TimedQueuePool)
+    return options
+
+
+def init_app(app):
+    """Call before `db.init_app`, which creates the engine from SQLALCHEMY_ENGINE_OPTIONS."""
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,40 @@
+"""Add booking indexes and stylist time uniqueness
+
+Revision ID: 1272079ccc75
+Revises: 14bcd6ebf1bc
+Create Date: 2026-10-18 08:22:15.330947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1272079ccc75'
+down_revision = '14bcd6ebf1bc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT stylist_id, appointment_time, COUNT(*) FROM booking '
+        'GROUP BY stylist_id, appointment_time HAVING COUNT(*) > 1'
+    )).fetchall()
+    if duplicates:
+        raise RuntimeError(
+            "Cannot add uq_booking_stylist_appointment: resolve the double-booked "
+            f"(stylist_id, appointment_time) slots first: {duplicates}"
+        )
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_booking_stylist_appointment', ['stylist_id', 'appointment_time'])
+        batch_op.create_index('ix_booking_customer_id', ['customer_id'], unique=False)
+        batch_op.create_index('ix_booking_payment_intent_id', ['payment_intent_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_payment_intent_id')
+        batch_op.drop_index('ix_booking_customer_id')
+        batch_op.drop_constraint('uq_booking_stylist_appointment', type_='unique')
@@ -0,0 +1,29 @@
+"""Add cache version table
+
+Revision ID: 14bcd6ebf1bc
+Revises: a342fe3c1056
+Create Date: 2026-10-18 08:21:54.814783
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '14bcd6ebf1bc'
+down_revision = 'a342fe3c1056'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_version = op.create_table('cache_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_version, [{'name': 'catalog', 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('cache_version')
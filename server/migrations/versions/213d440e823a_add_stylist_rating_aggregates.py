@@ -0,0 +1,42 @@
+"""add stylist rating aggregates
+
+Revision ID: 213d440e823a
+Revises: 3e66b5704378
+Create Date: 2026-10-18 08:35:01.400980
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '213d440e823a'
+down_revision = '3e66b5704378'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('stylist', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_average', sa.Float(), nullable=True))
+    op.create_index('ix_stylist_rating_average', 'stylist', ['rating_average', 'rating_count', 'id'], unique=False)
+    op.create_index('ix_review_stylist_created_at', 'review', ['stylist_id', 'created_at', 'id'], unique=False)
+
+    # Backfill from existing reviews; `flask --app app rebuild-rollups` does the same later on.
+    op.execute(
+        "UPDATE stylist SET "
+        "rating_count = (SELECT COUNT(*) FROM review WHERE review.stylist_id = stylist.id), "
+        "rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM review WHERE review.stylist_id = stylist.id), "
+        "rating_average = (SELECT AVG(rating * 1.0) FROM review WHERE review.stylist_id = stylist.id)"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_review_stylist_created_at', table_name='review')
+    op.drop_index('ix_stylist_rating_average', table_name='stylist')
+    with op.batch_alter_table('stylist', schema=None) as batch_op:
+        batch_op.drop_column('rating_average')
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('rating_count')
@@ -0,0 +1,46 @@
+"""Add payment job queue
+
+Revision ID: 3e66b5704378
+Revises: f2c331490416
+Create Date: 2026-10-18 08:28:33.894947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e66b5704378'
+down_revision = 'f2c331490416'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('booking_id', sa.Integer(), nullable=False),
+    sa.Column('phone_number', sa.String(length=20), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('checkout_request_id', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('payment_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_payment_job_booking_id'), ['booking_id'], unique=False)
+        batch_op.create_index('ix_payment_job_status_run_at', ['status', 'run_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_job_status_run_at')
+        batch_op.drop_index(batch_op.f('ix_payment_job_booking_id'))
+
+    op.drop_table('payment_job')
@@ -0,0 +1,29 @@
+"""Drop the global bookings rollup row
+
+Revision ID: 4651f5af8cf1
+Revises: 762a33eabebc
+Create Date: 2026-10-18 09:52:20.729999
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4651f5af8cf1'
+down_revision = '762a33eabebc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The total is now summed from the "stylist" rows (rollups.booking_totals).
+    op.execute("DELETE FROM analytics_rollup WHERE scope = 'bookings'")
+
+
+def downgrade():
+    op.execute(
+        "INSERT INTO analytics_rollup (scope, scope_id, item_count, amount) "
+        "SELECT 'bookings', 0, COALESCE(SUM(item_count), 0), COALESCE(SUM(amount), 0) "
+        "FROM analytics_rollup WHERE scope = 'stylist'"
+    )
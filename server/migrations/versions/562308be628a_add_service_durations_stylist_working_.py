@@ -0,0 +1,126 @@
+"""Add service durations, stylist working hours and booking end time
+
+Revision ID: 562308be628a
+Revises: 1272079ccc75
+Create Date: 2026-10-18 08:23:38.840368
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '562308be628a'
+down_revision = '1272079ccc75'
+branch_labels = None
+depends_on = None
+
+
+OVERLAP_CHECK = (
+    "SELECT 1 FROM booking WHERE stylist_id = NEW.stylist_id {exclude_self}"
+    "AND appointment_time < NEW.end_time AND end_time > NEW.appointment_time "
+    "AND appointment_time > datetime(NEW.appointment_time, '-1 day')"
+)
+
+# Bookings made before durations existed whose derived end runs into the stylist's next booking.
+OVERLAPPING = (
+    "FROM booking WHERE EXISTS (SELECT 1 FROM booking AS later WHERE later.stylist_id = booking.stylist_id "
+    "AND later.appointment_time > booking.appointment_time AND later.appointment_time < booking.end_time)"
+)
+NEXT_APPOINTMENT = (
+    "SELECT MIN(later.appointment_time) FROM booking AS later WHERE later.stylist_id = booking.stylist_id "
+    "AND later.appointment_time > booking.appointment_time"
+)
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duration_minutes', sa.Integer(), server_default='60', nullable=False))
+
+    op.create_table('stylist_working_hours',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('stylist_id', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('opens_at', sa.Time(), nullable=False),
+    sa.Column('closes_at', sa.Time(), nullable=False),
+    sa.ForeignKeyConstraint(['stylist_id'], ['stylist.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stylist_working_hours', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stylist_working_hours_stylist_id'), ['stylist_id'], unique=False)
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    # Existing bookings take the duration of their service.
+    if dialect == 'postgresql':
+        op.execute(
+            "UPDATE booking SET end_time = booking.appointment_time + make_interval(mins => service.duration_minutes) "
+            "FROM service WHERE service.id = booking.service_id"
+        )
+    else:
+        # Keep SQLAlchemy's "YYYY-MM-DD HH:MM:SS.ffffff" text format so string comparisons stay ordered.
+        op.execute(
+            "UPDATE booking SET end_time = strftime('%Y-%m-%d %H:%M:%S', appointment_time, "
+            "'+' || (SELECT duration_minutes FROM service WHERE service.id = booking.service_id) || ' minutes') "
+            "|| substr(appointment_time, 20)"
+        )
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+
+    # The old flow accepted bookings without durations, so a derived end can overlap the
+    # stylist's next booking; end those bookings where the next one starts.
+    clipped = [row[0] for row in bind.execute(sa.text(f"SELECT id {OVERLAPPING} ORDER BY id"))]
+    if clipped:
+        logger.warning(
+            "Ending bookings %s at the stylist's next booking so ex_booking_stylist_overlap holds", clipped
+        )
+        op.execute(f"UPDATE booking SET end_time = ({NEXT_APPOINTMENT}) WHERE id IN (SELECT id {OVERLAPPING})")
+
+    # Reject overlapping bookings for the same stylist in the database.
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        op.execute(
+            "ALTER TABLE booking ADD CONSTRAINT ex_booking_stylist_overlap "
+            "EXCLUDE USING gist (stylist_id WITH =, tsrange(appointment_time, end_time) WITH &&)"
+        )
+    elif dialect == 'sqlite':
+        # Batch migrations that recreate the booking table drop these; recreate them afterwards.
+        op.execute(
+            "CREATE TRIGGER booking_no_overlap_insert BEFORE INSERT ON booking "
+            f"WHEN EXISTS ({OVERLAP_CHECK.format(exclude_self='')}) "
+            "BEGIN SELECT RAISE(ABORT, 'booking overlaps another booking for this stylist'); END"
+        )
+        op.execute(
+            "CREATE TRIGGER booking_no_overlap_update BEFORE UPDATE OF stylist_id, appointment_time, end_time ON booking "
+            f"WHEN EXISTS ({OVERLAP_CHECK.format(exclude_self='AND id != NEW.id ')}) "
+            "BEGIN SELECT RAISE(ABORT, 'booking overlaps another booking for this stylist'); END"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("ALTER TABLE booking DROP CONSTRAINT ex_booking_stylist_overlap")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS booking_no_overlap_update")
+        op.execute("DROP TRIGGER IF EXISTS booking_no_overlap_insert")
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_column('end_time')
+
+    with op.batch_alter_table('stylist_working_hours', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stylist_working_hours_stylist_id'))
+
+    op.drop_table('stylist_working_hours')
+
+    with op.batch_alter_table('service', schema=None) as batch_op:
+        batch_op.drop_column('duration_minutes')
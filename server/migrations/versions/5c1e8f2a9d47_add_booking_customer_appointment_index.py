@@ -0,0 +1,27 @@
+"""add booking customer appointment index
+
+Revision ID: 5c1e8f2a9d47
+Revises: 106b97bfbda0
+Create Date: 2026-10-18 09:40:12.118403
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e8f2a9d47'
+down_revision = '106b97bfbda0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain CREATE/DROP INDEX: a batch operation would rebuild `booking` on SQLite and drop its overlap triggers.
+    op.create_index('ix_booking_customer_appointment_time', 'booking', ['customer_id', 'appointment_time'], unique=False)
+    op.drop_index('ix_booking_customer_id', table_name='booking')
+
+
+def downgrade():
+    op.create_index('ix_booking_customer_id', 'booking', ['customer_id'], unique=False)
+    op.drop_index('ix_booking_customer_appointment_time', table_name='booking')
@@ -0,0 +1,26 @@
+"""Seed analytics bucket generation
+
+Revision ID: 762a33eabebc
+Revises: ee758baa0922
+Create Date: 2026-10-18 09:36:41.144818
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '762a33eabebc'
+down_revision = 'ee758baa0922'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # timeseries.py locks this row, so it has to exist before the first invalidation.
+    cache_version = sa.table('cache_version', sa.column('name', sa.String), sa.column('version', sa.Integer))
+    op.bulk_insert(cache_version, [{'name': 'analytics_bucket', 'version': 1}])
+
+
+def downgrade():
+    op.execute("DELETE FROM cache_version WHERE name = 'analytics_bucket'")
@@ -0,0 +1,50 @@
+"""add search index
+
+Revision ID: 8b3f6c2d1e90
+Revises: 1d450267aa77
+Create Date: 2026-10-18 09:58:31.524117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3f6c2d1e90'
+down_revision = '1d450267aa77'
+branch_labels = None
+depends_on = None
+
+
+DOCUMENTS = (
+    "SELECT 'service' AS kind, id AS item_id, title, COALESCE(description, '') AS body FROM service "
+    "UNION ALL SELECT 'stylist', id, name, COALESCE(bio, '') FROM stylist"
+)
+
+
+def upgrade():
+    # Not a model: the table differs per dialect (see search.py), and migrations/env.py
+    # keeps autogenerate from proposing to drop it.
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "CREATE TABLE search_index ("
+            "kind VARCHAR(20) NOT NULL, item_id INTEGER NOT NULL, title TEXT NOT NULL, body TEXT NOT NULL, "
+            "document TSVECTOR NOT NULL, PRIMARY KEY (kind, item_id))"
+        )
+        op.execute("CREATE INDEX ix_search_index_document ON search_index USING GIN (document)")
+        op.execute(
+            "INSERT INTO search_index (kind, item_id, title, body, document) SELECT kind, item_id, title, body, "
+            "setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B') "
+            f"FROM ({DOCUMENTS}) AS documents"
+        )
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE search_index USING fts5("
+            "kind UNINDEXED, item_id UNINDEXED, title, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+        )
+        op.execute(f"INSERT INTO search_index (kind, item_id, title, body) {DOCUMENTS}")
+
+
+def downgrade():
+    op.execute("DROP TABLE search_index")
@@ -0,0 +1,26 @@
+"""Add booking appointment time index
+
+Revision ID: a342fe3c1056
+Revises: ec378d5fee20
+Create Date: 2026-10-18 08:20:58.995777
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a342fe3c1056'
+down_revision = 'ec378d5fee20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_appointment_time_id', ['appointment_time', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_appointment_time_id')
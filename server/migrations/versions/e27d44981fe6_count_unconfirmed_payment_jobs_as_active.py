@@ -0,0 +1,37 @@
+"""Count unconfirmed payment jobs as active
+
+Revision ID: e27d44981fe6
+Revises: 4651f5af8cf1
+Create Date: 2026-10-18 09:54:57.083797
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e27d44981fe6'
+down_revision = '4651f5af8cf1'
+branch_labels = None
+depends_on = None
+
+
+OLD_WHERE = "status IN ('queued', 'running')"
+NEW_WHERE = "status IN ('queued', 'running', 'unconfirmed')"
+
+
+def _replace_index(where):
+    with op.batch_alter_table('payment_job', schema=None) as batch_op:
+        batch_op.drop_index('uq_payment_job_active_booking')
+        batch_op.create_index('uq_payment_job_active_booking', ['booking_id'], unique=True,
+                              postgresql_where=sa.text(where), sqlite_where=sa.text(where))
+
+
+def upgrade():
+    _replace_index(NEW_WHERE)
+
+
+def downgrade():
+    # Unconfirmed jobs become failed ones: the old code has no way to settle them.
+    op.execute("UPDATE payment_job SET status = 'failed' WHERE status = 'unconfirmed'")
+    _replace_index(OLD_WHERE)
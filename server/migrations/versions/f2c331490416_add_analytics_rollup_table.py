@@ -0,0 +1,46 @@
+"""Add analytics rollup table
+
+Revision ID: f2c331490416
+Revises: 562308be628a
+Create Date: 2026-10-18 08:25:12.446520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c331490416'
+down_revision = '562308be628a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analytics_rollup',
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('scope_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'scope_id')
+    )
+
+    # Backfill from existing data; `flask --app app rebuild-rollups` does the same later on.
+    booking_totals = (
+        "SELECT {scope}, {key}, COUNT(booking.id), COALESCE(SUM(service.price), 0) "
+        "FROM booking JOIN service ON service.id = booking.service_id {where} {group_by}"
+    )
+    insert = "INSERT INTO analytics_rollup (scope, scope_id, item_count, amount) "
+    op.execute(insert + booking_totals.format(scope="'bookings'", key="0", where="", group_by=""))
+    op.execute(insert + booking_totals.format(
+        scope="'paid_bookings'", key="0", where="WHERE booking.payment_status = 'successful'", group_by=""))
+    op.execute(insert + booking_totals.format(
+        scope="'service'", key="booking.service_id", where="", group_by="GROUP BY booking.service_id"))
+    op.execute(insert + booking_totals.format(
+        scope="'stylist'", key="booking.stylist_id", where="", group_by="GROUP BY booking.stylist_id"))
+    op.execute(insert + "SELECT 'customers', 0, COUNT(id), 0 FROM customer")
+    op.execute(insert + "SELECT 'stylists', 0, COUNT(id), 0 FROM stylist")
+
+
+def downgrade():
+    op.drop_table('analytics_rollup')
@@ -1,7 +1,14 @@
+from datetime import timedelta
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import sqlite
 from sqlalchemy_serializer import SerializerMixin
 
-db = SQLAlchemy()
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+SQLITE_SECONDS_FORMAT = "%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
 
 # Association table for many-to-many relationship between Stylists and Services
 stylist_service = db.Table(
@@ -37,6 +44,7 @@ class Service(db.Model, SerializerMixin):
     description = db.Column(db.String(255), nullable=True)
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(255), nullable=True)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=60, server_default="60")
 
     bookings = db.relationship(
         "Booking",
@@ -44,14 +52,25 @@ class Service(db.Model, SerializerMixin):
         cascade="all, delete-orphan"
     )
 
+    def ends_at(self, start):
+        return start + timedelta(minutes=self.duration_minutes or 60)
+
 # ----------------- STYLIST -----------------
 class Stylist(db.Model, SerializerMixin):
     __tablename__ = "stylist"
-    serialize_rules = ("-services.stylists", "-bookings.stylist", "-bookings.customer", "-bookings.service")
+    serialize_rules = ("-services.stylists", "-bookings.stylist", "-bookings.customer", "-bookings.service", "-working_hours.stylist")
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     bio = db.Column(db.String(255), nullable=True)
+    # Maintained by ReviewList.post; rating_average is stored so top-rated can walk an index.
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_average = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_stylist_rating_average", "rating_average", "rating_count", "id"),
+    )
 
     services = db.relationship(
         "Service",
@@ -65,12 +84,45 @@ class Stylist(db.Model, SerializerMixin):
         cascade="all, delete-orphan"
     )
 
+    working_hours = db.relationship(
+        "StylistWorkingHours",
+        back_populates="stylist",
+        cascade="all, delete-orphan",
+        order_by="[StylistWorkingHours.weekday, StylistWorkingHours.opens_at]"
+    )
+
+# ----------------- STYLIST WORKING HOURS -----------------
+class StylistWorkingHours(db.Model, SerializerMixin):
+    """One working window for a stylist on a weekday (0 = Monday). A day may have several."""
+    __tablename__ = "stylist_working_hours"
+    serialize_rules = ("-stylist",)
+
+    id = db.Column(db.Integer, primary_key=True)
+    stylist_id = db.Column(db.Integer, db.ForeignKey("stylist.id"), nullable=False, index=True)
+    weekday = db.Column(db.Integer, nullable=False)
+    opens_at = db.Column(db.Time, nullable=False)
+    closes_at = db.Column(db.Time, nullable=False)
+
+    stylist = db.relationship("Stylist", back_populates="working_hours")
+
 class Booking(db.Model, SerializerMixin):
     __tablename__ = "booking"
     serialize_rules = ("-customer.bookings", "-stylist.bookings", "-bookings.service")
+    __table_args__ = (
+        # A stylist can only hold one booking per start time; the database enforces it.
+        db.UniqueConstraint("stylist_id", "appointment_time", name="uq_booking_stylist_appointment"),
+        # A customer's own bookings in appointment order (GET /bookings); also serves customer_id lookups.
+        db.Index("ix_booking_customer_appointment_time", "customer_id", "appointment_time"),
+        db.Index("ix_booking_payment_intent_id", "payment_intent_id"),
+        # Keyset pagination order for the admin booking list.
+        db.Index("ix_booking_appointment_time_id", "appointment_time", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     appointment_time = db.Column(db.DateTime, nullable=False)
+    # appointment_time plus the service duration. Overlaps are rejected by the database:
+    # an exclusion constraint on PostgreSQL and triggers on SQLite (see migrations).
+    end_time = db.Column(db.DateTime, nullable=False)
     payment_status = db.Column(db.String(50), default="pending", nullable=False)
     payment_intent_id = db.Column(db.String(255), nullable=True)
 
@@ -92,10 +144,118 @@ class Review(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Integer, nullable=False) # 1-5 stars
     comment = db.Column(db.String(500), nullable=True)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    # SQLite's CURRENT_TIMESTAMP has no fractional seconds; bind cursor values in the same
+    # text format so keyset comparisons in StylistReviews line up with stored values.
+    created_at = db.Column(
+        db.DateTime().with_variant(sqlite.DATETIME(storage_format=SQLITE_SECONDS_FORMAT), "sqlite"),
+        server_default=db.func.now()
+    )
 
     customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=False)
     stylist_id = db.Column(db.Integer, db.ForeignKey("stylist.id"), nullable=False)
 
     customer = db.relationship("Customer", backref=db.backref("reviews", lazy=True))
     stylist = db.relationship("Stylist", backref=db.backref("reviews", lazy=True))
+
+    __table_args__ = (
+        db.Index("ix_review_stylist_created_at", "stylist_id", "created_at", "id"),
+    )
+
+
+# ----------------- CACHE VERSION -----------------
+class CacheVersion(db.Model):
+    """Shared version counters for process-local caches (see cache.py)."""
+    __tablename__ = "cache_version"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ----------------- ANALYTICS ROLLUP -----------------
+class AnalyticsRollup(db.Model):
+    """Incrementally maintained analytics counters (see rollups.py)."""
+    __tablename__ = "analytics_rollup"
+
+    scope = db.Column(db.String(20), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class AnalyticsBucket(db.Model):
+    """Booking totals for one closed period, cached by timeseries.py.
+
+    scope is "all" (scope_id 0), "stylist" or "service". Every computed period has an
+    "all" row, even with no bookings, which marks the period as cached.
+    """
+    __tablename__ = "analytics_bucket"
+
+    granularity = db.Column(db.String(10), primary_key=True)
+    period_start = db.Column(db.DateTime, primary_key=True)
+    scope = db.Column(db.String(20), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    booking_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    paid_count = db.Column(db.Integer, nullable=False, default=0)
+    paid_revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+# ----------------- PAYMENT JOB -----------------
+class PaymentJob(db.Model, SerializerMixin):
+    """A queued STK push for a booking, drained by worker.py (see payment_jobs.py)."""
+    __tablename__ = "payment_job"
+    serialize_only = ("id", "booking_id", "status", "attempts", "last_error", "checkout_request_id",
+                      "created_at", "updated_at")
+    __table_args__ = (
+        db.Index("ix_payment_job_status_run_at", "status", "run_at"),
+        # At most one active job (payment_jobs.ACTIVE_STATUSES) per booking, even for concurrent requests.
+        db.Index("uq_payment_job_active_booking", "booking_id", unique=True,
+                 postgresql_where=db.text("status IN ('queued', 'running', 'unconfirmed')"),
+                 sqlite_where=db.text("status IN ('queued', 'running', 'unconfirmed')")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey("booking.id", ondelete="CASCADE"), nullable=False, index=True)
+    phone_number = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+    # queued -> running -> succeeded | failed | unconfirmed (running goes back to queued on a retryable
+    # error; unconfirmed ends succeeded when a callback matches it, or failed when it expires)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    checkout_request_id = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    booking = db.relationship("Booking")
+
+
+# ----------------- M-PESA CALLBACK INBOX -----------------
+class MpesaCallbackRecord(db.Model):
+    """A received STK callback, stored once per CheckoutRequestID and applied by worker.py
+    (see payment_callbacks.py). Rows are only ever inserted and then marked processed."""
+    __tablename__ = "mpesa_callback"
+    __table_args__ = (
+        db.Index("ix_mpesa_callback_processed_at_retry_at", "processed_at", "retry_at"),
+        db.Index("ix_mpesa_callback_receipt_number", "receipt_number"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    checkout_request_id = db.Column(db.String(255), unique=True, nullable=True)
+    merchant_request_id = db.Column(db.String(255), nullable=True)
+    result_code = db.Column(db.Integer, nullable=True)
+    result_desc = db.Column(db.String(255), nullable=True)
+    # CallbackMetadata of successful payments, kept for reconciliation.
+    receipt_number = db.Column(db.String(50), nullable=True)
+    amount = db.Column(db.Float, nullable=True)
+    phone_number = db.Column(db.String(20), nullable=True)
+    transaction_date = db.Column(db.DateTime, nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    # When the worker next tries an unprocessed callback; pushed back while no booking matches.
+    retry_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    processed_at = db.Column(db.DateTime, nullable=True)
+    # The booking it was applied to; NULL when no booking had this CheckoutRequestID.
+    booking_id = db.Column(db.Integer, db.ForeignKey("booking.id", ondelete="SET NULL"), nullable=True)
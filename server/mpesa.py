@@ -1,29 +1,183 @@
+import base64
+import os
+import threading
+import time
+from datetime import datetime
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-import os
 from dotenv import load_dotenv
 
+from metrics import registry
+
 load_dotenv()
 
-def get_mpesa_access_token():
-    consumer_key = os.getenv("MPESA_CONSUMER_KEY")
-    consumer_secret = os.getenv("MPESA_CONSUMER_SECRET")
-    if not consumer_key or not consumer_secret:
-        return None, "MPESA_CONSUMER_KEY or MPESA_CONSUMER_SECRET is missing"
+DEFAULT_BASE_URL = "https://sandbox.safaricom.co.ke"
 
-    base_url = os.getenv("MPESA_BASE_URL", "https://sandbox.safaricom.co.ke").rstrip("/")
-    api_url = f"{base_url}/oauth/v1/generate?grant_type=client_credentials"
 
-    try:
-        response = requests.get(api_url, auth=HTTPBasicAuth(consumer_key, consumer_secret))
-        response.raise_for_status()
-        body = response.json()
+class MpesaAuthError(Exception):
+    """The OAuth token could not be obtained; the message carries the details."""
+
+
+class MpesaConfigError(Exception):
+    """Required STK push settings are missing from the environment."""
+
+
+def stk_push_settings():
+    shortcode = os.getenv("MPESA_SHORTCODE")
+    passkey = os.getenv("MPESA_PASSKEY")
+    callback_url = os.getenv("MPESA_CALLBACK_URL") or (
+        f"{os.getenv('BASE_URL')}/mpesa-callback" if os.getenv("BASE_URL") else None
+    )
+    if not shortcode or not passkey or not callback_url:
+        raise MpesaConfigError("M-Pesa config missing: MPESA_SHORTCODE, MPESA_PASSKEY, or MPESA_CALLBACK_URL")
+    return shortcode, passkey, callback_url
+
+
+def build_stk_push_payload(amount, phone_number, booking_id):
+    """Daraja CustomerPayBillOnline request. The password embeds the send time, so build it just before sending."""
+    shortcode, passkey, callback_url = stk_push_settings()
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    password = base64.b64encode(f"{shortcode}{passkey}{timestamp}".encode()).decode()
+    return {
+        "BusinessShortCode": shortcode,
+        "Password": password,
+        "Timestamp": timestamp,
+        "TransactionType": "CustomerPayBillOnline",
+        "Amount": amount,
+        "PartyA": phone_number,
+        "PartyB": shortcode,
+        "PhoneNumber": phone_number,
+        "CallBackURL": callback_url,
+        "AccountReference": f"Booking {booking_id}",
+        "TransactionDesc": f"Payment for booking {booking_id}",
+    }
+
+
+class MpesaClient:
+    """Daraja API client with a cached OAuth token and a pooled keep-alive session.
+
+    The token is reused until `refresh_margin` seconds before Daraja says it
+    expires. Refreshes happen under a lock so concurrent callers wait for a
+    single OAuth request instead of each issuing their own.
+    """
+
+    def __init__(self, consumer_key, consumer_secret, base_url=DEFAULT_BASE_URL,
+                 connect_timeout=3.05, read_timeout=30.0, pool_size=10, refresh_margin=60.0):
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.refresh_margin = refresh_margin
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            consumer_key=os.getenv("MPESA_CONSUMER_KEY"),
+            consumer_secret=os.getenv("MPESA_CONSUMER_SECRET"),
+            base_url=os.getenv("MPESA_BASE_URL", DEFAULT_BASE_URL),
+            connect_timeout=float(os.getenv("MPESA_CONNECT_TIMEOUT", "3.05")),
+            read_timeout=float(os.getenv("MPESA_READ_TIMEOUT", "30")),
+            pool_size=int(os.getenv("MPESA_POOL_SIZE", "10")),
+        )
+
+    def _request(self, operation, method, url, **kwargs):
+        """Send a Daraja request, recording its latency by operation and outcome."""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            registry.observe("mpesa_request_duration_seconds", {"operation": operation, "outcome": outcome},
+                             time.perf_counter() - started)
+
+    def _token_is_fresh(self):
+        return self._token is not None and time.monotonic() < self._token_expires_at
+
+    def access_token(self):
+        if self._token_is_fresh():
+            return self._token
+        with self._token_lock:
+            if not self._token_is_fresh():
+                self._refresh_token()
+            return self._token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0.0
+
+    def _refresh_token(self):
+        if not self.consumer_key or not self.consumer_secret:
+            raise MpesaAuthError("MPESA_CONSUMER_KEY or MPESA_CONSUMER_SECRET is missing")
+
+        api_url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
+        try:
+            response = self._request(
+                "oauth", "GET", api_url, auth=HTTPBasicAuth(self.consumer_key, self.consumer_secret)
+            )
+            response.raise_for_status()
+            body = response.json()
+        except requests.exceptions.RequestException as e:
+            details = ""
+            if e.response is not None:
+                details = f" | status={e.response.status_code} body={e.response.text}"
+            raise MpesaAuthError(f"Error getting M-Pesa access token: {e}{details}") from e
+        except ValueError as e:
+            raise MpesaAuthError(f"Token response is not JSON: {e}") from e
+
         token = body.get("access_token")
         if not token:
-            return None, f"Token response missing access_token: {body}"
-        return token, None
-    except requests.exceptions.RequestException as e:
-        details = ""
-        if e.response is not None:
-            details = f" | status={e.response.status_code} body={e.response.text}"
-        return None, f"Error getting M-Pesa access token: {e}{details}"
+            raise MpesaAuthError(f"Token response missing access_token: {body}")
+        try:
+            expires_in = float(body.get("expires_in", 3599))
+        except (TypeError, ValueError):
+            expires_in = 3599.0
+        self._token = token
+        self._token_expires_at = time.monotonic() + max(expires_in - self.refresh_margin, 0.0)
+
+    def stk_push(self, payload):
+        """Send an STK push request. Raises MpesaAuthError or requests' RequestException."""
+        api_url = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
+        response = None
+        for attempt in range(2):
+            headers = {"Authorization": f"Bearer {self.access_token()}"}
+            response = self._request("stk_push", "POST", api_url, json=payload, headers=headers)
+            # A token revoked before its advertised expiry: refresh once and retry.
+            if response.status_code == 401 and attempt == 0:
+                self.invalidate_token()
+                continue
+            break
+        response.raise_for_status()
+        return response.json()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_mpesa_client():
+    """Process-wide client so the token cache and connection pool are shared."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MpesaClient.from_env()
+    return _client
+
+
+def get_mpesa_access_token():
+    try:
+        return get_mpesa_client().access_token(), None
+    except MpesaAuthError as e:
+        return None, str(e)
@@ -0,0 +1,68 @@
+"""Helpers for keyset (cursor) pagination and list query arguments."""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class InvalidQueryArgument(ValueError):
+    """Raised when a list query argument cannot be parsed."""
+
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Decode a cursor produced by `encode_cursor`, converting each part to `types`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, values)
+        )
+    except (ValueError, TypeError):
+        raise InvalidQueryArgument("Invalid cursor") from None
+
+
+def parse_limit(value, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidQueryArgument("limit must be an integer") from None
+    if limit < 1:
+        raise InvalidQueryArgument("limit must be positive")
+    return min(limit, maximum)
+
+
+def parse_int(value, name: str):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):  # TypeError: a JSON list or object
+        raise InvalidQueryArgument(f"{name} must be an integer") from None
+
+
+def parse_datetime(value, name: str, end_of_day: bool = False):
+    """Parse an ISO date or datetime. A bare date used as an upper bound covers that whole day."""
+    if value in (None, ""):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidQueryArgument(f"{name} must be an ISO date or datetime") from None
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
@@ -0,0 +1,162 @@
+"""Password hashing on a bounded process pool.
+
+bcrypt is deliberately CPU-bound, so hashing on the request thread lets a burst
+of logins starve every other request in the worker. `PasswordHasher` runs it in
+a small pool of separate processes and refuses work with `HasherBusy` once too
+many requests are already waiting, so callers can answer 503 instead of piling
+up. The work factor comes from BCRYPT_LOG_ROUNDS or, when that is unset, is
+calibrated by `init_app()` at startup to the largest cost that hashes within
+BCRYPT_TARGET_MS on this host. A pool whose process died is replaced on the next
+request.
+"""
+
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+CALIBRATION_ROUNDS = 8
+
+
+class HasherBusy(Exception):
+    """Too many password operations are already queued."""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _check(password, password_hash):
+    try:
+        return bcrypt.checkpw(password.encode(), password_hash.encode())
+    except ValueError:  # not a bcrypt hash
+        return False
+
+
+def hash_rounds(password_hash):
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def calibrate(target_ms):
+    """Largest cost (within MIN_ROUNDS..MAX_ROUNDS) whose hash takes at most `target_ms`."""
+    salt = bcrypt.gensalt(CALIBRATION_ROUNDS)
+    samples = []
+    for _ in range(3):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration", salt)
+        samples.append(time.perf_counter() - started)
+    # Each extra round doubles the work.
+    baseline_ms = min(samples) * 1000
+    rounds = CALIBRATION_ROUNDS + int(math.floor(math.log2(target_ms / baseline_ms)))
+    return max(MIN_ROUNDS, min(rounds, MAX_ROUNDS))
+
+
+def init_app(app):
+    """Settle the bcrypt cost at startup, so calibration never runs on a request thread."""
+    if app.config["BCRYPT_LOG_ROUNDS"] is None:
+        app.config["BCRYPT_LOG_ROUNDS"] = calibrate(app.config["BCRYPT_TARGET_MS"])
+        logger.info("bcrypt cost calibrated to %s for a %sms target",
+                    app.config["BCRYPT_LOG_ROUNDS"], app.config["BCRYPT_TARGET_MS"])
+
+
+class PasswordHasher:
+    def __init__(self, rounds, workers=2, max_queue=32, timeout=10.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            rounds=config["BCRYPT_LOG_ROUNDS"],
+            workers=config["PASSWORD_HASH_WORKERS"],
+            max_queue=config["PASSWORD_HASH_MAX_QUEUE"],
+            timeout=config["PASSWORD_HASH_TIMEOUT"],
+        )
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: forking a threaded gunicorn worker is unsafe.
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+
+    def _discard(self, pool):
+        """Drop a broken pool so the next request builds a new one (unless another already did)."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        pool = self._executor()
+        try:
+            future = pool.submit(fn, *args)
+        except BaseException as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._discard(pool)
+                raise HasherBusy() from None
+            raise
+        # The slot stays taken until the hash finishes, even if this request stops waiting.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy() from None
+        except BrokenProcessPool:
+            # A hashing process died (e.g. killed for memory); every queued future fails with it.
+            self._discard(pool)
+            raise HasherBusy() from None
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def check(self, password_hash, password):
+        return self._run(_check, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        # Only ever raise the cost: processes that calibrated differently must not undo each other.
+        rounds = hash_rounds(password_hash)
+        return rounds is None or rounds < self.rounds
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    """Process-wide hasher configured from the current app, so its pool is shared."""
+    global _hasher
+    if _hasher is None:
+        from flask import current_app
+
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher.from_config(current_app.config)
+    return _hasher
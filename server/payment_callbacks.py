@@ -0,0 +1,182 @@
+"""Inbox for Daraja STK callbacks, applied to bookings in batches by worker.py.
+
+`record()` is all the callback endpoint does: one `INSERT ... ON CONFLICT DO
+NOTHING` keyed on CheckoutRequestID, so Safaricom's retries are acknowledged
+without touching bookings again. `apply_pending()` claims unprocessed callbacks,
+sets the payment status of all their bookings with a single `UPDATE ... CASE`,
+adjusts the rollups once, and marks the callbacks processed.
+
+A callback can beat the payment job that records its CheckoutRequestID on the
+booking; such callbacks stay pending and are retried every
+MPESA_CALLBACK_RETRY_INTERVAL seconds until MPESA_CALLBACK_MATCH_WINDOW seconds
+have passed, then closed unmatched. Callbacks are claimed in `retry_at` order,
+so waiting ones (or a flood of bogus CheckoutRequestIDs) never hold up newer
+callbacks.
+
+A push whose outcome was unknown (an "unconfirmed" payment job, see
+payment_jobs.py) never got a CheckoutRequestID back. A callback that matches no
+booking is given to the oldest unconfirmed job with the same phone number and
+amount, whose booking then takes the callback's CheckoutRequestID.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import payment_events
+import rollups
+from models import Booking, MpesaCallbackRecord, PaymentJob, Service, db
+
+logger = logging.getLogger(__name__)
+
+METADATA_FIELDS = {
+    "MpesaReceiptNumber": "receipt_number",
+    "Amount": "amount",
+    "PhoneNumber": "phone_number",
+    "TransactionDate": "transaction_date",
+}
+
+
+def _metadata(stk_callback):
+    values = {}
+    for item in stk_callback.get("CallbackMetadata", {}).get("Item", []):
+        column = METADATA_FIELDS.get(item.get("Name"))
+        if column is None or item.get("Value") is None:
+            continue
+        value = item["Value"]
+        try:
+            if column == "amount":
+                value = float(value)
+            elif column == "transaction_date":
+                value = datetime.strptime(str(value), "%Y%m%d%H%M%S")
+            else:
+                value = str(value)
+        except ValueError:
+            continue
+        values[column] = value
+    return values
+
+
+def record(data):
+    """Store a callback body unless its CheckoutRequestID was already received.
+
+    Returns the stored row's values, or None for a duplicate.
+    """
+    stk_callback = data.get("Body", {}).get("stkCallback", {})
+    result_code = stk_callback.get("ResultCode")
+    now = datetime.now()
+    values = {
+        "checkout_request_id": stk_callback.get("CheckoutRequestID"),
+        "merchant_request_id": stk_callback.get("MerchantRequestID"),
+        "result_code": int(result_code) if str(result_code).lstrip("-").isdigit() else None,
+        "result_desc": str(stk_callback.get("ResultDesc", ""))[:255] or None,
+        "payload": json.dumps(data),
+        "received_at": now,
+        "retry_at": now,
+        **_metadata(stk_callback),
+    }
+    insert = postgresql.insert if db.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(MpesaCallbackRecord).values(values).on_conflict_do_nothing(
+        index_elements=[MpesaCallbackRecord.checkout_request_id]
+    )
+    result = db.session.execute(statement)
+    db.session.commit()
+    return values if result.rowcount else None
+
+
+def _settle_unconfirmed_jobs(callbacks):
+    """Match callbacks to unconfirmed payment jobs by payer. Returns how many were matched."""
+    payers = {}
+    for callback in callbacks:
+        if callback.phone_number and callback.amount is not None:
+            payers.setdefault((callback.phone_number, int(callback.amount)), callback.checkout_request_id)
+    if not payers:
+        return 0
+    jobs = db.session.execute(
+        select(PaymentJob.id, PaymentJob.booking_id, PaymentJob.phone_number, PaymentJob.amount)
+        .where(PaymentJob.status == "unconfirmed", PaymentJob.phone_number.in_({phone for phone, _ in payers}))
+        .order_by(PaymentJob.id)
+    ).all()
+    matched = 0
+    for job in jobs:
+        checkout_request_id = payers.get((job.phone_number, job.amount))
+        if checkout_request_id is None:
+            continue
+        # The status guard loses to payment_jobs.expire_unconfirmed() if it got there first.
+        result = db.session.execute(
+            update(PaymentJob)
+            .where(PaymentJob.id == job.id, PaymentJob.status == "unconfirmed")
+            .values(status="succeeded", checkout_request_id=checkout_request_id)
+        )
+        if not result.rowcount:
+            continue
+        db.session.execute(
+            update(Booking).where(Booking.id == job.booking_id).values(payment_intent_id=checkout_request_id)
+        )
+        del payers[(job.phone_number, job.amount)]
+        matched += 1
+    return matched
+
+
+def apply_pending(limit):
+    """Apply up to `limit` due callbacks. Returns how many were claimed (closed or deferred)."""
+    now = datetime.now()
+    query = select(MpesaCallbackRecord) \
+        .where(MpesaCallbackRecord.processed_at.is_(None), MpesaCallbackRecord.retry_at <= now) \
+        .order_by(MpesaCallbackRecord.retry_at, MpesaCallbackRecord.id).limit(limit)
+    if db.session.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    callbacks = db.session.execute(query).scalars().all()
+    if not callbacks:
+        db.session.commit()
+        return 0
+
+    statuses = {
+        callback.checkout_request_id: "successful" if callback.result_code == 0 else "incomplete"
+        for callback in callbacks if callback.checkout_request_id
+    }
+    booking_query = select(Booking.id, Booking.payment_intent_id, Booking.payment_status,
+                           Booking.appointment_time, Service.price) \
+        .join(Service, Service.id == Booking.service_id) \
+        .where(Booking.payment_intent_id.in_(statuses))
+    if db.session.get_bind().dialect.name == "postgresql":
+        booking_query = booking_query.with_for_update(of=Booking)
+    bookings = db.session.execute(booking_query).all()
+    known = {booking.payment_intent_id for booking in bookings}
+    if _settle_unconfirmed_jobs([callback for callback in callbacks
+                                 if callback.checkout_request_id in statuses
+                                 and callback.checkout_request_id not in known]):
+        bookings = db.session.execute(booking_query).all()
+
+    if bookings:
+        db.session.execute(
+            update(Booking)
+            .where(Booking.id.in_([booking.id for booking in bookings]))
+            .values(payment_status=case(statuses, value=Booking.payment_intent_id))
+            .execution_options(synchronize_session=False)
+        )
+        rollups.payment_statuses_changed(
+            (booking.payment_status, statuses[booking.payment_intent_id], booking.price, booking.appointment_time)
+            for booking in bookings
+        )
+        for booking in bookings:
+            payment_events.notify(booking.id, statuses[booking.payment_intent_id])
+
+    matched = {booking.payment_intent_id: booking.id for booking in bookings}
+    give_up_before = now - timedelta(seconds=current_app.config["MPESA_CALLBACK_MATCH_WINDOW"])
+    retry_at = now + timedelta(seconds=current_app.config["MPESA_CALLBACK_RETRY_INTERVAL"])
+    for callback in callbacks:
+        booking_id = matched.get(callback.checkout_request_id)
+        if booking_id is None and callback.checkout_request_id and callback.received_at > give_up_before:
+            callback.retry_at = retry_at
+            continue
+        callback.booking_id = booking_id
+        callback.processed_at = now
+        if booking_id is None:
+            logger.warning("M-Pesa callback %s matched no booking", callback.checkout_request_id)
+    db.session.commit()
+    return len(callbacks)
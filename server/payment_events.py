@@ -0,0 +1,157 @@
+"""Fan-out of booking payment status changes to waiting HTTP clients.
+
+Each worker process runs one watcher thread for all of its waiting clients. On
+PostgreSQL the watcher LISTENs for the NOTIFY that `notify()` issues alongside
+the status update; elsewhere it polls the statuses of every waited-on booking
+with one query per interval. Either way the number of database round trips
+does not grow with the number of waiting clients.
+
+Each waiting client still holds a gunicorn thread, so a process admits at most
+PAYMENT_STATUS_MAX_WAITERS of them (`reserve()`) and the rest are turned away
+with a 503, leaving threads free for ordinary requests.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+
+from sqlalchemy import select, text
+
+from models import Booking, db
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "booking_payment_status"
+POLL_CHUNK = 500
+
+
+def notify(booking_id, status):
+    """Announce a status change; delivered to listeners when the transaction commits."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text("SELECT pg_notify(:channel, :payload)"),
+                           {"channel": CHANNEL, "payload": f"{booking_id}:{status}"})
+
+
+class _Waiter:
+    __slots__ = ("baseline", "status", "event")
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.status = None
+        self.event = threading.Event()
+
+
+class PaymentStatusBroker:
+    def __init__(self, app, poll_interval=1.0, safety_poll_interval=15.0, max_waiters=16):
+        self._app = app
+        self._slots = threading.BoundedSemaphore(max_waiters)
+        self.poll_interval = poll_interval
+        self.safety_poll_interval = safety_poll_interval
+        self._waiters = defaultdict(list)
+        self._lock = threading.Lock()
+        self._has_waiters = threading.Condition(self._lock)
+        self._thread = None
+
+    def reserve(self):
+        """Claim a waiting slot without blocking; False when all are taken. Pair with `release()`."""
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        self._slots.release()
+
+    def wait(self, booking_id, baseline, timeout):
+        """Block until the booking's status differs from `baseline`; None on timeout."""
+        waiter = _Waiter(baseline)
+        with self._lock:
+            self._waiters[booking_id].append(waiter)
+            self._start()
+            self._has_waiters.notify()
+        try:
+            waiter.event.wait(timeout)
+            return waiter.status
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(booking_id, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(booking_id, None)
+
+    def publish(self, booking_id, status):
+        with self._lock:
+            for waiter in self._waiters.get(booking_id, ()):
+                if status != waiter.baseline:
+                    waiter.status = status
+                    waiter.event.set()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="payment-status-watcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self._app.app_context():
+            postgres = db.engine.url.get_backend_name() == "postgresql"
+        while True:
+            try:
+                if postgres:
+                    self._listen()
+                else:
+                    self._poll_forever()
+            except Exception:
+                logger.exception("Payment status watcher failed; restarting")
+                threading.Event().wait(self.poll_interval)
+
+    def _poll_forever(self):
+        while True:
+            with self._lock:
+                while not self._waiters:
+                    self._has_waiters.wait()
+            self.poll_once()
+            threading.Event().wait(self.poll_interval)
+
+    def poll_once(self):
+        with self._lock:
+            booking_ids = list(self._waiters)
+        if not booking_ids:
+            return
+        with self._app.app_context():
+            for start in range(0, len(booking_ids), POLL_CHUNK):
+                chunk = booking_ids[start:start + POLL_CHUNK]
+                rows = db.session.execute(
+                    select(Booking.id, Booking.payment_status).where(Booking.id.in_(chunk))
+                ).all()
+                for booking_id, status in rows:
+                    self.publish(booking_id, status)
+            db.session.remove()
+
+    def _listen(self):
+        import psycopg
+
+        with self._app.app_context():
+            dsn = db.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        with psycopg.connect(dsn, autocommit=True) as connection:
+            connection.execute(f"LISTEN {CHANNEL}")
+            # Catch changes made while we were not yet (or no longer) listening.
+            self.poll_once()
+            while True:
+                for notification in connection.notifies(timeout=self.safety_poll_interval):
+                    booking_id, _, status = notification.payload.partition(":")
+                    if booking_id.isdigit():
+                        self.publish(int(booking_id), status)
+                # NOTIFY is not durable across reconnects; an occasional poll covers gaps.
+                self.poll_once()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker(app):
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = PaymentStatusBroker(app, poll_interval=app.config["PAYMENT_STATUS_POLL_INTERVAL"],
+                                              max_waiters=app.config["PAYMENT_STATUS_MAX_WAITERS"])
+    return _broker
@@ -0,0 +1,192 @@
+"""Durable STK push queue stored in the `payment_job` table.
+
+`InitiateMpesaPayment` only enqueues a job; `worker.py` claims due jobs, sends
+them to Daraja with bounded concurrency, and writes the outcome back onto the
+booking. Only errors that show the push never reached Daraja (connection
+failures, a missing token) and 429s are retried, with exponential backoff; other
+Daraja rejections fail the job immediately.
+
+A read timeout, a 5xx after the request was sent or an unreadable response leaves
+the outcome unknown: the customer may already have the prompt, so pushing again
+could charge them twice. Such jobs become "unconfirmed" with the booking pending,
+and the callback inbox (payment_callbacks.py) settles them by phone number and
+amount. `expire_unconfirmed()` fails the ones still unmatched after
+MPESA_CALLBACK_MATCH_WINDOW seconds.
+"""
+
+import logging
+import random
+from datetime import datetime, timedelta
+
+import requests
+import urllib3
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+import payment_events
+import rollups
+from models import PaymentJob, db
+from mpesa import MpesaAuthError, MpesaConfigError, build_stk_push_payload, get_mpesa_client
+
+logger = logging.getLogger(__name__)
+
+# An unconfirmed push may still be answered by a callback, so it blocks a new one too.
+ACTIVE_STATUSES = ("queued", "running", "unconfirmed")
+
+
+def _active_job(booking_id):
+    return PaymentJob.query.filter(
+        PaymentJob.booking_id == booking_id, PaymentJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+
+
+def enqueue(booking, phone_number, amount):
+    """Queue an STK push unless one is already queued or running for the booking."""
+    job = _active_job(booking.id)
+    if job:
+        return job
+    job = PaymentJob(booking_id=booking.id, phone_number=phone_number, amount=amount,
+                     status="queued", run_at=datetime.now())
+    try:
+        # uq_payment_job_active_booking rejects a concurrent request's second job (a double click).
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        return _active_job(booking.id)
+    return job
+
+
+def release_expired_leases():
+    """Requeue jobs whose worker died mid-request (they may be sent twice)."""
+    lease = timedelta(seconds=current_app.config["PAYMENT_JOB_LEASE_SECONDS"])
+    db.session.execute(
+        update(PaymentJob)
+        .where(PaymentJob.status == "running", PaymentJob.locked_at < datetime.now() - lease)
+        .values(status="queued", locked_at=None)
+    )
+    db.session.commit()
+
+
+def claim(limit):
+    """Atomically move up to `limit` due jobs from queued to running and return their ids."""
+    now = datetime.now()
+    candidates = select(PaymentJob.id).where(
+        PaymentJob.status == "queued", PaymentJob.run_at <= now
+    ).order_by(PaymentJob.run_at).limit(limit)
+    if db.session.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    claimed = []
+    for job_id in db.session.execute(candidates).scalars().all():
+        # The status guard makes the claim safe where SKIP LOCKED is unavailable.
+        result = db.session.execute(
+            update(PaymentJob)
+            .where(PaymentJob.id == job_id, PaymentJob.status == "queued")
+            .values(status="running", locked_at=now, attempts=PaymentJob.attempts + 1)
+        )
+        if result.rowcount:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+
+def _retry_delay(attempts):
+    config = current_app.config
+    delay = min(config["PAYMENT_JOB_BACKOFF_BASE"] ** attempts, config["PAYMENT_JOB_BACKOFF_MAX"])
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _outcome(error):
+    """Classify a failed push as "retry", "unconfirmed" (it may have reached Daraja) or "failed"."""
+    if isinstance(error, MpesaAuthError):
+        return "retry"  # no token, so nothing was sent
+    if isinstance(error, MpesaConfigError):
+        return "failed"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # "Connection aborted" can happen after the request was written; other connection errors cannot.
+        reason = error.args[0] if error.args else None
+        return "unconfirmed" if isinstance(reason, urllib3.exceptions.ProtocolError) else "retry"
+    response = error.response if isinstance(error, requests.exceptions.HTTPError) else None
+    if response is not None and response.status_code == 429:
+        return "retry"
+    if response is not None and response.status_code < 500:
+        return "failed"
+    # A read timeout, a 5xx or a body that is not JSON.
+    return "unconfirmed"
+
+
+def _describe(error):
+    response = getattr(error, "response", None)
+    if response is not None:
+        return f"status={response.status_code} body={response.text[:300]}"
+    return str(error)[:500]
+
+
+def _set_payment_status(booking, status):
+    rollups.payment_status_changed(booking.payment_status, status, booking.service.price, booking.appointment_time)
+    booking.payment_status = status
+    payment_events.notify(booking.id, status)
+
+
+def expire_unconfirmed():
+    """Fail unconfirmed jobs that no callback matched in time, so the customer can pay again."""
+    now = datetime.now()
+    expired = db.session.execute(
+        select(PaymentJob.id).where(PaymentJob.status == "unconfirmed", PaymentJob.run_at <= now)
+    ).scalars().all()
+    for job_id in expired:
+        # The status guard skips a job the callback inbox settled in the meantime.
+        result = db.session.execute(
+            update(PaymentJob)
+            .where(PaymentJob.id == job_id, PaymentJob.status == "unconfirmed")
+            .values(status="failed")
+        )
+        if not result.rowcount:
+            continue
+        booking = db.session.get(PaymentJob, job_id).booking
+        if booking.payment_status == "pending":
+            _set_payment_status(booking, "incomplete")
+            logger.error("Payment job %s was never confirmed by a callback", job_id)
+    db.session.commit()
+
+
+def process(job_id):
+    """Send one claimed job to Daraja and record the result. Runs inside an app context."""
+    job = db.session.get(PaymentJob, job_id)
+    if job is None or job.status != "running":
+        return
+    booking = job.booking
+
+    try:
+        payload = build_stk_push_payload(job.amount, job.phone_number, booking.id)
+        response_data = get_mpesa_client().stk_push(payload)
+    except (MpesaAuthError, MpesaConfigError, requests.exceptions.RequestException) as e:
+        job.last_error = _describe(e)
+        outcome = _outcome(e)
+        if outcome == "retry" and job.attempts < current_app.config["PAYMENT_JOB_MAX_ATTEMPTS"]:
+            job.status = "queued"
+            job.run_at = datetime.now() + timedelta(seconds=_retry_delay(job.attempts))
+            logger.warning("Payment job %s attempt %s failed, retrying: %s", job.id, job.attempts, job.last_error)
+        elif outcome == "unconfirmed":
+            job.status = "unconfirmed"
+            # For unconfirmed jobs, run_at is when expire_unconfirmed() gives up on a callback.
+            job.run_at = datetime.now() + timedelta(seconds=current_app.config["MPESA_CALLBACK_MATCH_WINDOW"])
+            _set_payment_status(booking, "pending")
+            logger.warning("Payment job %s outcome unknown, awaiting the callback: %s", job.id, job.last_error)
+        else:
+            job.status = "failed"
+            _set_payment_status(booking, "incomplete")
+            logger.error("Payment job %s failed: %s", job.id, job.last_error)
+        job.locked_at = None
+        db.session.commit()
+        return
+
+    _set_payment_status(booking, "pending")
+    if response_data.get("CheckoutRequestID"):
+        booking.payment_intent_id = response_data["CheckoutRequestID"]
+        job.checkout_request_id = response_data["CheckoutRequestID"]
+    job.status = "succeeded"
+    job.last_error = None
+    job.locked_at = None
+    db.session.commit()
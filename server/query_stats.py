@@ -0,0 +1,138 @@
+"""Per-request SQL accounting: query count, database time and N+1 detection.
+
+Engine events count every statement a request executes and how long it spent in
+the database. Statements are grouped by shape (the SQL text with bound-parameter
+lists collapsed), and a shape repeated SQL_REPEAT_THRESHOLD or more times in one
+request is reported as a likely N+1: usually a lazy relationship load inside a
+loop or `to_dict()`.
+
+Each response gets a `Server-Timing` header (`db` and `app` durations, visible in
+browser devtools) and one structured `sql` log line. With SQL_STRICT enabled, as
+in tests, a request that runs more than its query budget fails with
+`QueryBudgetExceeded` instead; see `query_budget` and SQL_QUERY_BUDGET.
+"""
+
+import functools
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("sql")
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_SELECT_LIST = re.compile(r"^SELECT .+? FROM ")
+_listening = False
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request ran more SQL statements than its budget allows (strict mode only)."""
+
+
+def statement_shape(statement):
+    """SQL text with whitespace normalised and `IN (?, ?, ...)` lists collapsed to `(?)`."""
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _summary(shape):
+    # The column list is rarely what tells two statements apart.
+    return _SELECT_LIST.sub("SELECT ... FROM ", shape)[:300]
+
+
+class RequestQueries:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "queries" in g:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is not None and has_request_context() and "queries" in g:
+        g.queries.record(statement, time.perf_counter() - started)
+
+
+def query_budget(limit):
+    """Override SQL_QUERY_BUDGET for one view (or resource method)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            g.query_budget = limit
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _start_request():
+    g.queries = RequestQueries()
+
+
+def _finish_request(response):
+    queries = g.pop("queries", None)
+    if queries is None:
+        return response
+    config = current_app.config
+    total_ms = (time.perf_counter() - queries.started) * 1000
+    db_ms = queries.seconds * 1000
+    repeated = queries.repeated(config["SQL_REPEAT_THRESHOLD"])
+    budget = g.get("query_budget", config["SQL_QUERY_BUDGET"])
+
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={db_ms:.1f};desc="{queries.count} queries", app;dur={max(total_ms - db_ms, 0):.1f}',
+    )
+    over_budget = budget is not None and queries.count > budget
+    record = {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "queries": queries.count,
+        "db_ms": round(db_ms, 2),
+        "total_ms": round(total_ms, 2),
+    }
+    if budget is not None:
+        record["budget"] = budget
+    if repeated:
+        record["repeated"] = [{"statement": _summary(shape), "count": count} for shape, count in repeated]
+    logger.log(logging.WARNING if repeated or over_budget else logging.INFO, json.dumps(record))
+
+    if over_budget and config["SQL_STRICT"]:
+        raise QueryBudgetExceeded(
+            f"{request.method} {request.path} ran {queries.count} queries (budget {budget})"
+            + "".join(f"\n  {count}x {_summary(shape)}" for shape, count in queries.shapes.most_common(5))
+        )
+    return response
+
+
+def init_app(app):
+    global _listening
+    if not app.config["SQL_INSTRUMENTATION"]:
+        return
+    if not _listening:
+        # On the Engine class, so every engine (including ones created later) is covered.
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listening = True
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
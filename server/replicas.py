@@ -0,0 +1,64 @@
+"""Optional read replicas for read-only resource methods.
+
+With DATABASE_REPLICA_URL set (one or more comma-separated URLs), methods
+decorated with `replica_reads` send their plain SELECTs to a randomly chosen
+replica. Everything else stays on the primary: writes, `SELECT ... FOR UPDATE`,
+raw SQL, undecorated methods, and every statement a session runs after its first
+write, so a request always reads what it has just written. Replicas lag the
+primary, so only decorate methods that can tolerate slightly stale data.
+"""
+
+import functools
+import random
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import CompoundSelect
+
+
+def replica_reads(fn):
+    """Let one view (or resource method) read from a replica, if any are configured."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            g.replica_reads = False
+    return wrapper
+
+
+class RoutingSession(Session):
+    """`db.session` class that sends reads to a replica inside `replica_reads`."""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        # Set by the first write; from then on this session reads from the primary too.
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.wrote = True
+            elif not self.wrote and _is_plain_select(clause) and _replicas_enabled():
+                return random.choice(current_app.extensions["replicas"])
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_plain_select(clause):
+    return isinstance(clause, (Select, CompoundSelect)) and clause._for_update_arg is None
+
+
+def _replicas_enabled():
+    return has_app_context() and g.get("replica_reads", False) and current_app.extensions.get("replicas")
+
+
+def init_app(app):
+    """Create an engine per replica URL; call after `db.init_app`."""
+    options = dict(app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+    # The pool metrics describe the primary's pool only.
+    options.pop("poolclass", None)
+    app.extensions["replicas"] = [sa.create_engine(url, **options) for url in app.config["SQLALCHEMY_REPLICA_URIS"]]
@@ -0,0 +1,1254 @@
+"""REST resources and their URL registration (see `register_resources`)."""
+
+import json
+import logging
+from datetime import datetime, time, timedelta
+
+from flask import Response, current_app, request
+from flask_jwt_extended import jwt_required
+from flask_restful import Resource
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+import availability
+import exports
+import payment_callbacks
+import payment_events
+import rollups
+import search
+import timeseries
+from auth import current_identity, issue_access_token
+from cache import VersionedCache
+from models import db, AnalyticsRollup, Customer, Stylist, StylistWorkingHours, Service, stylist_service, Booking, PaymentJob, Review
+from pagination import (
+    DATETIME_FORMAT,
+    InvalidQueryArgument,
+    decode_cursor,
+    encode_cursor,
+    parse_datetime,
+    parse_int,
+    parse_limit,
+)
+from passwords import HasherBusy, get_hasher
+from query_stats import query_budget
+from replicas import replica_reads
+from serializers import CompiledSerializer, json_response
+
+
+logger = logging.getLogger(__name__)
+
+# Compiled once at import; each matches the corresponding to_dict() output.
+STYLIST_SERIALIZER = CompiledSerializer(Stylist, rules=("-services.stylists", "-bookings.stylist"))
+SERVICE_SERIALIZER = CompiledSerializer(Service)
+NESTED_STYLIST_SERIALIZER = CompiledSerializer(Stylist)
+CUSTOMER_SERIALIZER = CompiledSerializer(Customer)
+TOP_RATED_SERIALIZER = CompiledSerializer(
+    Stylist, only=("id", "name", "bio", "rating_count", "rating_sum", "rating_average")
+)
+
+# ---------------- AUTH ---------------- #
+HASHER_BUSY_RESPONSE = (
+    {"error": "Too many sign-in attempts right now. Please try again shortly."}, 503, {"Retry-After": "2"}
+)
+
+
+def admin_required(fn):
+    """Decorator to check if the user is admin"""
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not current_identity().is_admin:
+            return {"error": "Admin access required"}, 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+class Register(Resource):
+    def post(self):
+        data = request.get_json()
+        if Customer.query.filter_by(phone=data["phone"]).first():
+            return {"error": "Phone already registered"}, 400
+
+        try:
+            hashed_pw = get_hasher().hash(data["password"])
+        except HasherBusy:
+            return HASHER_BUSY_RESPONSE
+        # Always register as customer (is_admin = False)
+        customer = Customer(name=data["name"], phone=data["phone"], password_hash=hashed_pw, is_admin=False)
+        db.session.add(customer)
+        rollups.customer_created()
+        db.session.commit()
+
+        access_token = issue_access_token(customer)
+        return {"customer": customer.to_dict(), "access_token": access_token}, 201
+
+
+class Login(Resource):
+    def post(self):
+        data = request.get_json()
+        customer = Customer.query.filter_by(phone=data["phone"]).first()
+        hasher = get_hasher()
+        try:
+            if not customer or not hasher.check(customer.password_hash, data["password"]):
+                return {"error": "Invalid credentials"}, 401
+            # Hashes made under an older work factor are upgraded while the password is at hand.
+            if hasher.needs_rehash(customer.password_hash):
+                customer.password_hash = hasher.hash(data["password"])
+                db.session.commit()
+        except HasherBusy:
+            return HASHER_BUSY_RESPONSE
+
+        access_token = issue_access_token(customer)
+        return {"customer": customer.to_dict(), "access_token": access_token}, 200
+
+
+class Me(Resource):
+    @jwt_required()
+    def get(self):
+        customer = current_identity().customer
+        if not customer:
+            return {"error": "Customer not found"}, 404
+        
+        # Explicitly include is_admin
+        return {
+            "customer": {
+                "id": customer.id,
+                "name": customer.name,
+                "phone": customer.phone,
+                "is_admin": customer.is_admin
+            }
+        }, 200
+
+
+
+# ---------------- SERVICES ---------------- #
+def _catalog_service(service):
+    return {
+        "id": service.id,
+        "title": service.title,
+        "description": service.description,
+        "price": service.price,
+        "image_url": service.image_url,
+        "duration_minutes": service.duration_minutes,
+    }
+
+
+def build_catalog():
+    """Serialize the public service catalog. Bookings and reviews are not part of it."""
+    services = Service.query.options(
+        selectinload(Service.stylists).selectinload(Stylist.services)
+    ).order_by(Service.id).all()
+    services_data = []
+    for s in services:
+        s_dict = _catalog_service(s)
+        s_dict["stylists"] = [
+            {
+                "id": stylist.id,
+                "name": stylist.name,
+                "bio": stylist.bio,
+                "services": [_catalog_service(offered) for offered in stylist.services],
+            }
+            for stylist in s.stylists
+        ]
+        services_data.append(s_dict)
+    return json.dumps(services_data).encode()
+
+
+_catalog_cache = None
+
+
+def catalog_cache():
+    global _catalog_cache
+    if _catalog_cache is None:
+        _catalog_cache = VersionedCache("catalog", build_catalog, ttl=current_app.config["CATALOG_CACHE_TTL"])
+    return _catalog_cache
+
+
+class ServiceList(Resource):
+
+    @replica_reads
+    def get(self):
+        payload, etag = catalog_cache().get()
+        response = Response(payload, mimetype="application/json")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    @jwt_required()
+    def post(self):
+        data = request.get_json()
+        title = data.get("title")
+        description = data.get("description") or ""
+        price = data.get("price")
+        image_url = data.get("image_url") # Get image_url
+        try:
+            duration_minutes = parse_int(data.get("duration_minutes"), "duration_minutes")
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+        if duration_minutes is None:
+            duration_minutes = 60
+
+        if not title or price is None:
+            return {"error": "Title and price are required"}, 400
+        if duration_minutes <= 0:
+            return {"error": "duration_minutes must be positive"}, 400
+
+        service = Service(title=title, description=description, price=float(price), image_url=image_url, # Pass image_url
+                          duration_minutes=duration_minutes)
+        db.session.add(service)
+        db.session.flush()
+        search.index(service)
+        catalog_cache().bump()
+        db.session.commit()
+        return service.to_dict(), 201
+
+
+class ServiceDetail(Resource):
+    @jwt_required()
+    def get(self, service_id):
+        service = Service.query.options(
+            *SERVICE_SERIALIZER.loader_options(),
+            selectinload(Service.stylists).options(*NESTED_STYLIST_SERIALIZER.loader_options())
+        ).filter_by(id=service_id).first_or_404()
+        s_dict = SERVICE_SERIALIZER.dump(service)
+        s_dict["stylists"] = NESTED_STYLIST_SERIALIZER.dump_many(service.stylists)
+        return json_response(s_dict)
+
+    @jwt_required()
+    def put(self, service_id):
+        service = Service.query.get(service_id)
+        if not service:
+            return {"error": "Service not found"}, 404
+
+        data = request.get_json()
+        # Validate before touching `service`, so a 400 leaves the loaded instance unchanged.
+        try:
+            duration_minutes = parse_int(data.get("duration_minutes"), "duration_minutes")
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+        if duration_minutes is None:
+            duration_minutes = service.duration_minutes
+        if duration_minutes <= 0:
+            return {"error": "duration_minutes must be positive"}, 400
+
+        old_price = service.price
+        service.title = data.get("title", service.title)
+        service.description = data.get("description", service.description)
+        service.price = float(data.get("price", service.price))
+        service.image_url = data.get("image_url", service.image_url) # Update image_url
+        service.duration_minutes = duration_minutes
+
+        rollups.service_repriced(service.id, old_price, service.price)
+        search.index(service)
+        catalog_cache().bump()
+        db.session.commit()
+        return service.to_dict(), 200
+
+    @jwt_required()
+    def delete(self, service_id):
+        service = Service.query.get(service_id)
+        if not service:
+            return {"error": "Service not found"}, 404
+
+        db.session.delete(service)
+        db.session.flush()
+        # Deleting a service cascades to its bookings; rare enough to recount everything.
+        rollups.rebuild()
+        search.remove("service", service_id)
+        catalog_cache().bump()
+        db.session.commit()
+        return {}, 204
+
+# ---------------- BOOKINGS ---------------- #
+class BookingList(Resource):
+    @query_budget(2)
+    @jwt_required()
+    def get(self):
+        """The customer's bookings in cursor pages: `view=upcoming` soonest first, otherwise newest first."""
+        args = request.args
+        view = args.get("view")
+        if view not in (None, "", "upcoming", "past"):
+            return {"error": "view must be upcoming or past"}, 400
+        try:
+            limit = parse_limit(args.get("limit"), default=20, maximum=100)
+            after = decode_cursor(args["cursor"], datetime, int) if args.get("cursor") else None
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+
+        # One joined query per page over the (customer_id, appointment_time) index.
+        query = db.session.query(
+            Booking.id,
+            Booking.appointment_time,
+            Booking.end_time,
+            Booking.payment_status,
+            Booking.stylist_id,
+            Booking.service_id,
+            Stylist.name.label("stylist_name"),
+            Service.title.label("service_name"),
+            Service.price.label("service_price"),
+        ).join(Stylist, Stylist.id == Booking.stylist_id) \
+         .join(Service, Service.id == Booking.service_id) \
+         .filter(Booking.customer_id == current_identity().customer_id)
+
+        now = datetime.now()
+        if view == "upcoming":
+            query = query.filter(Booking.appointment_time >= now)
+        elif view == "past":
+            query = query.filter(Booking.appointment_time < now)
+        if args.get("payment_status"):
+            query = query.filter(Booking.payment_status == args["payment_status"])
+
+        key = tuple_(Booking.appointment_time, Booking.id)
+        if view == "upcoming":
+            if after:
+                query = query.filter(key > after)
+            query = query.order_by(Booking.appointment_time, Booking.id)
+        else:
+            if after:
+                query = query.filter(key < after)
+            query = query.order_by(Booking.appointment_time.desc(), Booking.id.desc())
+
+        rows = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].appointment_time, rows[-1].id)
+
+        bookings_data = []
+        for row in rows:
+            b_dict = row._asdict()
+            b_dict["appointment_time"] = row.appointment_time.strftime(DATETIME_FORMAT)
+            b_dict["end_time"] = row.end_time.strftime(DATETIME_FORMAT)
+            bookings_data.append(b_dict)
+        return {"bookings": bookings_data, "next_cursor": next_cursor}, 200
+
+    @jwt_required()
+    def post(self):
+        data = request.get_json()
+        customer = current_identity().customer
+        stylist = Stylist.query.get(data["stylist_id"])
+        service = Service.query.get(data["service_id"])
+
+        if not customer or not stylist or not service:
+            return {"error": "Invalid booking data"}, 400
+
+        # Check stylist offers this service
+        if service not in stylist.services:
+            return {"error": f"Stylist '{stylist.name}' does not offer '{service.title}'"}, 400
+
+        appointment_time_str = data.get("appointment_time")
+        appointment_time = None
+        if appointment_time_str:
+            try:
+                # parse ISO format from frontend
+                appointment_time = datetime.fromisoformat(appointment_time_str)
+            except ValueError:
+                return {"error": "Invalid datetime format"}, 400
+        else:
+            return {"error": "Appointment time is required"}, 400
+
+        new_booking = Booking(
+            customer_id=customer.id,
+            stylist_id=stylist.id,
+            service_id=service.id,
+            appointment_time=appointment_time,
+            end_time=service.ends_at(appointment_time)
+        )
+        db.session.add(new_booking)
+        # The database rejects overlapping bookings for a stylist, including concurrent ones.
+        try:
+            rollups.booking_created(new_booking, service.price)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return {"error": f"{stylist.name} is already booked at that time. Please choose another time."}, 409
+        return {"booking": new_booking.to_dict()}, 201
+
+
+MAX_BATCH_SLOTS = 52
+RECURRENCE_STEPS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+
+def parse_batch_slots(data):
+    """Appointment start times from `slots` (ISO strings) or a `recurrence` rule.
+
+    A recurrence is {"start", "frequency": "daily"|"weekly", "interval", and
+    either "count" or "until" (a date, inclusive)}.
+    """
+    if data.get("slots") is not None:
+        try:
+            starts = [datetime.fromisoformat(value) for value in data["slots"]]
+        except (TypeError, ValueError):
+            raise ValueError("slots must be a list of ISO datetimes") from None
+    elif data.get("recurrence") is not None:
+        rule = data["recurrence"]
+        try:
+            start = datetime.fromisoformat(rule["start"])
+            step = RECURRENCE_STEPS[rule.get("frequency", "weekly")] * int(rule.get("interval", 1))
+            count = int(rule["count"]) if rule.get("count") is not None else None
+            until = datetime.combine(datetime.fromisoformat(rule["until"]).date(), time.max) \
+                if rule.get("until") is not None else None
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("recurrence needs start, frequency (daily or weekly), "
+                             "an optional interval, and count or until") from None
+        if step <= timedelta(0) or (count is None) == (until is None):
+            raise ValueError("recurrence needs a positive interval and exactly one of count or until")
+        starts = []
+        while len(starts) <= MAX_BATCH_SLOTS and (count is None or len(starts) < count) \
+                and (until is None or start <= until):
+            starts.append(start)
+            start += step
+    else:
+        raise ValueError("Provide either slots or recurrence")
+
+    starts = sorted(set(starts))
+    if not starts:
+        raise ValueError("No appointment times to book")
+    if len(starts) > MAX_BATCH_SLOTS:
+        raise ValueError(f"At most {MAX_BATCH_SLOTS} bookings can be made at once")
+    return starts
+
+
+class BookingBatch(Resource):
+    @jwt_required()
+    def post(self):
+        """Book one stylist and service at many times; conflicting slots are skipped, not fatal."""
+        data = request.get_json() or {}
+        customer_id = current_identity().customer_id
+        try:
+            stylist_id = int(data["stylist_id"])
+            service_id = int(data["service_id"])
+        except (KeyError, TypeError, ValueError):
+            return {"error": "stylist_id and service_id are required"}, 400
+        try:
+            starts = parse_batch_slots(data)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        # Stylist, service and the "offers this service" check in one query.
+        row = db.session.query(Stylist.name, Service.price, Service.duration_minutes) \
+            .join(stylist_service, stylist_service.c.stylist_id == Stylist.id) \
+            .join(Service, Service.id == stylist_service.c.service_id) \
+            .filter(Stylist.id == stylist_id, Service.id == service_id).first()
+        if row is None:
+            return {"error": "Invalid booking data, or the stylist does not offer this service"}, 400
+        duration = timedelta(minutes=row.duration_minutes)
+        slots = [(start, start + duration) for start in starts]
+
+        # A racing booking makes the insert fail; the second pass sees it and skips that slot.
+        for _ in range(2):
+            busy = availability.load_busy([stylist_id], slots[0][0], slots[-1][1]).get(stylist_id)
+            results = []
+            bookings = []
+            taken = []
+            for start, end in slots:
+                if (busy and busy.overlaps(start, end)) or any(s < end and start < e for s, e in taken):
+                    results.append({"appointment_time": start.strftime(DATETIME_FORMAT), "status": "conflict"})
+                    continue
+                booking = Booking(customer_id=customer_id, stylist_id=stylist_id, service_id=service_id,
+                                  appointment_time=start, end_time=end)
+                bookings.append(booking)
+                taken.append((start, end))
+                results.append({"appointment_time": start.strftime(DATETIME_FORMAT), "status": "booked",
+                                "booking": booking})
+            if not bookings:
+                return {"results": results, "booked": 0}, 409
+
+            db.session.add_all(bookings)
+            try:
+                # A single multi-row INSERT ... RETURNING on PostgreSQL; ids are read back here,
+                # before commit expires the objects.
+                db.session.flush()
+                for result in results:
+                    if "booking" in result:
+                        booking = result.pop("booking")
+                        result["booking_id"] = booking.id
+                        result["end_time"] = booking.end_time.strftime(DATETIME_FORMAT)
+                rollups.bookings_created([(booking, row.price) for booking in bookings])
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                continue
+            return {"results": results, "booked": len(bookings)}, 201
+
+        return {"error": f"{row.name} was booked by someone else meanwhile. Please try again."}, 409
+
+
+class BookingResource(Resource):
+    @jwt_required()
+    def put(self, booking_id):
+        current_customer_id = current_identity().customer_id
+        booking = Booking.query.get(booking_id)
+        if not booking:
+            return {"error": "Booking not found"}, 404
+
+        if booking.customer_id != current_customer_id:
+            return {"error": "Unauthorized"}, 403
+
+        data = request.get_json() or {}
+        appointment_time_str = data.get("appointment_time")
+        if not appointment_time_str:
+            return {"error": "Appointment time is required"}, 400
+
+        try:
+            new_appointment_time = datetime.fromisoformat(appointment_time_str)
+        except ValueError:
+            return {"error": "Invalid datetime format"}, 400
+
+        stylist_name = booking.stylist.name
+        new_end_time = booking.service.ends_at(new_appointment_time)
+        rollups.booking_rescheduled(booking.appointment_time, new_appointment_time)
+        booking.appointment_time = new_appointment_time
+        booking.end_time = new_end_time
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return {"error": f"{stylist_name} is already booked at that time. Please choose another time."}, 409
+        return {"booking": booking.to_dict()}, 200
+
+    @jwt_required()
+    def delete(self, booking_id):
+        current_customer_id = current_identity().customer_id
+        booking = Booking.query.get(booking_id)
+        if not booking:
+            return {"error": "Booking not found"}, 404
+
+        if booking.customer_id != current_customer_id:
+            return {"error": "Unauthorized"}, 403
+
+        rollups.booking_deleted(booking, booking.service.price)
+        db.session.delete(booking)
+        db.session.commit()
+        return {"message": "Booking deleted"}, 200
+    
+# ---------------- STYLISTS ---------------- #
+def parse_working_hours(entries):
+    """Build StylistWorkingHours rows from [{"weekday", "opens_at", "closes_at"}, ...]."""
+    rows = []
+    for entry in entries:
+        try:
+            weekday = int(entry["weekday"])
+            opens_at = time.fromisoformat(entry["opens_at"])
+            closes_at = time.fromisoformat(entry["closes_at"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("working_hours entries need weekday, opens_at and closes_at (HH:MM)") from None
+        if not 0 <= weekday <= 6 or opens_at >= closes_at:
+            raise ValueError("working_hours need a weekday 0-6 and opens_at before closes_at")
+        rows.append(StylistWorkingHours(weekday=weekday, opens_at=opens_at, closes_at=closes_at))
+    return rows
+
+
+class StylistListResource(Resource):
+    @jwt_required()
+    def get(self):
+        stylists = Stylist.query.options(*STYLIST_SERIALIZER.loader_options()).all()
+        return json_response(STYLIST_SERIALIZER.dump_many(stylists))
+
+    @admin_required
+    def post(self):
+        data = request.get_json()
+        name = data.get("name")
+        bio = data.get("bio")
+        service_ids = data.get("service_ids", [])
+
+        if not name:
+            return {"error": "Name is required"}, 400
+
+        services = Service.query.filter(Service.id.in_(service_ids)).all() if service_ids else []
+        try:
+            working_hours = parse_working_hours(data.get("working_hours") or [])
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        stylist = Stylist(name=name, bio=bio, services=services, working_hours=working_hours)
+        db.session.add(stylist)
+        db.session.flush()
+        rollups.stylist_created()
+        search.index(stylist)
+        catalog_cache().bump()
+        db.session.commit()
+
+        return stylist.to_dict(rules=("-services.stylists", "-bookings.stylist")), 201
+
+class StylistResource(Resource):
+    # @jwt_required()
+    def get(self, stylist_id):
+        stylist = Stylist.query.options(*STYLIST_SERIALIZER.loader_options()) \
+                               .filter_by(id=stylist_id).first_or_404()
+        return json_response(STYLIST_SERIALIZER.dump(stylist))
+
+    @admin_required
+    def put(self, stylist_id):
+        stylist = Stylist.query.get_or_404(stylist_id)
+        data = request.get_json()
+
+        stylist.name = data.get("name", stylist.name)
+        stylist.bio = data.get("bio", stylist.bio)
+
+        service_ids = data.get("service_ids")
+        if service_ids is not None:
+            stylist.services = Service.query.filter(Service.id.in_(service_ids)).all()
+
+        if data.get("working_hours") is not None:
+            try:
+                stylist.working_hours = parse_working_hours(data["working_hours"])
+            except ValueError as e:
+                return {"error": str(e)}, 400
+
+        search.index(stylist)
+        catalog_cache().bump()
+        db.session.commit()
+        return stylist.to_dict(rules=("-services.stylists", "-bookings.stylist")), 200
+
+    @admin_required
+    def delete(self, stylist_id):
+        stylist = Stylist.query.get_or_404(stylist_id)
+        db.session.delete(stylist)
+        db.session.flush()
+        # Deleting a stylist cascades to their bookings; rare enough to recount everything.
+        rollups.rebuild()
+        search.remove("stylist", stylist_id)
+        catalog_cache().bump()
+        db.session.commit()
+        return {"message": "Stylist deleted"}, 200
+
+class StylistAvailability(Resource):
+    def get(self, stylist_id):
+        stylist = Stylist.query.get_or_404(stylist_id)
+        try:
+            day = datetime.strptime(request.args.get("date", ""), "%Y-%m-%d").date()
+            service_id = int(request.args.get("service_id", ""))
+        except ValueError:
+            return {"error": "date (YYYY-MM-DD) and service_id are required"}, 400
+
+        service = next((s for s in stylist.services if s.id == service_id), None)
+        if not service:
+            return {"error": f"Stylist '{stylist.name}' does not offer that service"}, 400
+
+        duration = timedelta(minutes=service.duration_minutes)
+        step = timedelta(minutes=current_app.config["AVAILABILITY_SLOT_MINUTES"])
+        default_hours = availability.parse_hours(current_app.config["DEFAULT_WORKING_HOURS"])
+        free = availability.free_time([stylist.id], day, default_hours)[stylist.id]
+        slots = free.slots(duration, step, not_before=datetime.now())
+        return {
+            "stylist_id": stylist.id,
+            "service_id": service.id,
+            "date": day.isoformat(),
+            "duration_minutes": service.duration_minutes,
+            "slots": [
+                {"start": start.strftime(DATETIME_FORMAT), "end": (start + duration).strftime(DATETIME_FORMAT)}
+                for start in slots
+            ],
+        }, 200
+
+
+class ServiceFirstAvailable(Resource):
+    def get(self, service_id):
+        service = Service.query.get_or_404(service_id)
+        try:
+            not_before = parse_datetime(request.args.get("from"), "from") or datetime.now()
+            days = parse_int(request.args.get("days"), "days") or current_app.config["AVAILABILITY_SEARCH_DAYS"]
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+        not_before = max(not_before, datetime.now())
+
+        stylist_ids = [row.stylist_id for row in db.session.query(stylist_service.c.stylist_id)
+                       .filter(stylist_service.c.service_id == service.id)]
+        found = availability.first_available(
+            stylist_ids,
+            duration=timedelta(minutes=service.duration_minutes),
+            step=timedelta(minutes=current_app.config["AVAILABILITY_SLOT_MINUTES"]),
+            not_before=not_before,
+            days=min(days, 90),
+            default_hours=availability.parse_hours(current_app.config["DEFAULT_WORKING_HOURS"]),
+        )
+        if not found:
+            return {"error": "No availability for this service in the search window"}, 404
+
+        start, stylist_id = found
+        stylist = db.session.get(Stylist, stylist_id)
+        return {
+            "service_id": service.id,
+            "stylist_id": stylist.id,
+            "stylist_name": stylist.name,
+            "start": start.strftime(DATETIME_FORMAT),
+            "end": service.ends_at(start).strftime(DATETIME_FORMAT),
+        }, 200
+
+
+# ------------------ ADMIN RESOURCES ------------------ #
+
+class AdminAnalyticsSummary(Resource):
+    @query_budget(6)
+    @admin_required
+    @replica_reads
+    def get(self):
+        # Reads the precomputed rows maintained by rollups.py instead of aggregating bookings.
+        totals = {
+            row.scope: row
+            for row in AnalyticsRollup.query.filter(
+                AnalyticsRollup.scope.in_(("paid_bookings", "customers", "stylists"))
+            )
+        }
+        booking_count, revenue = rollups.booking_totals()
+
+        def total(scope, column="item_count"):
+            return getattr(totals[scope], column) if scope in totals else 0
+
+        def per_entity(scope, model, name_column, key):
+            counts = {}
+            rows = db.session.query(name_column, AnalyticsRollup.item_count) \
+                             .join(AnalyticsRollup, AnalyticsRollup.scope_id == model.id) \
+                             .filter(AnalyticsRollup.scope == scope, AnalyticsRollup.item_count > 0) \
+                             .all()
+            for name, count in rows:
+                counts[name] = counts.get(name, 0) + count
+            return [{key: name, "count": count}
+                    for name, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)]
+
+        return {
+            "summary": {
+                "total_users": total("customers"),
+                "total_bookings": booking_count,
+                "total_stylists": total("stylists"),
+                "total_revenue": f"{revenue:.2f}",
+                "paid_revenue": f"{total('paid_bookings', 'amount'):.2f}"
+            },
+            "bookings_per_service": per_entity("service", Service, Service.title, "service_name"),
+            "bookings_per_stylist": per_entity("stylist", Stylist, Stylist.name, "stylist_name")
+        }, 200
+
+class AdminAnalyticsTimeseries(Resource):
+    @admin_required
+    def get(self):
+        """Bookings and revenue per day, week or month, overall or per stylist or service.
+
+        The range is widened to whole periods; by default it covers the last 30.
+        """
+        args = request.args
+        granularity = args.get("granularity") or "day"
+        group_by = args.get("group_by") or "all"
+        if granularity not in timeseries.GRANULARITIES:
+            return {"error": "granularity must be day, week or month"}, 400
+        if group_by not in timeseries.SCOPES:
+            return {"error": "group_by must be all, stylist or service"}, 400
+        try:
+            end = parse_datetime(args.get("end"), "end", end_of_day=True) or datetime.now()
+            start = parse_datetime(args.get("start"), "start")
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+        if start is None:
+            start = timeseries.truncate(end, granularity)
+            for _ in range(29):
+                start = timeseries.truncate(start - timedelta(days=1), granularity)
+        if start >= end:
+            return {"error": "start must be before end"}, 400
+        if len(timeseries.periods(granularity, start, end)) > timeseries.MAX_BUCKETS:
+            return {"error": f"At most {timeseries.MAX_BUCKETS} periods can be requested at once"}, 400
+
+        periods, values = timeseries.series(granularity, start, end, group_by)
+        if group_by == "all":
+            values.setdefault(0, {})
+        names = {}
+        if group_by != "all" and values:
+            model, name_column = (Stylist, Stylist.name) if group_by == "stylist" else (Service, Service.title)
+            names = dict(db.session.query(model.id, name_column).filter(model.id.in_(values)).all())
+
+        series = []
+        for scope_id in sorted(values):
+            totals = [values[scope_id].get(period, (0, 0.0, 0, 0.0)) for period in periods]
+            entry = {} if group_by == "all" else {
+                f"{group_by}_id": scope_id,
+                f"{group_by}_name": names.get(scope_id),
+            }
+            entry.update({
+                "bookings": [total[0] for total in totals],
+                "revenue": [round(total[1], 2) for total in totals],
+                "paid_bookings": [total[2] for total in totals],
+                "paid_revenue": [round(total[3], 2) for total in totals],
+            })
+            series.append(entry)
+        return {
+            "granularity": granularity,
+            "group_by": group_by,
+            "periods": [period.strftime("%Y-%m-%d") for period in periods],
+            "series": series,
+        }, 200
+
+class AdminUserList(Resource):
+    @admin_required
+    def get(self):
+        users = Customer.query.options(*CUSTOMER_SERIALIZER.loader_options()).all()
+        return json_response(CUSTOMER_SERIALIZER.dump_many(users))
+
+class AdminBookingList(Resource):
+    @query_budget(4)
+    @admin_required
+    def get(self):
+        args = request.args
+        try:
+            limit = parse_limit(args.get("limit"))
+            start = parse_datetime(args.get("start"), "start")
+            end = parse_datetime(args.get("end"), "end", end_of_day=True)
+            stylist_id = parse_int(args.get("stylist_id"), "stylist_id")
+            service_id = parse_int(args.get("service_id"), "service_id")
+            after = decode_cursor(args["cursor"], datetime, int) if args.get("cursor") else None
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+
+        # One joined query per page, walking the (appointment_time, id) index.
+        query = db.session.query(
+            Booking.id,
+            Booking.appointment_time,
+            Booking.payment_status,
+            Booking.payment_intent_id,
+            Booking.customer_id,
+            Booking.stylist_id,
+            Booking.service_id,
+            Customer.name.label("customer_name"),
+            Stylist.name.label("stylist_name"),
+            Service.title.label("service_name"),
+            Service.price.label("service_price"),
+        ).join(Customer, Customer.id == Booking.customer_id) \
+         .join(Stylist, Stylist.id == Booking.stylist_id) \
+         .join(Service, Service.id == Booking.service_id)
+
+        if start:
+            query = query.filter(Booking.appointment_time >= start)
+        if end:
+            query = query.filter(Booking.appointment_time < end)
+        if stylist_id is not None:
+            query = query.filter(Booking.stylist_id == stylist_id)
+        if service_id is not None:
+            query = query.filter(Booking.service_id == service_id)
+        if args.get("payment_status"):
+            query = query.filter(Booking.payment_status == args["payment_status"])
+        if after:
+            query = query.filter(tuple_(Booking.appointment_time, Booking.id) > after)
+
+        rows = query.order_by(Booking.appointment_time, Booking.id).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].appointment_time, rows[-1].id)
+
+        bookings_data = []
+        for row in rows:
+            b_dict = row._asdict()
+            b_dict["appointment_time"] = row.appointment_time.strftime(DATETIME_FORMAT)
+            bookings_data.append(b_dict)
+        return {"bookings": bookings_data, "next_cursor": next_cursor}, 200
+
+
+class AdminExportBookings(Resource):
+    @admin_required
+    @replica_reads
+    def get(self):
+        """Every matching booking as CSV (default) or NDJSON, streamed; same filters as /admin/bookings."""
+        args = request.args
+        try:
+            fmt = exports.parse_format(args.get("format"))
+            start = parse_datetime(args.get("start"), "start")
+            end = parse_datetime(args.get("end"), "end", end_of_day=True)
+            stylist_id = parse_int(args.get("stylist_id"), "stylist_id")
+            service_id = parse_int(args.get("service_id"), "service_id")
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+
+        statement = select(
+            Booking.id,
+            Booking.appointment_time,
+            Booking.end_time,
+            Booking.payment_status,
+            Booking.payment_intent_id,
+            Booking.customer_id,
+            Customer.name.label("customer_name"),
+            Booking.stylist_id,
+            Stylist.name.label("stylist_name"),
+            Booking.service_id,
+            Service.title.label("service_name"),
+            Service.price.label("service_price"),
+        ).join(Customer, Customer.id == Booking.customer_id) \
+         .join(Stylist, Stylist.id == Booking.stylist_id) \
+         .join(Service, Service.id == Booking.service_id)
+        if start:
+            statement = statement.where(Booking.appointment_time >= start)
+        if end:
+            statement = statement.where(Booking.appointment_time < end)
+        if stylist_id is not None:
+            statement = statement.where(Booking.stylist_id == stylist_id)
+        if service_id is not None:
+            statement = statement.where(Booking.service_id == service_id)
+        if args.get("payment_status"):
+            statement = statement.where(Booking.payment_status == args["payment_status"])
+        statement = statement.order_by(Booking.appointment_time, Booking.id)
+        return exports.stream(db.session.get_bind(clause=statement), statement, fmt, "bookings")
+
+
+class AdminExportUsers(Resource):
+    @admin_required
+    @replica_reads
+    def get(self):
+        """Every customer as CSV (default) or NDJSON, streamed. Password hashes are never exported."""
+        try:
+            fmt = exports.parse_format(request.args.get("format"))
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+        statement = select(Customer.id, Customer.name, Customer.phone, Customer.is_admin).order_by(Customer.id)
+        return exports.stream(db.session.get_bind(clause=statement), statement, fmt, "users")
+
+
+# ------------------ MPESA RESOURCES ------------------ #
+class InitiateMpesaPayment(Resource):
+    @jwt_required()
+    def post(self):
+        current_customer_id = current_identity().customer_id
+        data = request.get_json()
+        amount = data.get("amount")
+        phone_number = data.get("phone_number")
+        booking_id = data.get("booking_id")
+
+        if not all([amount, phone_number, booking_id]):
+            return {"error": "Amount, phone number, and booking_id are required"}, 400
+
+        try:
+            amount = int(amount)
+        except (TypeError, ValueError):
+            return {"error": "Amount must be a whole number"}, 400
+        if amount <= 0:
+            return {"error": "Amount must be positive"}, 400
+
+        if phone_number.startswith("0"):
+            phone_number = "254" + phone_number[1:]
+        elif phone_number.startswith("+"):
+            phone_number = phone_number[1:]
+
+        if not phone_number.isdigit() or len(phone_number) != 12:
+            return {"error": "Invalid phone format. Use 2547XXXXXXXX."}, 400
+
+        booking = Booking.query.get(booking_id)
+        if not booking:
+            return {"error": "Booking not found"}, 404
+        if booking.customer_id != current_customer_id:
+            return {"error": "Unauthorized"}, 403
+
+        # Loaded on first use: both pull in requests, which most requests never need.
+        import payment_jobs
+        from mpesa import MpesaConfigError, stk_push_settings
+
+        try:
+            stk_push_settings()
+        except MpesaConfigError as e:
+            return {"error": str(e)}, 500
+
+        # The STK push itself is sent by worker.py, so a slow Daraja never holds a web worker.
+        job = payment_jobs.enqueue(booking, phone_number, amount)
+        if booking.payment_status == "incomplete":
+            # A retry after a failed attempt: waiters should see the new outcome, not the old one.
+            rollups.payment_status_changed(booking.payment_status, "pending", booking.service.price,
+                                           booking.appointment_time)
+            booking.payment_status = "pending"
+            payment_events.notify(booking.id, booking.payment_status)
+        db.session.commit()
+        return {"job_id": job.id, "booking_id": booking.id, "status": job.status}, 202, \
+            {"Location": f"/payment-jobs/{job.id}"}
+
+
+class PaymentJobStatus(Resource):
+    @jwt_required()
+    def get(self, job_id):
+        job = PaymentJob.query.get(job_id)
+        if not job:
+            return {"error": "Payment job not found"}, 404
+        if job.booking.customer_id != current_identity().customer_id:
+            return {"error": "Unauthorized"}, 403
+        return job.to_dict(), 200
+
+class MpesaCallback(Resource):
+    def post(self):
+        # Only stored here; worker.py applies it (payment_callbacks.apply_pending).
+        data = request.get_json(silent=True) or {}
+        stored = payment_callbacks.record(data)
+        stk_callback = data.get("Body", {}).get("stkCallback", {})
+        logger.info("M-Pesa callback %s result=%s%s", stk_callback.get("CheckoutRequestID"),
+                    stk_callback.get("ResultCode"), "" if stored else " (duplicate)")
+        return {"ResultCode": 0, "ResultDesc": "Accepted"}, 200
+
+
+class BookingPaymentStatus(Resource):
+    @query_budget(3)
+    @jwt_required()
+    def get(self, booking_id):
+        booking = Booking.query.get(booking_id)
+        if not booking:
+            return {"error": "Booking not found"}, 404
+
+        if not current_identity().can_access(booking.customer_id):
+            return {"error": "Unauthorized"}, 403
+
+        return {
+            "booking_id": booking.id,
+            "payment_status": booking.payment_status
+        }, 200
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+WAITERS_FULL_RESPONSE = (
+    {"error": "Too many clients are waiting for payment updates. Poll /payment-status instead."},
+    503, {"Retry-After": "5"}
+)
+
+
+class BookingPaymentStatusStream(Resource):
+    """Wait for a booking's payment status to move off `since` (default "pending").
+
+    With `Accept: text/event-stream` the response is an SSE stream that sends a
+    single `payment_status` event (or `timeout`) and closes; otherwise it is a
+    long poll answering like /payment-status once the status changes or after
+    `timeout` seconds. EventSource cannot set headers, so the JWT may also be
+    passed as `?jwt=`. A request that would wait while PAYMENT_STATUS_MAX_WAITERS
+    others already are gets a 503.
+    """
+
+    @jwt_required(locations=["headers", "query_string"])
+    def get(self, booking_id):
+        booking = Booking.query.get(booking_id)
+        if not booking:
+            return {"error": "Booking not found"}, 404
+
+        if not current_identity().can_access(booking.customer_id):
+            return {"error": "Unauthorized"}, 403
+
+        max_wait = current_app.config["PAYMENT_STATUS_STREAM_TIMEOUT"]
+        try:
+            timeout = parse_int(request.args.get("timeout"), "timeout")
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+        timeout = max_wait if timeout is None else max(0, min(timeout, max_wait))
+        since = request.args.get("since", "pending")
+        status = booking.payment_status
+        # Waiting can take minutes; hand the connection back to the pool first.
+        db.session.remove()
+
+        broker = payment_events.get_broker(current_app._get_current_object())
+        waiting = status == since
+        if waiting and not broker.reserve():
+            return WAITERS_FULL_RESPONSE
+        if not request.accept_mimetypes.accept_json and "text/event-stream" in request.accept_mimetypes:
+            keepalive = current_app.config["PAYMENT_STATUS_KEEPALIVE"]
+            response = Response(self._stream(broker, booking_id, since, status, timeout, keepalive),
+                                mimetype="text/event-stream",
+                                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+            if waiting:
+                # The stream outlives this view; the slot is freed when the server closes the response.
+                response.call_on_close(broker.release)
+            return response
+
+        if waiting:
+            try:
+                status = broker.wait(booking_id, since, timeout) or status
+            finally:
+                broker.release()
+        return {"booking_id": booking_id, "payment_status": status}, 200
+
+    @staticmethod
+    def _stream(broker, booking_id, since, status, timeout, keepalive):
+        # Runs after the view returns, outside the app context.
+        yield "retry: 3000\n\n"
+        deadline = datetime.now() + timedelta(seconds=timeout)
+        while status == since:
+            remaining = (deadline - datetime.now()).total_seconds()
+            if remaining <= 0:
+                yield _sse_event("timeout", {"booking_id": booking_id, "payment_status": status})
+                return
+            changed = broker.wait(booking_id, since, min(keepalive, remaining))
+            if changed is not None:
+                status = changed
+            elif remaining > keepalive:
+                yield ": keepalive\n\n"
+        yield _sse_event("payment_status", {"booking_id": booking_id, "payment_status": status})
+
+
+
+# ------------------ REVIEW RESOURCES ------------------ #
+class ReviewList(Resource):
+    @jwt_required()
+    def post(self):
+        current_customer_id = current_identity().customer_id
+        data = request.get_json()
+        rating = data.get("rating")
+        comment = data.get("comment")
+        stylist_id = data.get("stylist_id")
+
+        if not rating or not stylist_id:
+            return {"error": "Rating and stylist_id are required"}, 400
+
+        if not (1 <= rating <= 5):
+            return {"error": "Rating must be between 1 and 5"}, 400
+
+        # Check if the customer has booked a service with this stylist
+        booking_exists = Booking.query.filter_by(
+            customer_id=current_customer_id,
+            stylist_id=stylist_id
+        ).first()
+
+        if not booking_exists:
+            return {"error": "You can only review stylists you have booked a service with."}, 403
+
+        review = Review(
+            customer_id=current_customer_id,
+            stylist_id=stylist_id,
+            rating=rating,
+            comment=comment
+        )
+        db.session.add(review)
+        rollups.review_added(stylist_id, rating)
+        db.session.commit()
+        return review.to_dict(), 201
+
+class StylistReviews(Resource):
+    @replica_reads
+    def get(self, stylist_id):
+        """Newest reviews first, in keyset pages over (created_at, id), with the stylist's totals."""
+        try:
+            limit = parse_limit(request.args.get("limit"), default=20, maximum=100)
+            before = decode_cursor(request.args["cursor"], datetime, int) if request.args.get("cursor") else None
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+
+        stylist = Stylist.query.get_or_404(stylist_id)
+        query = db.session.query(
+            Review.id,
+            Review.rating,
+            Review.comment,
+            Review.created_at,
+            Review.customer_id,
+            Review.stylist_id,
+            Customer.name.label("customer_name"),
+        ).join(Customer, Customer.id == Review.customer_id).filter(Review.stylist_id == stylist.id)
+        if before:
+            query = query.filter(tuple_(Review.created_at, Review.id) < before)
+
+        rows = query.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        reviews = []
+        for row in rows:
+            review = row._asdict()
+            review["created_at"] = row.created_at.strftime(DATETIME_FORMAT) if row.created_at else None
+            reviews.append(review)
+        return {
+            "reviews": reviews,
+            "next_cursor": next_cursor,
+            "rating_count": stylist.rating_count,
+            "rating_average": stylist.rating_average,
+        }, 200
+
+
+class TopRatedStylists(Resource):
+    @replica_reads
+    def get(self):
+        """Highest average rating first; `min_reviews` keeps single five-star reviews off the top."""
+        try:
+            limit = parse_limit(request.args.get("limit"), default=10, maximum=50)
+            min_reviews = parse_int(request.args.get("min_reviews"), "min_reviews") or 1
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+
+        # Walks ix_stylist_rating_average backwards; no review rows are read.
+        stylists = Stylist.query.filter(
+            Stylist.rating_average.isnot(None), Stylist.rating_count >= min_reviews
+        ).order_by(
+            Stylist.rating_average.desc(), Stylist.rating_count.desc(), Stylist.id.desc()
+        ).limit(limit).all()
+        return json_response(TOP_RATED_SERIALIZER.dump_many(stylists))
+
+# ------------------ SEARCH ------------------ #
+class Search(Resource):
+    # No replica_reads: search.py runs raw SQL, which RoutingSession keeps on the primary.
+    def get(self):
+        """Services and stylists matching `q`, best match first; `type` limits results to one kind."""
+        args = request.args
+        kinds = search.KINDS if not args.get("type") else (args["type"],)
+        if kinds[0] not in search.KINDS:
+            return {"error": "type must be service or stylist"}, 400
+        try:
+            limit = parse_limit(args.get("limit"), default=20, maximum=50)
+            offset = decode_cursor(args["cursor"], int)[0] if args.get("cursor") else 0
+        except InvalidQueryArgument as e:
+            return {"error": str(e)}, 400
+
+        rows = search.search(args.get("q"), kinds, limit + 1, offset)
+        next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+        return {
+            "results": [{"type": row.kind, "id": row.item_id, "title": row.title, "description": row.body}
+                        for row in rows[:limit]],
+            "next_cursor": next_cursor,
+        }, 200
+
+
+# ------------------ HEALTH ------------------ #
+class Health(Resource):
+    def get(self):
+        """Liveness: the process is serving requests. Never touches the database."""
+        return {"status": "ok"}, 200
+
+
+class Readiness(Resource):
+    def get(self):
+        """Readiness: the database answers. Point load balancer health checks here."""
+        try:
+            db.session.execute(text("SELECT 1"))
+        except Exception:
+            current_app.logger.exception("Readiness check failed. Check DATABASE_URL and database availability.")
+            db.session.rollback()
+            return {"status": "unavailable", "database": "unreachable"}, 503
+        return {"status": "ok", "database": db.engine.url.get_backend_name()}, 200
+
+
+def register_resources(api):
+    api.add_resource(Register, "/register")
+    api.add_resource(Login, "/login")
+    api.add_resource(Me, "/me")
+    api.add_resource(ServiceList, "/services")
+    api.add_resource(ServiceDetail, "/services/<int:service_id>")
+    api.add_resource(BookingList, "/bookings")
+    api.add_resource(BookingBatch, "/bookings/batch")
+    api.add_resource(BookingResource, "/bookings/<int:booking_id>")
+    api.add_resource(BookingPaymentStatus, "/bookings/<int:booking_id>/payment-status")
+    api.add_resource(BookingPaymentStatusStream, "/bookings/<int:booking_id>/payment-status/stream")
+    api.add_resource(StylistListResource, "/stylists")
+    api.add_resource(TopRatedStylists, "/stylists/top-rated")
+    api.add_resource(StylistResource, "/stylists/<int:stylist_id>")
+    api.add_resource(StylistAvailability, "/stylists/<int:stylist_id>/availability")
+    api.add_resource(ServiceFirstAvailable, "/services/<int:service_id>/first-available")
+
+    # Admin routes
+    api.add_resource(AdminAnalyticsSummary, "/admin/analytics/summary")
+    api.add_resource(AdminAnalyticsTimeseries, "/admin/analytics/timeseries")
+    api.add_resource(AdminUserList, "/admin/users")
+    api.add_resource(AdminBookingList, "/admin/bookings")
+    api.add_resource(AdminExportBookings, "/admin/export/bookings")
+    api.add_resource(AdminExportUsers, "/admin/export/users")
+
+    # M-Pesa routes
+    api.add_resource(InitiateMpesaPayment, "/initiate-mpesa-payment")
+    api.add_resource(MpesaCallback, "/mpesa-callback")
+    api.add_resource(PaymentJobStatus, "/payment-jobs/<int:job_id>")
+
+    # Review routes
+    api.add_resource(ReviewList, "/reviews")
+    api.add_resource(StylistReviews, "/stylists/<int:stylist_id>/reviews")
+
+    # Search
+    api.add_resource(Search, "/search")
+
+    # Health probes
+    api.add_resource(Health, "/health")
+    api.add_resource(Readiness, "/health/ready")
@@ -0,0 +1,200 @@
+"""Precomputed analytics counters, maintained in the same transaction as the writes.
+
+Each `analytics_rollup` row is a (scope, scope_id) counter with an item count and
+an amount. Scopes:
+
+- "service" / "stylist": bookings and revenue per service or stylist, at current
+  service prices
+- "paid_bookings" (scope_id 0): successfully paid bookings and their revenue
+- "customers" / "stylists" (scope_id 0): entity totals
+
+There is no global booking counter: every booking write would upsert the same row
+and serialize on its lock. `booking_totals()` sums the "stylist" rows instead.
+
+Stylist rating aggregates (`rating_count`, `rating_sum`, `rating_average`) live on
+the stylist row itself and are maintained by `review_added()`.
+
+`rebuild()` recomputes everything from the source tables. These hooks also drop
+the cached time series periods (timeseries.py) that a change affects.
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import timeseries
+from models import AnalyticsRollup, Booking, Customer, Review, Service, Stylist, db
+
+PAID_STATUS = "successful"
+
+
+def _apply(deltas):
+    """Upsert `{(scope, scope_id): (count_delta, amount_delta)}` with additive conflict handling."""
+    rows = [
+        {"scope": scope, "scope_id": scope_id, "item_count": count, "amount": amount}
+        for (scope, scope_id), (count, amount) in deltas.items()
+        if count or amount
+    ]
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    statement = insert(AnalyticsRollup).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[AnalyticsRollup.scope, AnalyticsRollup.scope_id],
+        set_={
+            "item_count": AnalyticsRollup.item_count + statement.excluded.item_count,
+            "amount": AnalyticsRollup.amount + statement.excluded.amount,
+        },
+    )
+    db.session.execute(statement)
+
+
+def _booking_deltas(bookings, sign):
+    deltas = defaultdict(lambda: (0, 0.0))
+
+    def add(key, price):
+        count, amount = deltas[key]
+        deltas[key] = (count + sign, amount + sign * price)
+
+    for booking, price in bookings:
+        add(("service", booking.service_id), price)
+        add(("stylist", booking.stylist_id), price)
+        if booking.payment_status == PAID_STATUS:
+            add(("paid_bookings", 0), price)
+    return deltas
+
+
+def bookings_created(bookings):
+    """Record new bookings, given as `(booking, service_price)` pairs."""
+    _apply(_booking_deltas(bookings, 1))
+    timeseries.invalidate(booking.appointment_time for booking, _ in bookings)
+
+
+def booking_created(booking, price):
+    bookings_created([(booking, price)])
+
+
+def booking_deleted(booking, price):
+    _apply(_booking_deltas([(booking, price)], -1))
+    timeseries.invalidate([booking.appointment_time])
+
+
+def booking_rescheduled(old_time, new_time):
+    timeseries.invalidate([old_time, new_time])
+
+
+def payment_statuses_changed(changes):
+    """Record payment status changes, given as `(old_status, new_status, price, appointment_time)` tuples."""
+    count, amount = 0, 0.0
+    moved = []
+    for old_status, new_status, price, appointment_time in changes:
+        if (old_status == PAID_STATUS) == (new_status == PAID_STATUS):
+            continue
+        sign = 1 if new_status == PAID_STATUS else -1
+        count += sign
+        amount += sign * price
+        moved.append(appointment_time)
+    if count or amount:
+        _apply({("paid_bookings", 0): (count, amount)})
+    timeseries.invalidate(moved)
+
+
+def payment_status_changed(old_status, new_status, price, appointment_time):
+    payment_statuses_changed([(old_status, new_status, price, appointment_time)])
+
+
+def customer_created():
+    _apply({("customers", 0): (1, 0.0)})
+
+
+def stylist_created():
+    _apply({("stylists", 0): (1, 0.0)})
+
+
+def service_repriced(service_id, old_price, new_price):
+    """Shift revenue for every booking of a service to its new price."""
+    difference = new_price - old_price
+    if not difference:
+        return
+    timeseries.invalidate_all()
+    deltas = {}
+    rows = db.session.execute(
+        select(Booking.stylist_id, func.count(Booking.id), func.count(Booking.id).filter(Booking.payment_status == PAID_STATUS))
+        .where(Booking.service_id == service_id)
+        .group_by(Booking.stylist_id)
+    ).all()
+    total = paid = 0
+    for stylist_id, count, paid_count in rows:
+        deltas[("stylist", stylist_id)] = (0, difference * count)
+        total += count
+        paid += paid_count
+    deltas[("service", service_id)] = (0, difference * total)
+    deltas[("paid_bookings", 0)] = (0, difference * paid)
+    _apply(deltas)
+
+
+def booking_totals():
+    """Return `(count, revenue)` over all bookings, from the per-stylist rows."""
+    count, amount = db.session.execute(
+        select(func.coalesce(func.sum(AnalyticsRollup.item_count), 0),
+               func.coalesce(func.sum(AnalyticsRollup.amount), 0.0))
+        .where(AnalyticsRollup.scope == "stylist")
+    ).one()
+    return count, float(amount)
+
+
+def rebuild():
+    """Recompute every rollup row from scratch inside the current transaction."""
+    db.session.execute(delete(AnalyticsRollup))
+    timeseries.invalidate_all()
+    deltas = {}
+
+    def grouped(key_column, scope):
+        rows = db.session.execute(
+            select(key_column, func.count(Booking.id), func.coalesce(func.sum(Service.price), 0.0))
+            .join(Service, Service.id == Booking.service_id)
+            .group_by(key_column)
+        ).all()
+        for key, count, amount in rows:
+            deltas[(scope, key)] = (count, float(amount))
+
+    grouped(Booking.service_id, "service")
+    grouped(Booking.stylist_id, "stylist")
+    count, amount = db.session.execute(
+        select(func.count(Booking.id), func.coalesce(func.sum(Service.price), 0.0))
+        .join(Service, Service.id == Booking.service_id)
+        .where(Booking.payment_status == PAID_STATUS)
+    ).one()
+    deltas[("paid_bookings", 0)] = (count, float(amount))
+    deltas[("customers", 0)] = (db.session.execute(select(func.count(Customer.id))).scalar(), 0.0)
+    deltas[("stylists", 0)] = (db.session.execute(select(func.count(Stylist.id))).scalar(), 0.0)
+    _apply(deltas)
+    rebuild_ratings()
+
+
+def review_added(stylist_id, rating):
+    """Fold one new rating into the stylist's aggregates with a single atomic UPDATE."""
+    db.session.execute(
+        update(Stylist)
+        .where(Stylist.id == stylist_id)
+        .values(
+            rating_count=Stylist.rating_count + 1,
+            rating_sum=Stylist.rating_sum + rating,
+            rating_average=(Stylist.rating_sum + rating) * 1.0 / (Stylist.rating_count + 1),
+        )
+    )
+
+
+def rebuild_ratings():
+    def per_stylist(aggregate):
+        return select(aggregate).where(Review.stylist_id == Stylist.id).scalar_subquery()
+
+    db.session.execute(
+        update(Stylist).values(
+            rating_count=per_stylist(func.count(Review.id)),
+            rating_sum=per_stylist(func.coalesce(func.sum(Review.rating), 0)),
+            rating_average=per_stylist(func.avg(Review.rating * 1.0)),
+        )
+    )
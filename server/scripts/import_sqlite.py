@@ -2,22 +2,127 @@
 
 Run `flask --app app db upgrade` first, set DATABASE_URL to PostgreSQL, then run
 `python scripts/import_sqlite.py path/to/beauty_parlour.db` from server/.
+
+Rows are streamed from SQLite in primary-key order and written in chunks with
+`INSERT ... ON CONFLICT DO NOTHING`, one transaction per chunk. An interrupted
+import can simply be re-run: each table resumes after the highest id already in
+the target, and any overlap is skipped by the conflict clause.
+
+Legacy bookings have no durations, so a derived end time can run into the
+stylist's next booking. Such bookings end where the next one starts, as in the
+migration that added end times, and a second booking at the exact same stylist
+and time is skipped; both are listed at the end of the booking import.
 """
 
+import argparse
 import sqlite3
-import sys
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from sqlalchemy import text
+from sqlalchemy import Boolean, DateTime, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
 
-from app import app, db
+import rollups
+import search
+from app import create_app
+from models import db
 
 
 TABLES = ("customer", "service", "stylist", "stylist_service", "booking", "review")
 SEQUENCE_TABLES = ("customer", "service", "stylist", "booking", "review")
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _coercers(table, columns):
+    """SQLite hands back 0/1 and ISO strings; convert them for typed PostgreSQL columns."""
+    coercers = {}
+    for name in columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, Boolean):
+            coercers[name] = bool
+        elif isinstance(column_type, DateTime):
+            coercers[name] = lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+    return coercers
+
+
+def _report(table, done, total, started):
+    elapsed = max(time.monotonic() - started, 1e-6)
+    percent = 100 * done / total if total else 100
+    print(f"  {table}: {done}/{total} rows ({percent:.0f}%), {done / elapsed:.0f} rows/s", flush=True)
+
 
+def _copy_table(source, table_name, chunk_size, durations):
+    table = db.metadata.tables[table_name]
+    insert = postgresql.insert if db.engine.dialect.name == "postgresql" else sqlite.insert
+    # Only primary-key conflicts mean "already imported"; other violations should still fail.
+    statement = insert(table).on_conflict_do_nothing(index_elements=list(table.primary_key.columns))
 
-def import_sqlite(source_path: Path) -> None:
+    source_table = f'"{table_name}"'
+    if table_name == "booking":
+        source_table = ("(SELECT *, LEAD(appointment_time) OVER "
+                        "(PARTITION BY stylist_id ORDER BY appointment_time, id) AS next_appointment_time "
+                        "FROM booking)")
+    query = f"SELECT * FROM {source_table}"
+    parameters = ()
+    if "id" in table.c:
+        # Chunks commit in id order, so everything up to the target's max id is already there.
+        with db.engine.connect() as target:
+            resume_after = target.execute(select(func.max(table.c.id))).scalar()
+        if resume_after is not None:
+            query += " WHERE id > ?"
+            parameters = (resume_after,)
+        query += " ORDER BY id"
+
+    total = source.execute(f"SELECT COUNT(*) FROM ({query})", parameters).fetchone()[0]
+    cursor = source.execute(query, parameters)
+    source_columns = [description[0] for description in cursor.description]
+    columns = [name for name in source_columns if name in table.c]
+    coerce = _coercers(table, columns)
+
+    started = time.monotonic()
+    done = 0
+    clipped, skipped = [], []
+    print(f"{table_name}: {total} rows to import", flush=True)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        batch = []
+        for row in rows:
+            values = {name: row[name] for name in columns}
+            for name, convert in coerce.items():
+                if values[name] is not None:
+                    values[name] = convert(values[name])
+            if table_name == "booking":
+                # Legacy bookings predate service durations; derive the end time on the way in.
+                if values.get("end_time") is None:
+                    values["end_time"] = values["appointment_time"] + timedelta(
+                        minutes=durations.get(values["service_id"], 60)
+                    )
+                next_start = row["next_appointment_time"]
+                next_start = datetime.fromisoformat(next_start) if next_start else None
+                if next_start == values["appointment_time"]:
+                    skipped.append(values["id"])
+                    continue
+                if next_start and next_start < values["end_time"]:
+                    values["end_time"] = next_start
+                    clipped.append(values["id"])
+            batch.append(values)
+        if batch:
+            with db.engine.begin() as target:
+                target.execute(statement, batch)
+        done += len(rows)
+        _report(table_name, done, total, started)
+    if clipped:
+        print(f"  {table_name}: ended {len(clipped)} overlapping bookings at the stylist's next booking: "
+              f"{clipped}", flush=True)
+    if skipped:
+        print(f"  {table_name}: skipped {len(skipped)} bookings at the same stylist and time as another: "
+              f"{skipped}", flush=True)
+
+
+def import_sqlite(source_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
     if not source_path.is_file():
         raise FileNotFoundError(f"SQLite database not found: {source_path}")
 
@@ -27,37 +132,36 @@ def import_sqlite(source_path: Path) -> None:
     source = sqlite3.connect(source_path)
     source.row_factory = sqlite3.Row
     try:
-        with db.engine.begin() as target:
-            for table in TABLES:
-                rows = source.execute(f'SELECT * FROM "{table}"').fetchall()
-                for row in rows:
-                    values = dict(row)
-                    # The migration is safe to resume: already-imported primary keys are skipped.
-                    if table != "stylist_service" and target.execute(
-                        text(f'SELECT 1 FROM "{table}" WHERE id = :id'), {"id": values["id"]}
-                    ).scalar():
-                        continue
-                    if table == "stylist_service" and target.execute(
-                        text('SELECT 1 FROM stylist_service WHERE stylist_id = :stylist_id AND service_id = :service_id'), values
-                    ).scalar():
-                        continue
-                    columns = ", ".join(f'"{column}"' for column in values)
-                    parameters = ", ".join(f':{column}' for column in values)
-                    target.execute(text(f'INSERT INTO "{table}" ({columns}) VALUES ({parameters})'), values)
-
-            # IDs from SQLite were preserved, so advance PostgreSQL sequences before new inserts.
-            for table in SEQUENCE_TABLES:
-                target.execute(text(
-                    "SELECT setval(pg_get_serial_sequence(:table_name, 'id'), "
-                    "COALESCE((SELECT MAX(id) FROM \"" + table + "\"), 1), true)"
-                ), {"table_name": table})
+        durations = {}
+        for table_name in TABLES:
+            if table_name == "booking":
+                with db.engine.connect() as target:
+                    durations = dict(target.execute(text("SELECT id, duration_minutes FROM service")).all())
+            _copy_table(source, table_name, chunk_size, durations)
     finally:
         source.close()
 
+    # IDs from SQLite were preserved, so advance PostgreSQL sequences before new inserts.
+    with db.engine.begin() as target:
+        for table in SEQUENCE_TABLES:
+            target.execute(text(
+                "SELECT setval(pg_get_serial_sequence(:table_name, 'id'), "
+                "COALESCE((SELECT MAX(id) FROM \"" + table + "\"), 1), true)"
+            ), {"table_name": table})
+
+    rollups.rebuild()
+    search.rebuild()
+    db.session.commit()
+
 
 if __name__ == "__main__":
     default_path = Path(__file__).resolve().parents[1] / "instance" / "beauty_parlour.db"
-    source_path = Path(sys.argv[1]).resolve() if len(sys.argv) > 1 else default_path
-    with app.app_context():
-        import_sqlite(source_path)
+    parser = argparse.ArgumentParser(description="Import the legacy SQLite database.")
+    parser.add_argument("source", nargs="?", type=Path, default=default_path)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"rows per INSERT batch and transaction (default {DEFAULT_CHUNK_SIZE})")
+    args = parser.parse_args()
+    source_path = args.source.resolve()
+    with create_app().app_context():
+        import_sqlite(source_path, args.chunk_size)
     print(f"Imported legacy SQLite data from {source_path}")
@@ -0,0 +1,100 @@
+"""Full-text search over service titles and descriptions and stylist names and bios.
+
+One `search_index` row per service or stylist: an FTS5 virtual table on SQLite,
+and on PostgreSQL a table with a weighted `tsvector` column under a GIN index.
+The table is created by its migration rather than declared as a model, because
+its definition differs per dialect; migrations/env.py keeps autogenerate away
+from it.
+
+Resources that create, update or delete a service or stylist call `index()` or
+`remove()` in the same transaction, like the rollups.py hooks; `rebuild()`
+re-indexes everything after bulk loads (`flask --app app rebuild-search`).
+
+Every word of a query matches as a prefix, so partial input works for
+typeahead. Title and name matches rank above description and bio matches.
+"""
+
+import json
+import re
+
+from sqlalchemy import text
+
+from models import Service, db
+
+KINDS = ("service", "stylist")
+MAX_TERMS = 8
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _postgresql():
+    return db.session.get_bind().dialect.name == "postgresql"
+
+
+def terms(query):
+    return [term.lower() for term in _TERM.findall(query or "")][:MAX_TERMS]
+
+
+def _document(item):
+    if isinstance(item, Service):
+        return "service", item.id, item.title, item.description or ""
+    return "stylist", item.id, item.name, item.bio or ""
+
+
+# Title and name words weigh more than description and bio words.
+_DOCUMENT = "setweight(to_tsvector('simple', {title}), 'A') || setweight(to_tsvector('simple', {body}), 'B')"
+
+
+def index(item):
+    """Add or refresh the entry for a flushed Service or Stylist."""
+    kind, item_id, title, body = _document(item)
+    remove(kind, item_id)
+    if _postgresql():
+        statement = text("INSERT INTO search_index (kind, item_id, title, body, document) "
+                         f"VALUES (:kind, :item_id, :title, :body, {_DOCUMENT.format(title=':title', body=':body')})")
+    else:
+        statement = text("INSERT INTO search_index (kind, item_id, title, body) VALUES (:kind, :item_id, :title, :body)")
+    db.session.execute(statement, {"kind": kind, "item_id": item_id, "title": title, "body": body})
+
+
+def remove(kind, item_id):
+    db.session.execute(text("DELETE FROM search_index WHERE kind = :kind AND item_id = :item_id"),
+                       {"kind": kind, "item_id": item_id})
+
+
+def rebuild():
+    """Re-index every service and stylist inside the current transaction."""
+    db.session.execute(text("DELETE FROM search_index"))
+    documents = ("SELECT 'service' AS kind, id AS item_id, title, COALESCE(description, '') AS body FROM service "
+                 "UNION ALL SELECT 'stylist', id, name, COALESCE(bio, '') FROM stylist")
+    if _postgresql():
+        db.session.execute(text(
+            "INSERT INTO search_index (kind, item_id, title, body, document) SELECT kind, item_id, title, body, "
+            f"{_DOCUMENT.format(title='title', body='body')} FROM ({documents}) AS documents"
+        ))
+    else:
+        db.session.execute(text(f"INSERT INTO search_index (kind, item_id, title, body) {documents}"))
+
+
+def search(query, kinds=KINDS, limit=20, offset=0):
+    """Ranked `(kind, item_id, title, body)` rows matching every term of `query` as a prefix."""
+    words = terms(query)
+    if not words:
+        return []
+    params = {"kinds": list(kinds), "limit": limit, "offset": offset}
+    if _postgresql():
+        params["query"] = " & ".join(f"{word}:*" for word in words)
+        statement = text(
+            "SELECT kind, item_id, title, body FROM search_index, to_tsquery('simple', :query) AS query "
+            "WHERE document @@ query AND kind = ANY(:kinds) "
+            "ORDER BY ts_rank(document, query) DESC, kind, item_id LIMIT :limit OFFSET :offset"
+        )
+    else:
+        params["query"] = " ".join(f'"{word}"*' for word in words)
+        # bm25() weights follow column order: kind and item_id are unindexed, then title, body.
+        statement = text(
+            "SELECT kind, item_id, title, body FROM search_index "
+            "WHERE search_index MATCH :query AND kind IN (SELECT value FROM json_each(:kinds)) "
+            "ORDER BY bm25(search_index, 0, 0, 10.0, 1.0), kind, item_id LIMIT :limit OFFSET :offset"
+        )
+        params["kinds"] = json.dumps(list(kinds))
+    return db.session.execute(statement, params).all()
@@ -1,9 +1,23 @@
-"""Idempotent default data seed. Run migrations before executing this script."""
+"""Idempotent default data seed. Run migrations before executing this script.
 
-from datetime import datetime, timedelta
+`python seed.py` inserts the original defaults. `python seed.py --scale 1` adds a
+synthetic production-sized dataset on top (see `seed_scale`); the same --scale,
+--seed and --until always generate the same rows.
+"""
 
-from app import app, bcrypt, db
-from models import Booking, Customer, Service, Stylist
+import argparse
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+import rollups
+import search
+from app import create_app
+from models import Booking, Customer, Review, Service, Stylist, db, stylist_service
+from passwords import get_hasher
 
 
 def get_or_create(model, defaults=None, **lookup):
@@ -17,15 +31,10 @@ def get_or_create(model, defaults=None, **lookup):
 def seed_database():
     """Insert the original defaults without deleting or duplicating existing data."""
     # Do not call create_all/drop_all here. Schema changes must go through Flask-Migrate.
-    get_or_create(
-        Customer,
-        phone="0700123456",
-        defaults={
-            "name": "admin",
-            "password_hash": bcrypt.generate_password_hash("admin123").decode(),
-            "is_admin": True,
-        },
-    )
+    if not Customer.query.filter_by(phone="0700123456").first():
+        db.session.add(Customer(
+            phone="0700123456", name="admin", password_hash=get_hasher().hash("admin123"), is_admin=True
+        ))
     customer1 = get_or_create(
         Customer, phone="0765235645",
         defaults={"name": "Alice Johnson", "password_hash": "hashedpassword1", "is_admin": False},
@@ -47,19 +56,240 @@ def seed_database():
 
     # The generated date changes every run, so use each original relationship triple as the seed key.
     if not Booking.query.filter_by(customer_id=customer1.id, stylist_id=stylist1.id, service_id=service1.id).first():
-        db.session.add(Booking(appointment_time=datetime.now() + timedelta(days=1, hours=10), customer=customer1, stylist=stylist1, service=service1))
+        start = datetime.now() + timedelta(days=1, hours=10)
+        db.session.add(Booking(appointment_time=start, end_time=service1.ends_at(start), customer=customer1, stylist=stylist1, service=service1))
     if not Booking.query.filter_by(customer_id=customer2.id, stylist_id=stylist2.id, service_id=service3.id).first():
-        db.session.add(Booking(appointment_time=datetime.now() + timedelta(days=2, hours=14), customer=customer2, stylist=stylist2, service=service3))
+        start = datetime.now() + timedelta(days=2, hours=14)
+        db.session.add(Booking(appointment_time=start, end_time=service3.ends_at(start), customer=customer2, stylist=stylist2, service=service3))
 
+    db.session.flush()
+    rollups.rebuild()
+    search.rebuild()
     db.session.commit()
     print("Database seeded successfully (existing records were preserved).")
     print("Default admin: phone=0700123456 password=admin123")
 
 
+# ---------------- Synthetic data at scale ---------------- #
+# Volumes at --scale 1; every count is multiplied by the scale factor.
+BASE_VOLUMES = {"customers": 100_000, "stylists": 500, "bookings": 5_000_000}
+DEFAULT_SEED = 1
+DEFAULT_CHUNK_SIZE = 10_000
+SCALE_PASSWORD = "password123"
+CATALOG = (
+    ("Haircut", 30, 800), ("Blow Dry", 45, 1000), ("Hair Coloring", 120, 3500), ("Highlights", 120, 4500),
+    ("Braids", 180, 3000), ("Cornrows", 120, 1500), ("Dreadlock Retwist", 90, 2000), ("Relaxer", 90, 2500),
+    ("Wash and Set", 60, 1200), ("Beard Trim", 30, 500), ("Manicure", 45, 900), ("Pedicure", 60, 1200),
+    ("Gel Nails", 60, 1800), ("Acrylic Nails", 90, 2500), ("Facial", 60, 2500), ("Eyebrow Threading", 30, 400),
+    ("Lash Extensions", 90, 3000), ("Makeup", 60, 3000), ("Bridal Makeup", 120, 8000), ("Massage", 60, 3500),
+)
+FIRST_NAMES = (
+    "Amina", "Brian", "Cynthia", "Dennis", "Esther", "Faith", "George", "Grace", "Ian", "Joy", "Kevin",
+    "Lucy", "Mercy", "Njeri", "Otieno", "Purity", "Rose", "Samuel", "Terry", "Wanjiru", "Akinyi", "Moses",
+)
+LAST_NAMES = (
+    "Achieng", "Kamau", "Mwangi", "Otieno", "Wanjiku", "Kiptoo", "Njoroge", "Mutua", "Odhiambo", "Chebet",
+    "Kariuki", "Wafula", "Nyambura", "Omondi", "Kilonzo", "Atieno", "Cheruiyot", "Muthoni",
+)
+OPENING_HOUR, CLOSING_HOUR = 9, 18
+# Average bookings per stylist per day; sets how many years the history spans.
+DAILY_BOOKINGS = 3.5
+WEEKDAY_DEMAND = (0.7, 0.8, 0.9, 1.0, 1.3, 1.6, 0.4)  # Monday..Sunday
+MONTH_DEMAND = (0.8, 0.85, 0.95, 1.0, 1.0, 0.95, 0.9, 0.95, 1.0, 1.05, 1.1, 1.45)  # January..December
+REVIEW_RATE = 0.1
+# Days of upcoming bookings after "today" (see `seed_scale`).
+UPCOMING_DAYS = 30
+
+
+def _report(table, done, total, started):
+    elapsed = max(time.monotonic() - started, 1e-6)
+    progress = f"{done}/{total} rows ({100 * done / total:.0f}%)" if total else f"{done} rows"
+    print(f"  {table}: {progress}, {done / elapsed:.0f} rows/s", flush=True)
+
+
+class _BulkWriter:
+    """Buffers rows per table and flushes them in chunks, committing after each one.
+
+    PostgreSQL loads through COPY; other databases use executemany INSERTs.
+    """
+
+    def __init__(self, chunk_size, totals):
+        self.chunk_size = chunk_size
+        self.totals = totals
+        self.pending = {}
+        self.done = {}
+        self.started = {}
+        self.copy = db.engine.dialect.name == "postgresql"
+
+    def add(self, table, row):
+        self.started.setdefault(table.name, time.monotonic())
+        rows = self.pending.setdefault(table, [])
+        rows.append(row)
+        if len(rows) >= self.chunk_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for table in [table] if table is not None else list(self.pending):
+            rows = self.pending.pop(table, [])
+            if not rows:
+                continue
+            if self.copy:
+                columns = list(rows[0])
+                cursor = db.session.connection().connection.cursor()
+                with cursor.copy(f'COPY "{table.name}" ({", ".join(columns)}) FROM STDIN') as copy:
+                    for row in rows:
+                        copy.write_row([row[column] for column in columns])
+            else:
+                db.session.execute(table.insert(), rows)
+            db.session.commit()
+            self.done[table.name] = self.done.get(table.name, 0) + len(rows)
+            _report(table.name, self.done[table.name], self.totals.get(table.name), self.started[table.name])
+
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def seed_scale(scale, seed=DEFAULT_SEED, until=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Append a synthetic dataset of `scale` x BASE_VOLUMES, streamed in chunks.
+
+    Bookings are generated day by day up to `until` (default UPCOMING_DAYS from today),
+    so ids follow appointment order as they would in production. Each stylist
+    works 09:00-18:00 with demand that peaks on Saturdays and in December, and
+    never double-books. Past bookings are mostly paid, upcoming ones mostly
+    pending, and about one in ten paid bookings gets a review.
+    """
+    rng = random.Random(seed)
+    volumes = {name: max(1, round(count * scale)) for name, count in BASE_VOLUMES.items()}
+    until = until or date.today() + timedelta(days=UPCOMING_DAYS)
+    # Bookings before this are "past"; derived from `until` so reruns match.
+    now = datetime.combine(until - timedelta(days=UPCOMING_DAYS), datetime.min.time())
+    days = math.ceil(volumes["bookings"] / (volumes["stylists"] * DAILY_BOOKINGS))
+    first_day = until - timedelta(days=days)
+    print(f"Generating {volumes['customers']} customers, {volumes['stylists']} stylists and "
+          f"{volumes['bookings']} bookings from {first_day} (seed {seed})", flush=True)
+
+    writer = _BulkWriter(chunk_size, {
+        "customer": volumes["customers"], "stylist": volumes["stylists"], "booking": volumes["bookings"],
+    })
+    password_hash = get_hasher().hash(SCALE_PASSWORD)
+
+    first_customer = _next_id(Customer)
+    for offset in range(volumes["customers"]):
+        customer_id = first_customer + offset
+        writer.add(Customer.__table__, {
+            "id": customer_id, "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            # 01x numbers never collide with the 07x defaults above.
+            "phone": f"01{customer_id:08d}", "password_hash": password_hash, "is_admin": False,
+        })
+
+    writer.flush()
+
+    services = []
+    titles = {}
+    next_service = _next_id(Service)
+    for title, duration, price in CATALOG:
+        existing = Service.query.filter_by(title=title).first()
+        if existing:
+            services.append((existing.id, existing.duration_minutes or 60))
+            titles[existing.id] = title
+            continue
+        writer.add(Service.__table__, {"id": next_service, "title": title, "description": f"{title} service",
+                                       "price": float(price), "duration_minutes": duration})
+        services.append((next_service, duration))
+        titles[next_service] = title
+        next_service += 1
+    writer.flush()
+
+    # Per stylist: id, (service id, duration) offered, review quality, demand multiplier.
+    stylists = []
+    first_stylist = _next_id(Stylist)
+    for offset in range(volumes["stylists"]):
+        stylist_id = first_stylist + offset
+        offered = rng.sample(services, rng.randint(3, 6))
+        writer.add(Stylist.__table__, {"id": stylist_id, "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                                       "bio": f"Specialist in {titles[offered[0][0]].lower()}"})
+        for service_id, _ in offered:
+            writer.add(stylist_service, {"stylist_id": stylist_id, "service_id": service_id})
+        stylists.append((stylist_id, offered, rng.uniform(3.2, 4.8), rng.uniform(0.6, 1.4)))
+    writer.flush()
+
+    booking_id = _next_id(Booking)
+    review_id = _next_id(Review)
+    remaining = volumes["bookings"]
+    day = first_day
+    while remaining > 0:
+        # Spread what is left over the days left, so busy days that hit closing time
+        # are made up later and the history still ends around `until`.
+        average = remaining / (volumes["stylists"] * max(1, (until - day).days + 1))
+        demand = average * WEEKDAY_DEMAND[day.weekday()] * MONTH_DEMAND[day.month - 1]
+        for stylist_id, offered, quality, popularity in stylists:
+            wanted = max(0, round(rng.gauss(demand * popularity, 1.5)))
+            start = datetime.combine(day, datetime.min.time()).replace(hour=OPENING_HOUR)
+            closing = start.replace(hour=CLOSING_HOUR)
+            for _ in range(wanted):
+                start += timedelta(minutes=rng.choice((0, 0, 0, 30, 60)))
+                service_id, duration = rng.choice(offered)
+                end = start + timedelta(minutes=duration)
+                if end > closing or remaining == 0:
+                    break
+                if start < now:
+                    status = _weighted(rng, (("successful", 85), ("incomplete", 9), ("pending", 6)))
+                else:
+                    status = _weighted(rng, (("pending", 65), ("successful", 35)))
+                # Squaring skews demand towards a core of regular customers.
+                customer_id = first_customer + int(volumes["customers"] * rng.random() ** 2)
+                writer.add(Booking.__table__, {
+                    "id": booking_id, "appointment_time": start, "end_time": end, "payment_status": status,
+                    "customer_id": customer_id, "service_id": service_id, "stylist_id": stylist_id,
+                })
+                booking_id += 1
+                remaining -= 1
+                if status == "successful" and end < now and rng.random() < REVIEW_RATE:
+                    writer.add(Review.__table__, {
+                        "id": review_id, "rating": min(5, max(1, round(rng.gauss(quality, 0.9)))),
+                        "comment": None, "created_at": end + timedelta(hours=rng.randint(1, 72)),
+                        "customer_id": customer_id, "stylist_id": stylist_id,
+                    })
+                    review_id += 1
+                start = end
+        day += timedelta(days=1)
+    writer.flush()
+
+    if db.engine.dialect.name == "postgresql":
+        # Ids were assigned explicitly, so move the sequences past them.
+        for table in ("customer", "service", "stylist", "booking", "review"):
+            db.session.execute(text(
+                "SELECT setval(pg_get_serial_sequence(:table_name, 'id'), "
+                "COALESCE((SELECT MAX(id) FROM \"" + table + "\"), 1), true)"
+            ), {"table_name": table})
+    print("Rebuilding rollups, rating aggregates and the search index...", flush=True)
+    rollups.rebuild()
+    search.rebuild()
+    db.session.commit()
+    print(f"Synthetic data ready; generated customers sign in with password {SCALE_PASSWORD}.")
+
+
 if __name__ == "__main__":
-    with app.app_context():
+    parser = argparse.ArgumentParser(description="Seed default data, optionally with a synthetic dataset.")
+    parser.add_argument("--scale", type=float,
+                        help="also generate scale x (100k customers, 500 stylists, 5M bookings)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="random seed for --scale")
+    parser.add_argument("--until", type=date.fromisoformat,
+                        help="last day of generated bookings, YYYY-MM-DD (default: 30 days from today)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"rows per bulk insert and transaction (default {DEFAULT_CHUNK_SIZE})")
+    args = parser.parse_args()
+    with create_app().app_context():
         try:
             seed_database()
+            if args.scale:
+                seed_scale(args.scale, args.seed, args.until, args.chunk_size)
         except Exception:
             db.session.rollback()
             raise
@@ -0,0 +1,142 @@
+"""Precompiled serializers producing the same output as `SerializerMixin.to_dict`.
+
+`to_dict` resolves `serialize_rules` recursively for every object it serializes.
+A `CompiledSerializer` runs that resolution once per (model, only, rules) using
+sqlalchemy_serializer's own `Schema`, and keeps a flat plan of columns to copy
+and relationships to descend into. Serializing then only reads attribute values
+already loaded on each instance; `loader_options()` returns the eager loads a
+query needs for that, and an unloaded attribute raises instead of lazy loading.
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask import Response
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty, selectinload
+from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy_serializer.lib.schema import Schema
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+    import json
+
+MAX_DEPTH = 12
+
+
+class NotLoadedError(RuntimeError):
+    """A serializer reached an attribute the query did not load."""
+
+
+def _converter(column_property, model):
+    try:
+        python_type = column_property.columns[0].type.python_type
+    except NotImplementedError:
+        return None
+    # `time` before `datetime`, mirroring sqlalchemy_serializer's dispatch order.
+    if issubclass(python_type, time):
+        return lambda value, fmt=model.time_format: value.strftime(fmt)
+    if issubclass(python_type, datetime):
+        return lambda value, fmt=model.datetime_format: value.strftime(fmt)
+    if issubclass(python_type, date):
+        return lambda value, fmt=model.date_format: value.strftime(fmt)
+    if issubclass(python_type, Decimal):
+        return lambda value, fmt=model.decimal_format: fmt.format(value)
+    return None
+
+
+class _Plan:
+    __slots__ = ("model", "columns", "relationships")
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = []        # (key, converter or None)
+        self.relationships = []  # (key, uselist, _Plan)
+
+
+def _compile(model, schema, depth):
+    if depth > MAX_DEPTH:
+        raise RecursionError(f"serialize_rules for {model.__name__} do not terminate")
+    if not issubclass(model, SerializerMixin):
+        raise TypeError(f"{model.__name__} does not use SerializerMixin")
+
+    schema.update(only=model.serialize_only, extend=model.serialize_rules)
+    mapper = sa_inspect(model)
+    keys = schema.keys
+    if schema.is_greedy:
+        keys.update(attr.key for attr in mapper.attrs)
+
+    plan = _Plan(model)
+    for key in sorted(keys):
+        if not schema.is_included(key):
+            continue
+        prop = mapper.attrs.get(key)
+        if isinstance(prop, ColumnProperty):
+            plan.columns.append((key, _converter(prop, model)))
+        elif isinstance(prop, RelationshipProperty):
+            child = _compile(prop.mapper.class_, schema.fork(key), depth + 1)
+            plan.relationships.append((key, prop.uselist, child))
+        else:
+            raise TypeError(f"{model.__name__}.{key} is not a mapped column or relationship")
+    return plan
+
+
+def _dump(plan, instance):
+    values = instance.__dict__
+    result = {}
+    for key, convert in plan.columns:
+        try:
+            value = values[key]
+        except KeyError:
+            raise NotLoadedError(f"{plan.model.__name__}.{key} is not loaded") from None
+        result[key] = convert(value) if convert is not None and value is not None else value
+    for key, uselist, child in plan.relationships:
+        try:
+            value = values[key]
+        except KeyError:
+            raise NotLoadedError(f"{plan.model.__name__}.{key} is not loaded") from None
+        if uselist:
+            result[key] = [_dump(child, item) for item in value]
+        else:
+            result[key] = None if value is None else _dump(child, value)
+    return result
+
+
+def _options(plan):
+    options = []
+    for key, _, child in plan.relationships:
+        loader = selectinload(getattr(plan.model, key))
+        nested = _options(child)
+        options.append(loader.options(*nested) if nested else loader)
+    return options
+
+
+class CompiledSerializer:
+    def __init__(self, model, only=(), rules=()):
+        schema = Schema()
+        schema.update(only=only, extend=rules)
+        self.model = model
+        self._plan = _compile(model, schema, 0)
+
+    def loader_options(self):
+        """Eager-load options covering every relationship this serializer reads."""
+        return _options(self._plan)
+
+    def dump(self, instance):
+        return _dump(self._plan, instance)
+
+    def dump_many(self, instances):
+        plan = self._plan
+        return [_dump(plan, instance) for instance in instances]
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype="application/json")
@@ -0,0 +1,115 @@
+"""Fixtures for running the API against migrated SQLite files.
+
+Run from server/ with `python -m pytest`. Every test app runs with SQL_STRICT,
+so any request over its query budget fails the test.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SERVER_DIR))
+
+import auth  # noqa: E402
+import payment_events  # noqa: E402
+import resources  # noqa: E402
+import seed  # noqa: E402
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import Customer, db  # noqa: E402
+
+# 400 customers, 2 stylists and 20k bookings: enough rows for an N+1 to show.
+SEED_SCALE = 0.004
+
+
+def sqlite_url(path):
+    return "sqlite:///" + Path(path).as_posix()
+
+
+def make_app(database, replicas=(), **overrides):
+    config = type("TestConfig", (Config,), {
+        "TESTING": True,
+        "JWT_SECRET_KEY": "test-only-jwt-secret-key-32-bytes-long",
+        "SQLALCHEMY_DATABASE_URI": sqlite_url(database),
+        "SQLALCHEMY_REPLICA_URIS": [sqlite_url(replica) for replica in replicas],
+        "SQL_INSTRUMENTATION": True,
+        "SQL_STRICT": True,
+        "BCRYPT_LOG_ROUNDS": 4,
+        **overrides,
+    })
+    # The admin roster version, the catalog and the status broker are per process; each app starts its own.
+    auth._admin_roles = None
+    resources._catalog_cache = None
+    payment_events._broker = None
+    return create_app(config)
+
+
+@pytest.fixture(scope="session")
+def migrated_database(tmp_path_factory):
+    """A migrated SQLite file with only the default seed (seed.seed_database)."""
+    path = tmp_path_factory.mktemp("db") / "migrated.db"
+    # In a separate process, as deployed: env.py's logging setup would disable this process's loggers.
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "db", "upgrade"], cwd=SERVER_DIR,
+                   env={**os.environ, "DATABASE_URL": sqlite_url(path)}, check=True, capture_output=True)
+    with make_app(path).app_context():
+        seed.seed_database()
+        db.engine.dispose()
+    return path
+
+
+@pytest.fixture(scope="session")
+def seeded_database(migrated_database, tmp_path_factory):
+    """The default seed plus a small synthetic dataset (seed.seed_scale)."""
+    path = tmp_path_factory.mktemp("db") / "seeded.db"
+    shutil.copyfile(migrated_database, path)
+    with make_app(path).app_context():
+        seed.seed_scale(SEED_SCALE)
+        db.engine.dispose()
+    return path
+
+
+@pytest.fixture
+def database(migrated_database, tmp_path):
+    """A private copy of the default-seeded database for one test."""
+    path = tmp_path / "primary.db"
+    shutil.copyfile(migrated_database, path)
+    return path
+
+
+@pytest.fixture
+def app(database):
+    return make_app(database)
+
+
+@pytest.fixture
+def seeded_app(seeded_database, tmp_path):
+    """An app on a private copy of the database with the synthetic dataset."""
+    path = tmp_path / "seeded.db"
+    shutil.copyfile(seeded_database, path)
+    return make_app(path)
+
+
+@pytest.fixture
+def token_for():
+    def issue(app, customer):
+        with app.test_request_context():
+            return {"Authorization": f"Bearer {auth.issue_access_token(customer)}"}
+    return issue
+
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        return Customer.query.filter_by(is_admin=True).first()
+
+
+@pytest.fixture
+def customer(app):
+    """Alice Johnson from the default seed; she has one upcoming booking."""
+    with app.app_context():
+        return Customer.query.filter_by(phone="0765235645").first()
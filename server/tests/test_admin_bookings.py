@@ -0,0 +1,68 @@
+"""GET /admin/bookings: keyset pages, filters and one joined query per page."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from sqlalchemy import func, select
+
+from models import Booking, Customer, db
+
+
+@pytest.fixture
+def headers(seeded_app, token_for):
+    with seeded_app.app_context():
+        admin = Customer.query.filter_by(is_admin=True).first()
+    return token_for(seeded_app, admin)
+
+
+def _all_pages(client, headers, query):
+    bookings, cursor = [], None
+    while True:
+        page = client.get(f"/admin/bookings?{query}" + (f"&cursor={cursor}" if cursor else ""), headers=headers)
+        assert page.status_code == 200
+        bookings.extend(page.json["bookings"])
+        cursor = page.json["next_cursor"]
+        if not cursor:
+            return bookings
+
+
+def test_pages_are_ordered_without_gaps_or_repeats(seeded_app, headers):
+    client = seeded_app.test_client()
+    window = f"start={date.today() - timedelta(days=90)}&end={date.today()}"
+    bookings = _all_pages(client, headers, f"{window}&limit=100")
+    keys = [(b["appointment_time"], b["id"]) for b in bookings]
+    with seeded_app.app_context():
+        total = db.session.execute(select(func.count(Booking.id)).where(
+            Booking.appointment_time >= date.today() - timedelta(days=90),
+            Booking.appointment_time < date.today() + timedelta(days=1),
+        )).scalar()
+    assert bookings and len(bookings) == total
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+    everything = client.get(f"/admin/bookings?{window}&limit=100", headers=headers)
+    assert everything.json["bookings"] == bookings[:100]
+
+
+def test_filters(seeded_app, headers):
+    response = seeded_app.test_client().get("/admin/bookings?stylist_id=1&payment_status=pending&limit=50",
+                                            headers=headers)
+    assert response.status_code == 200
+    assert response.json["bookings"]
+    for booking in response.json["bookings"]:
+        assert booking["stylist_id"] == 1
+        assert booking["payment_status"] == "pending"
+        assert booking["customer_name"] and booking["stylist_name"] and booking["service_name"]
+
+
+@pytest.mark.parametrize("query", ["start=yesterday", "stylist_id=one", "cursor=garbage", "limit=0"])
+def test_invalid_arguments(seeded_app, headers, query):
+    response = seeded_app.test_client().get(f"/admin/bookings?{query}", headers=headers)
+    assert response.status_code == 400
+
+
+def test_customers_are_refused(seeded_app, token_for):
+    with seeded_app.app_context():
+        customer = Customer.query.filter_by(is_admin=False).first()
+    response = seeded_app.test_client().get("/admin/bookings", headers=token_for(seeded_app, customer))
+    assert response.status_code == 403
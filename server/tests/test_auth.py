@@ -0,0 +1,56 @@
+"""Admin checks trust a token's claim only while the admin roster version is unchanged."""
+
+from sqlalchemy import text
+
+import auth
+from auth import Identity
+from cache import SharedVersion
+from conftest import make_app
+from models import Customer, db
+
+
+def claims_for(customer, **overrides):
+    return {"is_admin": bool(customer.is_admin), "roles_version": auth.admin_roles().current(), **overrides}
+
+
+def test_current_claims_skip_the_customer_row(app, admin, customer):
+    with app.app_context():
+        for who, expected in ((admin, True), (customer, False)):
+            identity = Identity(who.id, claims_for(who))
+            assert identity.is_admin is expected
+            assert not identity._customer_loaded
+
+
+def test_stale_claims_are_checked_against_the_database(app, admin):
+    with app.app_context():
+        claims = claims_for(admin)
+        auth.set_admin(Customer.query.filter_by(phone="0789098790").one(), True)
+        db.session.commit()
+
+        identity = Identity(admin.id, claims)
+        assert identity.is_admin is True
+        assert identity._customer_loaded
+        # Forged or stale: an admin claim for a customer who is not one.
+        assert Identity(admin.id + 1, {**claims, "is_admin": True}).is_admin is False
+
+
+def test_revoking_admin_rejects_existing_tokens(app, admin, token_for):
+    client, headers = app.test_client(), token_for(app, admin)
+    assert client.get("/admin/users", headers=headers).status_code == 200
+
+    result = app.test_cli_runner().invoke(args=["set-admin", admin.phone, "--revoke"])
+    assert result.exit_code == 0, result.output
+    assert client.get("/admin/users", headers=headers).status_code == 403
+
+
+def test_other_processes_see_the_revocation_after_the_ttl(database, admin, token_for):
+    app = make_app(database, ADMIN_ROLES_CACHE_TTL=0)
+    client, headers = app.test_client(), token_for(app, admin)
+    assert client.get("/admin/users", headers=headers).status_code == 200
+
+    with app.app_context():
+        # What `flask set-admin --revoke` commits from another process, with its own SharedVersion.
+        db.session.execute(text("UPDATE customer SET is_admin = 0 WHERE id = :id"), {"id": admin.id})
+        SharedVersion(auth.ADMIN_ROLES_VERSION).bump()
+        db.session.commit()
+    assert client.get("/admin/users", headers=headers).status_code == 403
@@ -0,0 +1,91 @@
+"""Service durations, database-enforced booking overlaps and slot search."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from models import Service, Stylist
+
+DAY = date.today() + timedelta(days=10)
+
+
+def at(hour, minute=0):
+    return datetime.combine(DAY, datetime.min.time()).replace(hour=hour, minute=minute)
+
+
+@pytest.fixture
+def sophie(app):
+    """Offers Haircut and Hair Coloring, 60 minutes each, working the default 09:00-18:00."""
+    with app.app_context():
+        return Stylist.query.filter_by(name="Sophie Lee").first().id
+
+
+@pytest.fixture
+def haircut(app):
+    with app.app_context():
+        return Service.query.filter_by(title="Haircut").first().id
+
+
+def book(client, headers, stylist_id, service_id, start):
+    return client.post("/bookings", headers=headers, json={
+        "stylist_id": stylist_id, "service_id": service_id, "appointment_time": start.isoformat(),
+    })
+
+
+def test_overlapping_bookings_are_rejected(app, customer, token_for, sophie, haircut):
+    client, headers = app.test_client(), token_for(app, customer)
+    assert book(client, headers, sophie, haircut, at(10)).status_code == 201
+    assert book(client, headers, sophie, haircut, at(10, 30)).status_code == 409
+    assert book(client, headers, sophie, haircut, at(9, 30)).status_code == 409
+    # Back to back is fine: bookings are half-open [start, end).
+    assert book(client, headers, sophie, haircut, at(11)).status_code == 201
+
+
+def test_availability_leaves_out_booked_time(app, customer, token_for, sophie, haircut):
+    client = app.test_client()
+    assert book(client, token_for(app, customer), sophie, haircut, at(10)).status_code == 201
+
+    response = client.get(f"/stylists/{sophie}/availability?date={DAY}&service_id={haircut}")
+    assert response.status_code == 200
+    starts = [slot["start"] for slot in response.json["slots"]]
+    assert starts[0] == str(at(9)) and starts[-1] == str(at(17))
+    assert not {str(at(9, 30)), str(at(10)), str(at(10, 30))} & set(starts)
+    assert str(at(11)) in starts
+
+
+def test_first_available_skips_a_booked_slot(app, customer, token_for, sophie, haircut):
+    client = app.test_client()
+    with app.app_context():
+        coloring = Service.query.filter_by(title="Hair Coloring").first().id
+        david = Stylist.query.filter_by(name="David Kim").first().id
+    headers = token_for(app, customer)
+    # Both stylists who offer coloring are busy at 09:00.
+    assert book(client, headers, sophie, coloring, at(9)).status_code == 201
+    assert book(client, headers, david, coloring, at(9)).status_code == 201
+
+    response = client.get(f"/services/{coloring}/first-available?from={at(9).isoformat()}")
+    assert response.status_code == 200
+    assert response.json["start"] == str(at(10))
+
+
+@pytest.mark.parametrize("duration", ["abc", [30], 0])
+def test_invalid_durations_are_400(app, customer, token_for, haircut, duration):
+    client, headers = app.test_client(), token_for(app, customer)
+    created = client.post("/services", headers=headers,
+                          json={"title": "Trim", "price": 10, "duration_minutes": duration})
+    assert created.status_code == 400
+
+    updated = client.put(f"/services/{haircut}", headers=headers,
+                         json={"title": "Renamed", "duration_minutes": duration})
+    assert updated.status_code == 400
+    with app.app_context():
+        service = Service.query.get(haircut)
+        assert (service.title, service.duration_minutes) == ("Haircut", 60)
+
+
+def test_longer_services_block_more_time(app, customer, token_for, sophie, haircut):
+    client, headers = app.test_client(), token_for(app, customer)
+    assert client.put(f"/services/{haircut}", headers=headers, json={"duration_minutes": 90}).status_code == 200
+    assert book(client, headers, sophie, haircut, at(10)).status_code == 201
+    assert book(client, headers, sophie, haircut, at(11)).status_code == 409
+    assert book(client, headers, sophie, haircut, at(11, 30)).status_code == 201
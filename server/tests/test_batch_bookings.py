@@ -0,0 +1,89 @@
+"""POST /bookings/batch: many slots in one request, with conflicting ones skipped."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import availability
+from models import Booking, db
+
+# Sophie Lee offers the 60-minute Haircut (service 1).
+SOPHIE, HAIRCUT = 1, 1
+FIRST = datetime.combine(date.today() + timedelta(days=14), datetime.min.time()).replace(hour=10)
+
+
+@pytest.fixture
+def post(app, customer, token_for):
+    headers = token_for(app, customer)
+
+    def post(**body):
+        return app.test_client().post("/bookings/batch", headers=headers,
+                                      json={"stylist_id": SOPHIE, "service_id": HAIRCUT, **body})
+    return post
+
+
+def bookings_from(app, start):
+    with app.app_context():
+        return Booking.query.filter(Booking.stylist_id == SOPHIE, Booking.appointment_time >= start).count()
+
+
+def test_weekly_recurrence_skips_taken_slots(app, post):
+    assert post(slots=[(FIRST + timedelta(weeks=2)).isoformat()]).status_code == 201
+
+    response = post(recurrence={"start": FIRST.isoformat(), "frequency": "weekly", "count": 4})
+    assert response.status_code == 201
+    assert response.json["booked"] == 3
+    assert [result["status"] for result in response.json["results"]] == ["booked", "booked", "conflict", "booked"]
+    assert response.json["results"][0]["end_time"] == str(FIRST + timedelta(hours=1))
+    assert bookings_from(app, FIRST) == 4
+
+
+def test_until_is_inclusive(post):
+    response = post(recurrence={"start": FIRST.isoformat(), "frequency": "daily", "interval": 2,
+                                "until": (FIRST + timedelta(days=6)).date().isoformat()})
+    assert response.json["booked"] == 4
+
+
+def test_slots_that_overlap_each_other(post):
+    response = post(slots=[FIRST.isoformat(), (FIRST + timedelta(minutes=30)).isoformat(), FIRST.isoformat()])
+    assert [result["status"] for result in response.json["results"]] == ["booked", "conflict"]
+
+
+def test_nothing_free_is_409(app, post):
+    assert post(slots=[FIRST.isoformat()]).status_code == 201
+    response = post(slots=[FIRST.isoformat()])
+    assert response.status_code == 409
+    assert response.json["booked"] == 0
+    assert bookings_from(app, FIRST) == 1
+
+
+def test_a_racing_booking_is_retried(app, post, monkeypatch):
+    assert post(slots=[(FIRST + timedelta(days=1)).isoformat()]).status_code == 201
+    load_busy = availability.load_busy
+    calls = []
+
+    def stale_then_fresh(*args):
+        # The first pass misses the booking above, as if it committed just after the read.
+        calls.append(args)
+        return {} if len(calls) == 1 else load_busy(*args)
+
+    monkeypatch.setattr(availability, "load_busy", stale_then_fresh)
+    response = post(recurrence={"start": FIRST.isoformat(), "frequency": "daily", "count": 3})
+    assert response.status_code == 201
+    assert len(calls) == 2
+    assert [result["status"] for result in response.json["results"]] == ["booked", "conflict", "booked"]
+    assert bookings_from(app, FIRST) == 3
+
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"slots": ["next tuesday"]},
+    {"recurrence": {"start": FIRST.isoformat(), "frequency": "monthly", "count": 2}},
+    {"recurrence": {"start": FIRST.isoformat(), "count": 2, "until": "2030-01-01"}},
+    {"recurrence": {"start": FIRST.isoformat(), "frequency": "daily", "count": 53}},
+    {"slots": [FIRST.isoformat()], "service_id": 3},  # Sophie does not do manicures
+])
+def test_invalid_requests_are_400(app, post, body):
+    assert post(**body).status_code == 400
+    with app.app_context():
+        assert db.session.query(Booking).filter(Booking.appointment_time >= FIRST).count() == 0
@@ -0,0 +1,72 @@
+"""GET /bookings: the customer's own history in keyset pages, one joined query each."""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from models import Booking, Customer, db
+
+
+@pytest.fixture
+def busiest(seeded_app, token_for):
+    """Headers and booking count for the customer with the most bookings."""
+    with seeded_app.app_context():
+        customer_id, count = db.session.execute(
+            select(Booking.customer_id, func.count(Booking.id)).group_by(Booking.customer_id)
+            .order_by(func.count(Booking.id).desc()).limit(1)
+        ).one()
+        return token_for(seeded_app, db.session.get(Customer, customer_id)), customer_id, count
+
+
+def pages(client, headers, query):
+    bookings, cursor = [], None
+    while True:
+        page = client.get(f"/bookings?{query}" + (f"&cursor={cursor}" if cursor else ""), headers=headers)
+        assert page.status_code == 200
+        bookings.extend(page.json["bookings"])
+        cursor = page.json["next_cursor"]
+        if not cursor:
+            return bookings
+
+
+def test_past_and_upcoming_cover_every_booking_once(seeded_app, busiest):
+    headers, _, count = busiest
+    client = seeded_app.test_client()
+    past = pages(client, headers, "view=past&limit=5")
+    upcoming = pages(client, headers, "view=upcoming&limit=5")
+
+    now = str(datetime.now())
+    assert all(b["appointment_time"] < now for b in past)
+    assert all(b["appointment_time"] >= now for b in upcoming)
+    past_keys = [(b["appointment_time"], b["id"]) for b in past]
+    upcoming_keys = [(b["appointment_time"], b["id"]) for b in upcoming]
+    assert past_keys == sorted(past_keys, reverse=True)
+    assert upcoming_keys == sorted(upcoming_keys)
+    assert len({b["id"] for b in past + upcoming}) == len(past) + len(upcoming) == count
+
+
+@pytest.mark.parametrize("query", ["", "?view=upcoming", "?view=past&limit=100", "?payment_status=pending"])
+def test_each_page_is_one_query(seeded_app, busiest, query):
+    headers, _, _ = busiest
+    response = seeded_app.test_client().get(f"/bookings{query}", headers=headers)
+    assert response.status_code == 200
+    assert response.json["bookings"]
+    row = response.json["bookings"][0]
+    assert row["stylist_name"] and row["service_name"] and row["service_price"] is not None
+    if "payment_status" in query:
+        assert {b["payment_status"] for b in response.json["bookings"]} == {"pending"}
+
+
+def test_only_the_callers_bookings(seeded_app, busiest):
+    headers, customer_id, _ = busiest
+    ids = [b["id"] for b in pages(seeded_app.test_client(), headers, "limit=100")]
+    with seeded_app.app_context():
+        owners = db.session.execute(select(Booking.customer_id).where(Booking.id.in_(ids)).distinct()).scalars()
+        assert list(owners) == [customer_id]
+
+
+@pytest.mark.parametrize("query", ["view=soon", "limit=0", "cursor=garbage"])
+def test_invalid_arguments(seeded_app, busiest, query):
+    headers, _, _ = busiest
+    assert seeded_app.test_client().get(f"/bookings?{query}", headers=headers).status_code == 400
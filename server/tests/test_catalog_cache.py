@@ -0,0 +1,47 @@
+"""GET /services: a versioned per-process catalog with strong ETags."""
+
+from sqlalchemy import text
+
+from conftest import make_app
+from models import db
+
+
+def test_unchanged_catalog_answers_304(app):
+    client = app.test_client()
+    first = client.get("/services")
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+    etag = first.headers["ETag"]
+    assert [service["title"] for service in first.json][:3] == ["Haircut", "Hair Coloring", "Manicure"]
+
+    again = client.get("/services", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_writes_change_the_etag_immediately(app, customer, token_for):
+    client = app.test_client()
+    etag = client.get("/services").headers["ETag"]
+    created = client.post("/services", json={"title": "Pedicure", "price": 20},
+                          headers=token_for(app, customer))
+    assert created.status_code == 201
+
+    # Same worker, well within CATALOG_CACHE_TTL: the write bumped the version it checks.
+    response = client.get("/services", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "Pedicure" in [service["title"] for service in response.json]
+
+
+def test_other_workers_see_a_bumped_version_after_the_ttl(database):
+    app = make_app(database, CATALOG_CACHE_TTL=0)
+    client = app.test_client()
+    etag = client.get("/services").headers["ETag"]
+    # Another worker's write: the row and the shared version change, this process's cache does not.
+    with app.app_context():
+        db.session.execute(text("UPDATE service SET price = 99 WHERE title = 'Haircut'"))
+        db.session.execute(text("UPDATE cache_version SET version = version + 1 WHERE name = 'catalog'"))
+        db.session.commit()
+    response = client.get("/services", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert {service["title"]: service["price"] for service in response.json}["Haircut"] == 99
@@ -0,0 +1,90 @@
+"""MpesaClient against a local stub of the Daraja API."""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from mpesa import MpesaClient
+
+
+class StubDaraja(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        stub = self.server
+        with stub.lock:
+            stub.token_requests += 1
+            stub.token = f"token-{stub.token_requests}"
+        self._reply(200, {"access_token": stub.token, "expires_in": "3599"})
+
+    def do_POST(self):
+        stub = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with stub.lock:
+            stub.connections.add(self.client_address)
+            stub.pushes += 1
+            revoked = stub.revoke_next
+            stub.revoke_next = False
+        if revoked or self.headers["Authorization"] != f"Bearer {stub.token}":
+            self._reply(401, {"errorMessage": "Invalid Access Token"})
+        else:
+            self._reply(200, {"ResponseCode": "0", "CheckoutRequestID": f"ws_CO_{stub.pushes}"})
+
+
+@pytest.fixture
+def daraja():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubDaraja)
+    server.lock = threading.Lock()
+    server.token = None
+    server.token_requests = 0
+    server.pushes = 0
+    server.connections = set()
+    server.revoke_next = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(daraja):
+    client = MpesaClient("key", "secret", base_url=f"http://127.0.0.1:{daraja.server_port}")
+    yield client
+    client.session.close()
+
+
+def test_concurrent_callers_share_one_token_request(client, daraja):
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        tokens = set(pool.map(lambda _: client.access_token(), range(20)))
+    assert tokens == {"token-1"}
+    assert daraja.token_requests == 1
+
+
+def test_pushes_reuse_one_connection(client, daraja):
+    for _ in range(3):
+        assert client.stk_push({"Amount": 1})["ResponseCode"] == "0"
+    assert daraja.token_requests == 1
+    assert len(daraja.connections) == 1
+
+
+def test_revoked_token_is_refreshed_once(client, daraja):
+    client.access_token()
+    daraja.revoke_next = True
+    assert client.stk_push({"Amount": 1})["ResponseCode"] == "0"
+    assert daraja.token_requests == 2
+    assert daraja.pushes == 2
@@ -0,0 +1,81 @@
+"""The bcrypt process pool: startup calibration, back-pressure, rehashing and recovery."""
+
+import os
+import signal
+
+import bcrypt
+import pytest
+
+import passwords
+from conftest import make_app
+from config import Config
+from models import Customer, db
+from passwords import HasherBusy, PasswordHasher, hash_rounds
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    """A one-process hasher at cost 5, installed as the process-wide one."""
+    hasher = PasswordHasher(rounds=5, workers=1, max_queue=0)
+    monkeypatch.setattr(passwords, "_hasher", hasher)
+    yield hasher
+    hasher.shutdown()
+
+
+def login(app, password="admin123"):
+    return app.test_client().post("/login", json={"phone": "0700123456", "password": password})
+
+
+def stored_rounds(app):
+    with app.app_context():
+        return hash_rounds(Customer.query.filter_by(phone="0700123456").one().password_hash)
+
+
+def test_cost_is_calibrated_at_startup(database):
+    app = make_app(database, BCRYPT_LOG_ROUNDS=None)
+    assert passwords.MIN_ROUNDS <= app.config["BCRYPT_LOG_ROUNDS"] <= passwords.MAX_ROUNDS
+
+
+def test_production_does_not_require_a_fixed_cost(monkeypatch):
+    for name in ("DATABASE_URL", "SECRET_KEY", "JWT_SECRET_KEY"):
+        monkeypatch.setenv(name, "set")
+    monkeypatch.delenv("BCRYPT_LOG_ROUNDS", raising=False)
+    production = type("ProductionConfig", (Config,), {
+        "IS_PRODUCTION": True, "SQLALCHEMY_DATABASE_URI": "postgresql://db/app", "SQLALCHEMY_REPLICA_URIS": [],
+    })
+    production.validate()
+
+
+def test_login_answers_503_when_the_pool_is_full(app, hasher):
+    assert hasher._slots.acquire(blocking=False)  # another request holds the only slot
+    response = login(app)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    hasher._slots.release()
+    assert login(app).status_code == 200
+
+
+def test_login_only_ever_raises_the_cost(app, hasher):
+    assert stored_rounds(app) == 4
+    assert login(app).status_code == 200
+    assert stored_rounds(app) == 5
+
+    with app.app_context():
+        admin = Customer.query.filter_by(phone="0700123456").one()
+        admin.password_hash = bcrypt.hashpw(b"admin123", bcrypt.gensalt(6)).decode()
+        db.session.commit()
+    # A process that calibrated lower must not downgrade a stronger hash.
+    assert login(app).status_code == 200
+    assert stored_rounds(app) == 6
+    assert login(app, "wrong").status_code == 401
+
+
+def test_a_dead_hashing_process_is_replaced(hasher):
+    assert hasher.check(hasher.hash("secret"), "secret")
+    broken = hasher._pool
+    for pid in list(broken._processes):
+        os.kill(pid, signal.SIGKILL)
+    with pytest.raises(HasherBusy):
+        hasher.hash("secret")
+    assert hasher._pool is not broken
+    assert hasher.check(hasher.hash("secret"), "secret")
@@ -0,0 +1,102 @@
+"""The M-Pesa callback inbox: stored once per CheckoutRequestID, applied in batches."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import payment_callbacks
+from conftest import make_app
+from models import AnalyticsRollup, Booking, MpesaCallbackRecord, db
+
+
+def callback(checkout_request_id, result_code=0):
+    stk_callback = {"MerchantRequestID": "m-1", "CheckoutRequestID": checkout_request_id,
+                    "ResultCode": result_code, "ResultDesc": "Done"}
+    if result_code == 0:
+        stk_callback["CallbackMetadata"] = {"Item": [
+            {"Name": "Amount", "Value": 30.0},
+            {"Name": "MpesaReceiptNumber", "Value": "RJ41XYZ"},
+            {"Name": "TransactionDate", "Value": 20261018101010},
+            {"Name": "PhoneNumber", "Value": 254765235645},
+        ]}
+    return {"Body": {"stkCallback": stk_callback}}
+
+
+@pytest.fixture
+def bookings(app):
+    """Both seeded bookings, awaiting the callbacks for ws_CO_A and ws_CO_B."""
+    with app.app_context():
+        found = Booking.query.order_by(Booking.id).all()
+        for booking, checkout_request_id in zip(found, ("ws_CO_A", "ws_CO_B")):
+            booking.payment_intent_id = checkout_request_id
+        db.session.commit()
+        return [booking.id for booking in found]
+
+
+def paid_revenue():
+    row = db.session.get(AnalyticsRollup, ("paid_bookings", 0))
+    return row.amount if row else 0.0
+
+
+def test_retried_callbacks_are_stored_once(app):
+    client = app.test_client()
+    for _ in range(3):
+        response = client.post("/mpesa-callback", json=callback("ws_CO_A"))
+        assert response.json == {"ResultCode": 0, "ResultDesc": "Accepted"}
+    with app.app_context():
+        stored = MpesaCallbackRecord.query.one()
+        assert (stored.receipt_number, stored.amount, stored.phone_number) == ("RJ41XYZ", 30.0, "254765235645")
+        assert stored.transaction_date == datetime(2026, 10, 18, 10, 10, 10)
+
+
+def test_apply_pending_settles_bookings(app, bookings):
+    client = app.test_client()
+    client.post("/mpesa-callback", json=callback("ws_CO_A"))
+    client.post("/mpesa-callback", json=callback("ws_CO_B", result_code=1032))  # cancelled by the customer
+    with app.app_context():
+        assert payment_callbacks.apply_pending(10) == 2
+        first, second = (db.session.get(Booking, booking_id) for booking_id in bookings)
+        assert (first.payment_status, second.payment_status) == ("successful", "incomplete")
+        assert paid_revenue() == first.service.price
+        assert {(c.checkout_request_id, c.booking_id) for c in MpesaCallbackRecord.query} == {
+            ("ws_CO_A", bookings[0]), ("ws_CO_B", bookings[1]),
+        }
+        assert MpesaCallbackRecord.query.filter(MpesaCallbackRecord.processed_at.is_(None)).count() == 0
+        # Nothing left to claim, and applying again changes nothing.
+        assert payment_callbacks.apply_pending(10) == 0
+        assert paid_revenue() == first.service.price
+
+
+def test_batches_are_bounded(app, bookings):
+    with app.app_context():
+        payment_callbacks.record(callback("ws_CO_A"))
+        payment_callbacks.record(callback("ws_CO_B"))
+        assert payment_callbacks.apply_pending(1) == 1
+        assert payment_callbacks.apply_pending(1) == 1
+        assert payment_callbacks.apply_pending(1) == 0
+
+
+def test_early_callbacks_wait_for_their_booking(app, bookings):
+    with app.app_context():
+        payment_callbacks.record(callback("ws_CO_LATE"))
+        assert payment_callbacks.apply_pending(10) == 1
+        waiting = MpesaCallbackRecord.query.one()
+        assert waiting.processed_at is None and waiting.retry_at > datetime.now()
+        assert payment_callbacks.apply_pending(10) == 0  # not due yet
+
+        # The payment job records the CheckoutRequestID, and the retry comes due.
+        db.session.get(Booking, bookings[0]).payment_intent_id = "ws_CO_LATE"
+        waiting.retry_at = datetime.now() - timedelta(seconds=1)
+        db.session.commit()
+        assert payment_callbacks.apply_pending(10) == 1
+        assert db.session.get(Booking, bookings[0]).payment_status == "successful"
+        assert MpesaCallbackRecord.query.one().booking_id == bookings[0]
+
+
+def test_unmatched_callbacks_close_after_the_window(database):
+    app = make_app(database, MPESA_CALLBACK_MATCH_WINDOW=0)
+    with app.app_context():
+        payment_callbacks.record(callback("ws_CO_UNKNOWN"))
+        assert payment_callbacks.apply_pending(10) == 1
+        closed = MpesaCallbackRecord.query.one()
+        assert closed.processed_at is not None and closed.booking_id is None
@@ -0,0 +1,138 @@
+"""The STK push queue: which Daraja failures are retried, failed or left for the callback."""
+
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+import urllib3
+
+import payment_callbacks
+import payment_jobs
+from models import Booking, PaymentJob, db
+
+PHONE = "254700000001"
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} Error", response=response)
+
+
+class FakeDaraja:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def stk_push(self, payload):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+@pytest.fixture(autouse=True)
+def stk_settings(monkeypatch):
+    monkeypatch.setenv("MPESA_SHORTCODE", "174379")
+    monkeypatch.setenv("MPESA_PASSKEY", "passkey")
+    monkeypatch.setenv("MPESA_CALLBACK_URL", "https://example.test/mpesa-callback")
+
+
+@pytest.fixture
+def booking_id(app, customer):
+    with app.app_context():
+        booking = Booking.query.filter_by(customer_id=customer.id).first()
+        payment_jobs.enqueue(booking, PHONE, 30)
+        db.session.commit()
+        return booking.id
+
+
+def push(app, monkeypatch, outcome):
+    """Run the next due job against a Daraja that answers with `outcome`; return (job, booking status)."""
+    daraja = FakeDaraja(outcome)
+    monkeypatch.setattr(payment_jobs, "get_mpesa_client", lambda: daraja)
+    with app.app_context():
+        job_ids = payment_jobs.claim(1)
+        assert len(job_ids) == 1
+        payment_jobs.process(job_ids[0])
+        job = db.session.get(PaymentJob, job_ids[0])
+        return job.status, job.booking.payment_status
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ConnectTimeout("connect timed out"),
+    requests.exceptions.ConnectionError("Name or service not known"),
+    http_error(429),
+])
+def test_unsent_pushes_are_retried(app, monkeypatch, booking_id, error):
+    assert push(app, monkeypatch, error) == ("queued", "pending")
+    with app.app_context():
+        assert PaymentJob.query.filter_by(booking_id=booking_id).one().run_at > datetime.now()
+
+
+def test_retries_stop_at_max_attempts(app, monkeypatch, booking_id):
+    with app.app_context():
+        db.session.execute(db.update(PaymentJob).values(attempts=app.config["PAYMENT_JOB_MAX_ATTEMPTS"] - 1))
+        db.session.commit()
+    assert push(app, monkeypatch, requests.exceptions.ConnectTimeout()) == ("failed", "incomplete")
+
+
+def test_rejections_fail_the_job(app, monkeypatch, booking_id):
+    assert push(app, monkeypatch, http_error(400)) == ("failed", "incomplete")
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ReadTimeout("read timed out"),
+    http_error(503),
+    requests.exceptions.JSONDecodeError("Expecting value", "<html>", 0),
+    requests.exceptions.ConnectionError(urllib3.exceptions.ProtocolError("Connection aborted.")),
+])
+def test_unknown_outcomes_are_not_pushed_again(app, monkeypatch, booking_id, error):
+    assert push(app, monkeypatch, error) == ("unconfirmed", "pending")
+    with app.app_context():
+        # A second request for the booking gets the unconfirmed job back instead of a new push.
+        job = payment_jobs.enqueue(db.session.get(Booking, booking_id), PHONE, 30)
+        assert job.status == "unconfirmed"
+        assert payment_jobs.claim(1) == []
+
+
+def test_success_records_the_checkout_request(app, monkeypatch, booking_id):
+    assert push(app, monkeypatch, {"CheckoutRequestID": "ws_CO_1"}) == ("succeeded", "pending")
+    with app.app_context():
+        assert db.session.get(Booking, booking_id).payment_intent_id == "ws_CO_1"
+
+
+def callback(checkout_request_id, phone, amount):
+    return {"Body": {"stkCallback": {
+        "MerchantRequestID": "m-1", "CheckoutRequestID": checkout_request_id,
+        "ResultCode": 0, "ResultDesc": "The service request is processed successfully.",
+        "CallbackMetadata": {"Item": [
+            {"Name": "Amount", "Value": amount},
+            {"Name": "MpesaReceiptNumber", "Value": "RJ41XYZ"},
+            {"Name": "TransactionDate", "Value": 20261018101010},
+            {"Name": "PhoneNumber", "Value": int(phone)},
+        ]},
+    }}}
+
+
+def test_callback_settles_an_unconfirmed_job(app, monkeypatch, booking_id):
+    push(app, monkeypatch, requests.exceptions.ReadTimeout())
+    with app.app_context():
+        payment_callbacks.record(callback("ws_CO_2", "254711111111", 30.0))  # someone else's payment
+        payment_callbacks.record(callback("ws_CO_3", PHONE, 30.0))
+        payment_callbacks.apply_pending(10)
+        job = PaymentJob.query.filter_by(booking_id=booking_id).one()
+        assert (job.status, job.checkout_request_id) == ("succeeded", "ws_CO_3")
+        booking = db.session.get(Booking, booking_id)
+        assert (booking.payment_intent_id, booking.payment_status) == ("ws_CO_3", "successful")
+
+
+def test_unconfirmed_jobs_expire_without_a_callback(app, monkeypatch, booking_id):
+    push(app, monkeypatch, requests.exceptions.ReadTimeout())
+    with app.app_context():
+        payment_jobs.expire_unconfirmed()
+        assert PaymentJob.query.filter_by(booking_id=booking_id).one().status == "unconfirmed"
+
+        db.session.execute(db.update(PaymentJob).values(run_at=datetime.now() - timedelta(seconds=1)))
+        db.session.commit()
+        payment_jobs.expire_unconfirmed()
+        job = PaymentJob.query.filter_by(booking_id=booking_id).one()
+        assert (job.status, job.booking.payment_status) == ("failed", "incomplete")
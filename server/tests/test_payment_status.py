@@ -0,0 +1,53 @@
+"""Payment status reads and the per-process cap on clients waiting for a change."""
+
+import pytest
+from sqlalchemy import func, select
+
+import payment_events
+from conftest import make_app
+from models import Booking, Customer, db
+
+
+@pytest.fixture
+def booking_id(app, customer):
+    with app.app_context():
+        return Booking.query.filter_by(customer_id=customer.id).first().id
+
+
+def test_payment_status_query_budget(seeded_app, token_for):
+    with seeded_app.app_context():
+        customer_id, booking_id = db.session.execute(
+            select(Booking.customer_id, func.min(Booking.id)).group_by(Booking.customer_id).limit(1)
+        ).one()
+        customer = db.session.get(Customer, customer_id)
+    response = seeded_app.test_client().get(f"/bookings/{booking_id}/payment-status",
+                                            headers=token_for(seeded_app, customer))
+    assert response.status_code == 200
+    assert response.json["booking_id"] == booking_id
+
+
+def test_settled_status_answers_without_waiting(app, customer, token_for, booking_id):
+    response = app.test_client().get(f"/bookings/{booking_id}/payment-status/stream?since=successful",
+                                     headers=token_for(app, customer))
+    assert response.json == {"booking_id": booking_id, "payment_status": "pending"}
+
+
+def test_waiters_beyond_the_cap_get_503(database, customer, token_for, booking_id):
+    app = make_app(database, PAYMENT_STATUS_MAX_WAITERS=1)
+    client, headers = app.test_client(), token_for(app, customer)
+    url = f"/bookings/{booking_id}/payment-status/stream?timeout=0"
+    broker = payment_events.get_broker(app)
+
+    assert broker.reserve()  # another client is already waiting
+    response = client.get(url, headers=headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    broker.release()
+
+    # Long polls and SSE streams both give their slot back, so the single slot keeps serving.
+    for _ in range(2):
+        assert client.get(url, headers=headers).status_code == 200
+        stream = client.get(url, headers={**headers, "Accept": "text/event-stream"})
+        assert "event: timeout" in stream.get_data(as_text=True)
+        stream.close()
+    assert broker.reserve()
@@ -0,0 +1,50 @@
+"""Per-request SQL accounting, N+1 detection and strict query budgets."""
+
+import json
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from conftest import make_app
+from models import db
+from query_stats import QueryBudgetExceeded, query_budget, statement_shape
+
+
+def _add_view(app, budget, statements):
+    @query_budget(budget)
+    def view():
+        for _ in range(statements):
+            db.session.execute(text("SELECT id FROM service WHERE id IN (1, 2, 3)"))
+        return "ok"
+    app.add_url_rule("/test-queries", "test_queries", view)
+
+
+def test_statement_shape_collapses_in_lists():
+    assert statement_shape("SELECT *\n  FROM a WHERE id IN (?, ?, ?)") == "SELECT * FROM a WHERE id IN (?)"
+    assert statement_shape("SELECT * FROM a WHERE id IN (%(id_1)s, %(id_2)s)") == "SELECT * FROM a WHERE id IN (?)"
+
+
+def test_server_timing_reports_the_query_count(app):
+    _add_view(app, budget=3, statements=3)
+    response = app.test_client().get("/test-queries")
+    assert response.status_code == 200
+    assert 'desc="3 queries"' in response.headers["Server-Timing"]
+
+
+def test_strict_mode_fails_requests_over_budget(app):
+    _add_view(app, budget=2, statements=3)
+    with pytest.raises(QueryBudgetExceeded, match="ran 3 queries \\(budget 2\\)"):
+        app.test_client().get("/test-queries")
+
+
+def test_repeated_statements_are_logged_as_n_plus_one(database, caplog):
+    app = make_app(database, SQL_STRICT=False, SQL_REPEAT_THRESHOLD=5)
+    _add_view(app, budget=2, statements=6)
+    with caplog.at_level(logging.INFO, logger="sql"):
+        response = app.test_client().get("/test-queries")
+    assert response.status_code == 200
+    record = json.loads(caplog.records[-1].getMessage())
+    assert caplog.records[-1].levelno == logging.WARNING
+    assert record["queries"] == 6 and record["budget"] == 2
+    assert record["repeated"][0]["count"] == 6
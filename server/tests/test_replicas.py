@@ -0,0 +1,57 @@
+"""Read-replica routing with two SQLite files: a primary and a stale copy of it."""
+
+import shutil
+
+import pytest
+from sqlalchemy import select
+
+from conftest import make_app
+from models import Stylist, db
+from replicas import replica_reads
+
+
+@pytest.fixture
+def app(database, tmp_path):
+    replica = tmp_path / "replica.db"
+    shutil.copyfile(database, replica)
+    return make_app(database, replicas=[replica])
+
+
+@pytest.fixture
+def primary_only_stylist(app):
+    """A top-rated stylist written after the replica was copied."""
+    with app.app_context():
+        stylist = Stylist(name="Primary Only", rating_count=3, rating_sum=15, rating_average=5.0)
+        db.session.add(stylist)
+        db.session.commit()
+        return stylist.id
+
+
+def test_decorated_reads_use_the_replica(app, primary_only_stylist):
+    client = app.test_client()
+    top_rated = client.get("/stylists/top-rated?limit=50&min_reviews=1")
+    assert top_rated.status_code == 200
+    assert primary_only_stylist not in [stylist["id"] for stylist in top_rated.json]
+
+    # Undecorated resources always read from the primary.
+    stylist = client.get(f"/stylists/{primary_only_stylist}")
+    assert stylist.status_code == 200
+    assert stylist.json["name"] == "Primary Only"
+
+
+def test_locking_reads_and_reads_after_a_write_use_the_primary(app):
+    @replica_reads
+    def read_write_read():
+        before = db.session.get_bind(clause=select(Stylist))
+        locked = db.session.get_bind(clause=select(Stylist).with_for_update())
+        db.session.add(Stylist(name="Written In Request"))
+        db.session.flush()
+        after = db.session.get_bind(clause=select(Stylist))
+        db.session.rollback()
+        return before, locked, after
+
+    with app.test_request_context():
+        before, locked, after = read_write_read()
+        assert before in app.extensions["replicas"]
+        assert locked is db.engine
+        assert after is db.engine
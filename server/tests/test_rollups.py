@@ -0,0 +1,94 @@
+"""The analytics summary reads rollup rows that every booking write keeps in step."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+import rollups
+from models import AnalyticsRollup, Booking, Customer, Service, db
+
+START = datetime.combine(datetime.today() + timedelta(days=12), datetime.min.time()).replace(hour=9)
+
+
+def summary(app, headers):
+    response = app.test_client().get("/admin/analytics/summary", headers=headers)
+    assert response.status_code == 200
+    return response.json["summary"]
+
+
+def counted(app):
+    """The summary figures aggregated straight from the bookings."""
+    with app.app_context():
+        prices = select(func.count(Booking.id), func.coalesce(func.sum(Service.price), 0.0)) \
+            .join(Service, Service.id == Booking.service_id)
+        count, revenue = db.session.execute(prices).one()
+        _, paid = db.session.execute(prices.where(Booking.payment_status == rollups.PAID_STATUS)).one()
+        return {
+            "total_users": db.session.execute(select(func.count(Customer.id))).scalar(),
+            "total_bookings": count,
+            "total_stylists": 2,
+            "total_revenue": f"{revenue:.2f}",
+            "paid_revenue": f"{paid:.2f}",
+        }
+
+
+@pytest.fixture
+def admin_headers(app, admin, token_for):
+    return token_for(app, admin)
+
+
+def test_summary_follows_booking_writes(app, admin_headers, customer, token_for):
+    client, headers = app.test_client(), token_for(app, customer)
+    assert summary(app, admin_headers) == counted(app)
+
+    created = client.post("/bookings", headers=headers, json={
+        "stylist_id": 1, "service_id": 1, "appointment_time": START.isoformat(),
+    })
+    assert created.status_code == 201
+    booking_id = created.json["booking"]["id"]
+    assert summary(app, admin_headers) == counted(app)
+
+    with app.app_context():
+        booking = db.session.get(Booking, booking_id)
+        rollups.payment_status_changed(booking.payment_status, rollups.PAID_STATUS, booking.service.price,
+                                       booking.appointment_time)
+        booking.payment_status = rollups.PAID_STATUS
+        db.session.commit()
+    assert summary(app, admin_headers) == counted(app)
+
+    assert client.put("/services/1", headers=admin_headers, json={"price": 45}).status_code == 200
+    assert summary(app, admin_headers) == counted(app)
+
+    assert client.delete(f"/bookings/{booking_id}", headers=headers).status_code == 200
+    assert summary(app, admin_headers) == counted(app)
+
+
+def test_no_global_booking_row(app, customer, token_for):
+    """Booking writes touch only per-service and per-stylist rows, never one shared counter."""
+    app.test_client().post("/bookings", headers=token_for(app, customer), json={
+        "stylist_id": 1, "service_id": 1, "appointment_time": START.isoformat(),
+    })
+    with app.app_context():
+        scopes = {scope for scope, in db.session.execute(select(AnalyticsRollup.scope))}
+        assert {"service", "stylist"} <= scopes
+        assert "bookings" not in scopes
+
+
+def test_incremental_rows_match_a_rebuild(seeded_app):
+    def rows():
+        return set(db.session.execute(select(
+            AnalyticsRollup.scope, AnalyticsRollup.scope_id, AnalyticsRollup.item_count,
+            func.round(AnalyticsRollup.amount, 2),
+        )))
+
+    with seeded_app.app_context():
+        before = rows()
+        rollups.rebuild()
+        assert rows() == before
+
+
+def test_summary_query_budget(seeded_app, token_for):
+    with seeded_app.app_context():
+        admin = Customer.query.filter_by(is_admin=True).first()
+    summary(seeded_app, token_for(seeded_app, admin))
@@ -0,0 +1,76 @@
+"""GET /search: prefix matching, ranking, type filter, paging and index upkeep."""
+
+import pytest
+
+import search
+from models import db
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(app, admin, token_for):
+    return token_for(app, admin)
+
+
+def titles(client, query):
+    response = client.get(f"/search?{query}")
+    assert response.status_code == 200
+    return [(result["type"], result["title"]) for result in response.json["results"]]
+
+
+def test_every_word_matches_as_a_prefix(client):
+    assert set(titles(client, "q=hai")) == {
+        ("service", "Haircut"), ("service", "Hair Coloring"),
+        ("stylist", "Sophie Lee"), ("stylist", "David Kim"),  # "haircuts", "hair coloring" in their bios
+    }
+    assert titles(client, "q=so%20le") == [("stylist", "Sophie Lee")]
+    assert titles(client, "q=hair%20col&type=service") == [("service", "Hair Coloring")]
+    assert titles(client, "q=") == []
+    assert titles(client, "q=%2A%22") == []  # no words, so no FTS syntax error either
+
+
+def test_title_matches_rank_first(client, admin_headers):
+    client.post("/services", headers=admin_headers,
+                json={"title": "Beard Trim", "description": "Goes well with a manicure", "price": 15})
+    assert titles(client, "q=manicure&type=service") == [("service", "Manicure"), ("service", "Beard Trim")]
+
+
+def test_type_filter(client):
+    assert {kind for kind, _ in titles(client, "q=hair&type=stylist")} == {"stylist"}
+    assert client.get("/search?q=hair&type=booking").status_code == 400
+
+
+def test_writes_keep_the_index_in_step(client, admin_headers):
+    created = client.post("/services", headers=admin_headers, json={"title": "Pedicure", "price": 20})
+    service_id = created.json["id"]
+    assert titles(client, "q=pedi") == [("service", "Pedicure")]
+
+    client.put(f"/services/{service_id}", headers=admin_headers, json={"title": "Gel Pedicure"})
+    assert titles(client, "q=gel") == [("service", "Gel Pedicure")]
+
+    client.delete(f"/services/{service_id}", headers=admin_headers)
+    assert titles(client, "q=pedi") == []
+
+
+def test_pages_cover_every_match_once(app, client, admin_headers):
+    for number in range(5):
+        client.post("/services", headers=admin_headers, json={"title": f"Massage {number}", "price": 40})
+    seen, cursor = [], None
+    while True:
+        page = client.get("/search?q=massage&limit=2" + (f"&cursor={cursor}" if cursor else "")).json
+        assert len(page["results"]) <= 2
+        seen.extend(result["title"] for result in page["results"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(seen) == [f"Massage {number}" for number in range(5)]
+    assert client.get("/search?q=massage&cursor=garbage").status_code == 400
+
+    with app.app_context():
+        search.rebuild()
+        db.session.commit()
+    assert sorted(title for _, title in titles(client, "q=massage&limit=10")) == sorted(seen)
@@ -0,0 +1,96 @@
+"""Admin time series: closed periods are cached, invalidated by writes, and never cached stale."""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+import rollups
+import timeseries
+from models import AnalyticsBucket, Booking, Customer, db
+
+START = date.today() - timedelta(days=10)
+END = date.today() - timedelta(days=1)
+WINDOW = f"start={START}&end={END}"
+
+
+@pytest.fixture
+def get(seeded_app, token_for):
+    with seeded_app.app_context():
+        headers = token_for(seeded_app, Customer.query.filter_by(is_admin=True).first())
+
+    def get(query):
+        response = seeded_app.test_client().get(f"/admin/analytics/timeseries?{query}", headers=headers)
+        assert response.status_code == 200
+        return response.json
+    return get
+
+
+def counted(app, day):
+    with app.app_context():
+        return db.session.execute(select(func.count(Booking.id)).where(
+            Booking.appointment_time >= day, Booking.appointment_time < day + timedelta(days=1),
+        )).scalar()
+
+
+def a_booking_on(app, day):
+    with app.app_context():
+        return db.session.execute(select(Booking.id).where(
+            Booking.appointment_time >= day, Booking.appointment_time < day + timedelta(days=1),
+        ).limit(1)).scalar()
+
+
+def cached_rows(app):
+    with app.app_context():
+        return db.session.execute(select(func.count()).select_from(AnalyticsBucket)).scalar()
+
+
+def test_series_match_the_bookings_and_are_cached(seeded_app, get):
+    first = get(f"granularity=day&{WINDOW}")
+    days = [START + timedelta(days=offset) for offset in range(len(first["series"][0]["bookings"]))]
+    assert first["series"][0]["bookings"] == [counted(seeded_app, day) for day in days]
+    assert cached_rows(seeded_app)
+
+    assert get(f"granularity=day&{WINDOW}") == first
+    per_stylist = get(f"granularity=day&group_by=stylist&{WINDOW}")["series"]
+    assert [sum(day) for day in zip(*(entry["bookings"] for entry in per_stylist))] == first["series"][0]["bookings"]
+
+
+def test_writes_invalidate_their_periods(seeded_app, get):
+    get(f"granularity=day&{WINDOW}")
+    before = get(f"granularity=week&{WINDOW}")
+    with seeded_app.app_context():
+        booking = db.session.get(Booking, a_booking_on(seeded_app, START))
+        rollups.booking_deleted(booking, booking.service.price)
+        db.session.delete(booking)
+        db.session.commit()
+
+    assert get(f"granularity=day&{WINDOW}")["series"][0]["bookings"][0] == counted(seeded_app, START)
+    after = get(f"granularity=week&{WINDOW}")
+    assert sum(after["series"][0]["bookings"]) == sum(before["series"][0]["bookings"]) - 1
+
+
+def test_fills_racing_an_invalidation_are_discarded(seeded_app, get, monkeypatch):
+    booking_id = a_booking_on(seeded_app, START)
+    aggregate = timeseries.aggregate
+    raced = []
+
+    def aggregate_during_a_write(*args):
+        result = aggregate(*args)
+        if not raced:
+            # Another worker deletes a booking in the period and commits while this one aggregates.
+            raced.append(True)
+            with Session(db.engine) as other:
+                other.execute(text("DELETE FROM booking WHERE id = :id"), {"id": booking_id})
+                other.execute(text("UPDATE cache_version SET version = version + 1 WHERE name = :name"),
+                              {"name": timeseries.GENERATION})
+                other.commit()
+        return result
+
+    monkeypatch.setattr(timeseries, "aggregate", aggregate_during_a_write)
+    response = get(f"granularity=day&{WINDOW}")
+    assert raced
+    assert cached_rows(seeded_app) == 0
+    # Served live instead, so the deleted booking is already gone.
+    assert response["series"][0]["bookings"][0] == counted(seeded_app, START)
@@ -0,0 +1,223 @@
+"""Daily, weekly and monthly booking and revenue series for admin analytics.
+
+Buckets are computed in SQL over the `appointment_time` index: `date_trunc` on
+PostgreSQL and `datetime(..., 'start of ...')` on SQLite. Weeks start on Monday,
+and revenue is at current service prices, as in rollups.py.
+
+A period that has ended is computed once for every scope ("all", "stylist" and
+"service") and kept in `analytics_bucket`; later requests read it from there.
+Only the open period (and any future ones) is aggregated on every request.
+Writes that change a closed period call `invalidate()` (through the rollups.py
+hooks), and repricing or a full rebuild calls `invalidate_all()`, so the
+cached rows never go stale.
+
+Both also bump the `analytics_bucket` generation in `cache_version` before
+deleting. A request that computed periods from an older generation throws its
+rows away instead of caching them, since an invalidation that ran while it was
+aggregating had nothing to delete yet.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, literal, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import rollups
+from models import AnalyticsBucket, Booking, CacheVersion, Service, db
+
+GRANULARITIES = ("day", "week", "month")
+SCOPES = ("all", "stylist", "service")
+# Longest series one request may ask for.
+MAX_BUCKETS = 750
+INSERT_CHUNK = 1000
+# `cache_version` row bumped by every invalidation.
+GENERATION = "analytics_bucket"
+
+_SQLITE_MODIFIERS = {
+    "day": ("start of day",),
+    "week": ("start of day", "-6 days", "weekday 1"),
+    "month": ("start of month",),
+}
+
+
+def truncate(moment, granularity):
+    """Start of the period containing `moment`."""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(period_start, granularity):
+    if granularity == "day":
+        return period_start + timedelta(days=1)
+    if granularity == "week":
+        return period_start + timedelta(weeks=1)
+    if period_start.month == 12:
+        return period_start.replace(year=period_start.year + 1, month=1)
+    return period_start.replace(month=period_start.month + 1)
+
+
+def periods(granularity, start, end):
+    """Start of every period overlapping [start, end)."""
+    result = []
+    period = truncate(start, granularity)
+    while period < end:
+        result.append(period)
+        period = next_period(period, granularity)
+    return result
+
+
+def _bucket(granularity):
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(granularity, Booking.appointment_time)
+    return func.datetime(Booking.appointment_time, *_SQLITE_MODIFIERS[granularity])
+
+
+def _as_datetime(value):
+    # SQLite returns the bucket as text.
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def aggregate(granularity, start, end, scope):
+    """`{(period_start, scope_id): (bookings, revenue, paid bookings, paid revenue)}` for [start, end)."""
+    bucket = _bucket(granularity)
+    key = {"all": literal(0), "stylist": Booking.stylist_id, "service": Booking.service_id}[scope]
+    paid = Booking.payment_status == rollups.PAID_STATUS
+    statement = select(
+        bucket,
+        key,
+        func.count(Booking.id),
+        func.coalesce(func.sum(Service.price), 0.0),
+        func.count(Booking.id).filter(paid),
+        func.coalesce(func.sum(Service.price).filter(paid), 0.0),
+    ).join(Service, Service.id == Booking.service_id) \
+     .where(Booking.appointment_time >= start, Booking.appointment_time < end) \
+     .group_by(*((bucket,) if scope == "all" else (bucket, key)))
+    return {
+        (_as_datetime(period), scope_id): (count, float(revenue), paid_count, float(paid_revenue))
+        for period, scope_id, count, revenue, paid_count, paid_revenue in db.session.execute(statement)
+    }
+
+
+def _generation(lock=False):
+    query = select(CacheVersion.version).where(CacheVersion.name == GENERATION)
+    if lock:
+        query = query.with_for_update()
+    return db.session.execute(query).scalar() or 0
+
+
+def _bump_generation():
+    # Taken before deleting: a cache fill holding the row lock has its rows deleted after it commits.
+    db.session.execute(update(CacheVersion).where(CacheVersion.name == GENERATION)
+                       .values(version=CacheVersion.version + 1))
+
+
+def _runs(sorted_periods, granularity):
+    """Split period starts into runs of consecutive periods."""
+    runs = []
+    for period in sorted_periods:
+        if runs and next_period(runs[-1][-1], granularity) == period:
+            runs[-1].append(period)
+        else:
+            runs.append([period])
+    return runs
+
+
+def _cache(granularity, missing, generation):
+    """Compute and store every scope for the closed periods in `missing`.
+
+    Returns False, with nothing stored, when an invalidation has run since
+    `generation` was read.
+    """
+    rows = []
+    for run in _runs(missing, granularity):
+        start, end = run[0], next_period(run[-1], granularity)
+        for scope in SCOPES:
+            for (period, scope_id), (count, revenue, paid_count, paid_revenue) in \
+                    aggregate(granularity, start, end, scope).items():
+                rows.append({"granularity": granularity, "period_start": period, "scope": scope, "scope_id": scope_id,
+                             "booking_count": count, "revenue": revenue,
+                             "paid_count": paid_count, "paid_revenue": paid_revenue})
+        # The "all" row marks each period as computed, bookings or not.
+        present = {row["period_start"] for row in rows if row["scope"] == "all"}
+        rows.extend({"granularity": granularity, "period_start": period, "scope": "all", "scope_id": 0,
+                     "booking_count": 0, "revenue": 0.0, "paid_count": 0, "paid_revenue": 0.0}
+                    for period in run if period not in present)
+    insert = postgresql.insert if db.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    # A concurrent request of the same generation may have cached the same periods; its rows are identical.
+    for offset in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(AnalyticsBucket).values(rows[offset:offset + INSERT_CHUNK]).on_conflict_do_nothing())
+    # Checked after inserting, under the row lock on PostgreSQL and the write lock on SQLite, so
+    # no invalidation can commit between this check and the commit of these rows.
+    if _generation(lock=True) != generation:
+        db.session.rollback()
+        return False
+    db.session.commit()
+    return True
+
+
+def series(granularity, start, end, scope, now=None):
+    """`(period starts, {scope_id: {period_start: totals}})` for every period overlapping [start, end)."""
+    now = now or datetime.now()
+    all_periods = periods(granularity, start, end)
+    closed = [period for period in all_periods if next_period(period, granularity) <= now]
+    open_periods = all_periods[len(closed):]
+    values = {}
+
+    if closed:
+        # Read before aggregating, so any invalidation that overlaps the aggregation changes it.
+        generation = _generation()
+        cached = set(db.session.execute(
+            select(AnalyticsBucket.period_start).where(
+                AnalyticsBucket.granularity == granularity,
+                AnalyticsBucket.scope == "all",
+                AnalyticsBucket.period_start >= closed[0],
+                AnalyticsBucket.period_start <= closed[-1],
+            )
+        ).scalars())
+        missing = [period for period in closed if period not in cached]
+        if missing and not _cache(granularity, missing, generation):
+            # Invalidated while computing: aggregate the whole range live instead.
+            open_periods = all_periods
+        else:
+            rows = db.session.execute(
+                select(AnalyticsBucket).where(
+                    AnalyticsBucket.granularity == granularity,
+                    AnalyticsBucket.scope == scope,
+                    AnalyticsBucket.period_start >= closed[0],
+                    AnalyticsBucket.period_start <= closed[-1],
+                )
+            ).scalars()
+            for row in rows:
+                values.setdefault(row.scope_id, {})[row.period_start] = \
+                    (row.booking_count, row.revenue, row.paid_count, row.paid_revenue)
+
+    if open_periods:
+        live = aggregate(granularity, open_periods[0], next_period(open_periods[-1], granularity), scope)
+        for (period, scope_id), totals in live.items():
+            values.setdefault(scope_id, {})[period] = totals
+    return all_periods, values
+
+
+def invalidate(moments, now=None):
+    """Drop cached periods containing any of `moments` (appointment times whose totals changed)."""
+    now = now or datetime.now()
+    keys = set()
+    for moment in moments:
+        for granularity in GRANULARITIES:
+            period = truncate(moment, granularity)
+            if next_period(period, granularity) <= now:
+                keys.add((granularity, period))
+    if keys:
+        _bump_generation()
+        db.session.execute(
+            delete(AnalyticsBucket).where(tuple_(AnalyticsBucket.granularity, AnalyticsBucket.period_start).in_(keys))
+        )
+
+
+def invalidate_all():
+    _bump_generation()
+    db.session.execute(delete(AnalyticsBucket))
@@ -0,0 +1,82 @@
+"""Background worker that drains the payment job queue and the M-Pesa callback inbox.
+
+Run from server/ alongside the web process: `python worker.py` (`--once` drains
+what is due and exits). Concurrency, retry and batch settings come from Config.
+"""
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import payment_callbacks
+import payment_jobs
+from app import create_app
+from models import db
+
+logger = logging.getLogger("worker")
+
+app = create_app()
+
+
+def _run_job(job_id):
+    with app.app_context():
+        try:
+            payment_jobs.process(job_id)
+        except Exception:
+            # Left in "running"; release_expired_leases() requeues it after the lease.
+            db.session.rollback()
+            logger.exception("Payment job %s crashed", job_id)
+
+
+def drain(executor, concurrency):
+    """Claim and run due jobs until none are left. Returns the number processed."""
+    processed = 0
+    while True:
+        with app.app_context():
+            job_ids = payment_jobs.claim(concurrency)
+        if not job_ids:
+            return processed
+        list(executor.map(_run_job, job_ids))
+        processed += len(job_ids)
+
+
+def apply_callbacks(batch_size):
+    """Apply stored M-Pesa callbacks in batches until a batch comes back short."""
+    while True:
+        with app.app_context():
+            try:
+                claimed = payment_callbacks.apply_pending(batch_size)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Applying M-Pesa callbacks failed")
+                return
+        if claimed < batch_size:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--once", action="store_true", help="drain due jobs and exit")
+    args = parser.parse_args()
+
+    concurrency = app.config["PAYMENT_WORKER_CONCURRENCY"]
+    poll_interval = app.config["PAYMENT_WORKER_POLL_INTERVAL"]
+    logger.info("Payment worker started (concurrency=%s)", concurrency)
+    # M-Pesa call latency reaches /metrics when the web service shares METRICS_DIR.
+    metrics.start_flusher(app)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="payment-job") as executor:
+        while True:
+            with app.app_context():
+                payment_jobs.release_expired_leases()
+                payment_jobs.expire_unconfirmed()
+            drain(executor, concurrency)
+            apply_callbacks(app.config["MPESA_CALLBACK_BATCH_SIZE"])
+            if args.once:
+                return
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    main()